@@ -0,0 +1,119 @@
+"""
+Measure the latency cost of the asynchronous audit log on predict_er and its sustained write rate.
+
+Scores the same patients through the flattened serving forest with the audit
+log closed and open, alternating in many short rounds so machine noise hits
+both modes alike, and compares per-call p50/p99.
+Then checks that every submitted decision was written and reads the log back.
+Exits with status 1 if the p99 overhead exceeds --max-overhead percent.
+
+Usage:
+    python benchmarks/bench_audit_log.py [--requests 2000] [--rounds 50] [--batch-rows 100000]
+        [--max-overhead 5] [--log-dir /tmp/triage-audit-bench]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import audit_log  # noqa: E402
+from bench_rules import random_patients  # noqa: E402
+from features import PatientRecord  # noqa: E402
+from flat_forest import FlatForest  # noqa: E402
+from model_registry import MODEL_PATH, load_artifact  # noqa: E402
+from predict import predict_er, predict_er_batch  # noqa: E402
+
+
+def latencies(patients, model):
+    times = np.empty(len(patients))
+    for i, patient in enumerate(patients):
+        start = time.perf_counter()
+        predict_er(patient, model=model)
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='predict_er calls per round and mode')
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--batch-rows', type=int, default=100_000, help='Rows for the predict_er_batch check')
+    parser.add_argument('--max-overhead', type=float, default=5.0, help='Allowed p99 overhead in percent')
+    parser.add_argument('--log-dir', default=None, help='Audit directory (default: a temporary directory)')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    model = load_artifact(MODEL_PATH)
+    model = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+    patients = [PatientRecord(row) for row in random_patients(args.requests, seed=7)]
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix='triage-audit-bench-')
+    shutil.rmtree(log_dir, ignore_errors=True)
+
+    latencies(patients[:1000], model)  # Warm up
+    off, on = [], []
+    log = audit_log.AuditLog(log_dir)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        audit_log.SINK = None
+        off.append(latencies(patients, model))
+        audit_log.SINK = log
+        on.append(latencies(patients, model))
+    audit_log.SINK = None
+    elapsed_on = sum(times.sum() for times in on)
+
+    flush_start = time.perf_counter()
+    log.flush()
+    drain_seconds = time.perf_counter() - flush_start
+
+    X = random_patients(args.batch_rows, seed=8)
+    audit_log.SINK = log
+    batch_start = time.perf_counter()
+    predict_er_batch(X, model=model)
+    batch_seconds = time.perf_counter() - batch_start
+    audit_log.close_log()
+    stats = log.stats()
+    elapsed = time.perf_counter() - start
+
+    read_start = time.perf_counter()
+    read_back = sum(len(block) for block in audit_log.scan(log_dir))
+    read_seconds = time.perf_counter() - read_start
+    size_mb = sum(os.path.getsize(path) for path in audit_log.log_files(log_dir)) / 2**20
+
+    off, on = np.concatenate(off), np.concatenate(on)
+    p50_off, p99_off = np.percentile(off, [50, 99])
+    p50_on, p99_on = np.percentile(on, [50, 99])
+    overhead = (p99_on / p99_off - 1) * 100
+
+    print(f"predict_er, {len(on):,} calls per mode ({args.rounds} alternating rounds)")
+    print(f"  audit off: p50 {p50_off * 1e6:8.1f} µs   p99 {p99_off * 1e6:8.1f} µs")
+    print(f"  audit on:  p50 {p50_on * 1e6:8.1f} µs   p99 {p99_on * 1e6:8.1f} µs")
+    print(f"  p99 overhead: {overhead:+.1f}% (p50 {(p50_on / p50_off - 1) * 100:+.1f}%)")
+    print(f"  offered rate with audit on: {len(on) / elapsed_on:,.0f} decisions/s, "
+          f"writer backlog drained {drain_seconds * 1e3:.0f} ms after the last call")
+    print(f"predict_er_batch, {args.batch_rows:,} rows with audit on: "
+          f"{args.batch_rows / batch_seconds:,.0f} rows/s")
+    print(f"Written {stats['written']:,} / submitted {stats['submitted']:,} (dropped {stats['dropped']}), "
+          f"{stats['blocks']} blocks, {stats['fsyncs']} fsyncs, {stats['files']} file(s), {size_mb:.1f} MB "
+          f"in {elapsed:.1f}s")
+    print(f"Read back {read_back:,} records in {read_seconds * 1e3:.0f} ms from {log_dir}")
+
+    if args.log_dir is None:
+        shutil.rmtree(log_dir, ignore_errors=True)
+    if read_back != stats['submitted'] or stats['dropped']:
+        raise SystemExit("Audit log lost decisions")
+    if overhead > args.max_overhead:
+        raise SystemExit(f"p99 overhead {overhead:.1f}% exceeds {args.max_overhead:g}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Check the flattened NumPy forest against sklearn and compare their latency.
+
+Usage:
+    python benchmarks/bench_forest.py [--model model/er_model.pkl] [--calls 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from dataset import open_dataset  # noqa: E402
+from flat_forest import FlatForest  # noqa: E402
+from model_registry import MODEL_PATH  # noqa: E402
+
+DATA_DIR = os.path.join(SCRIPT_DIR, "..", "data")
+
+
+def load_eval_matrix():
+    """The test split of data/er_data.csv (see generate_test_data.py), otherwise all of it."""
+    data = open_dataset(os.path.join(DATA_DIR, "er_data.csv"))
+    try:
+        return "er_data.csv test split", data.subset(data.split()[1])[0]
+    except ValueError:
+        return "er_data.csv", np.asarray(data.X)
+
+
+def latencies(fn, batches):
+    out = np.empty(len(batches))
+    for i, batch in enumerate(batches):
+        start = time.perf_counter()
+        fn(batch)
+        out[i] = time.perf_counter() - start
+    return out
+
+
+def report(label, seconds, rows):
+    p50, p99 = np.percentile(seconds, [50, 99])
+    print(f"{label:<28} p50 {p50 * 1e3:8.3f} ms   p99 {p99 * 1e3:8.3f} ms   "
+          f"{rows / np.median(seconds):12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    flat = FlatForest.from_sklearn(model)
+    name, X = load_eval_matrix()
+
+    # Parity with sklearn
+    diff = np.abs(flat.predict_proba(X) - model.predict_proba(X)).max()
+    print(f"Parity on {name} ({len(X)} rows): max |flat - sklearn| = {diff:.3e}")
+    if diff > 1e-12:
+        raise SystemExit("FAIL: flattened forest differs from sklearn by more than 1e-12")
+
+    rng = np.random.default_rng(0)
+    singles = [X[i:i + 1] for i in rng.integers(0, len(X), args.calls)]
+    reps = max(1, args.batch_size // len(X) + 1)
+    batch = np.tile(X, (reps, 1))[:args.batch_size]
+    batches = [batch] * max(5, args.calls // 50)
+
+    report("sklearn, single row", latencies(model.predict_proba, singles), 1)
+    report("flat forest, single row", latencies(flat.predict_proba, singles), 1)
+    report(f"sklearn, batch {len(batch)}", latencies(model.predict_proba, batches), len(batch))
+    report(f"flat forest, batch {len(batch)}", latencies(flat.predict_proba, batches), len(batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare per-request predict_er against the asyncio micro-batcher under concurrent load.
+
+Usage:
+    python benchmarks/bench_microbatch.py [--clients 64] [--requests 20] [--max-wait-ms 5] [--max-batch 64]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from bench_rules import random_patients  # noqa: E402
+from features import FEATURES  # noqa: E402
+from microbatch import MicroBatcher  # noqa: E402
+from model_registry import MODEL_PATH, get_model  # noqa: E402
+from predict import predict_er  # noqa: E402
+
+
+async def run_clients(score, patients, clients, requests):
+    latencies = []
+
+    async def client(offset):
+        for i in range(requests):
+            start = time.perf_counter()
+            await score(patients[(offset + i * clients) % len(patients)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return time.perf_counter() - start, np.array(latencies)
+
+
+def report(label, elapsed, latencies):
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    print(f"{label:<14} {len(latencies) / elapsed:9.1f} req/s   p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    args = parser.parse_args()
+
+    model = get_model(MODEL_PATH)
+    patients = [dict(zip(FEATURES, row.tolist())) for row in random_patients(1000)]
+    loop = asyncio.get_running_loop()
+
+    async def direct(patient):
+        return await loop.run_in_executor(None, lambda: predict_er(patient, model=model))
+
+    report("per-request", *await run_clients(direct, patients, args.clients, args.requests))
+
+    batcher = MicroBatcher(max_wait_ms=args.max_wait_ms, max_batch=args.max_batch, model=model)
+    await batcher.start()
+    report("micro-batched", *await run_clients(batcher.predict_er, patients, args.clients, args.requests))
+    stats = batcher.stats()
+    await batcher.stop()
+    print(f"batches {stats['batches']}, mean batch size {stats['mean_batch_size']:.1f}, "
+          f"max queue depth {stats['max_queue_depth']}")
+    print(f"batch size histogram: {stats['batch_size_histogram']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Per-worker memory and load time: joblib.load of the pickle vs the memory-mapped forest directory.
+
+Starts N fresh worker processes per format. Each loads the model, scores a
+batch (touching the node arrays), and reports its load time, RSS growth and
+proportional set size (PSS, which splits shared pages between the processes
+mapping them) while all workers are alive. Linux only (/proc).
+
+Usage:
+    python benchmarks/bench_mmap.py [--workers 4] [--model model/er_model.pkl]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from model_registry import MODEL_PATH, mmap_model_path  # noqa: E402
+
+
+def memory_kb():
+    """(RSS, PSS) of this process in kB."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def worker(path, ready, release, results):
+    import numpy as np
+    from bench_rules import random_patients
+    from model_registry import load_artifact
+
+    X = random_patients(1000)
+    rss0, _ = memory_kb()
+    start = time.perf_counter()
+    model = load_artifact(path)
+    load_seconds = time.perf_counter() - start
+    model.predict_proba(np.ascontiguousarray(X))
+    ready.wait()
+    rss, pss = memory_kb()
+    results.put((load_seconds, rss - rss0, rss, pss))
+    release.wait()
+
+
+def measure(path, workers):
+    ctx = multiprocessing.get_context('spawn')
+    ready = ctx.Barrier(workers + 1)
+    release = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(path, ready, release, results)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    ready.wait()
+    rows = [results.get() for _ in procs]
+    release.set()
+    for proc in procs:
+        proc.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--model', default=MODEL_PATH, help="Pickled model; its <model>_flat/ export is compared")
+    args = parser.parse_args()
+
+    mmap_path = mmap_model_path(args.model)
+    if not os.path.isdir(mmap_path):
+        print(f"Error: {mmap_path} not found (run scripts/export_flat_model.py --mmap)")
+        sys.exit(1)
+
+    print(f"{args.workers} workers; per-worker means (MB)")
+    print(f"{'format':<10}{'load ms':>10}{'RSS growth':>12}{'RSS':>10}{'PSS':>10}{'total PSS':>11}")
+    for label, path in (('joblib', args.model), ('mmap', mmap_path)):
+        rows = measure(path, args.workers)
+        n = len(rows)
+        load, growth, rss, pss = (sum(r[i] for r in rows) / n for i in range(4))
+        print(f"{label:<10}{load * 1e3:10.1f}{growth / 1024:12.1f}{rss / 1024:10.1f}{pss / 1024:10.1f}"
+              f"{sum(r[3] for r in rows) / 1024:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
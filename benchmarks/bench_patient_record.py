@@ -0,0 +1,90 @@
+"""
+Compare patient dicts against PatientRecord/PatientBatch: memory per record and per-call time.
+
+Usage:
+    python benchmarks/bench_patient_record.py [--records 10000] [--calls 2000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from bench_rules import random_patients  # noqa: E402
+from features import FEATURES, PatientBatch, PatientRecord  # noqa: E402
+from model_registry import get_model, model_path, serving_model_path  # noqa: E402
+from predict import predict_er, predict_er_batch  # noqa: E402
+from rule_catalogue import evaluate_rules  # noqa: E402
+
+
+def bytes_per_item(build, n):
+    """Average traced allocation per item for build(), which returns n items."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(items) == n
+    return (after - before) / n
+
+
+def per_call_us(fn, items, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(items[i % len(items)])
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    X = random_patients(args.records)
+    rows = X.tolist()
+
+    def make_dicts():
+        # As app.py builds them: 17 features plus sex and race
+        return [dict(zip(FEATURES, row), sex=0, race=2) for row in rows]
+
+    dicts = make_dicts()
+    records = [PatientRecord.from_dict(d) for d in dicts]
+    batch = PatientBatch(X)
+
+    print(f"{'memory per record':<28}{'bytes':>10}")
+    print(f"{'dict (19 keys)':<28}{bytes_per_item(make_dicts, args.records):10.0f}")
+    print(f"{'PatientRecord':<28}{bytes_per_item(lambda: [PatientRecord(row) for row in rows], args.records):10.0f}")
+    print(f"{'PatientBatch row':<28}{bytes_per_item(lambda: PatientBatch(X.copy()), args.records):10.0f}")
+
+    model = get_model(serving_model_path())
+    for d, r in zip(dicts[:200], records[:200]):
+        assert predict_er(d, model=model) == predict_er(r, model=model)
+
+    print(f"\n{'per call':<28}{'dict us':>10}{'record us':>12}")
+    for label, fn in [
+        ('build', None),
+        ('evaluate_rules', evaluate_rules),
+        ('predict_er', lambda p: predict_er(p, model=model)),
+    ]:
+        if fn is None:
+            t_dict = per_call_us(lambda row: dict(zip(FEATURES, row), sex=0, race=2), rows, args.calls)
+            t_rec = per_call_us(PatientRecord, rows, args.calls)
+        else:
+            t_dict = per_call_us(fn, dicts, args.calls)
+            t_rec = per_call_us(fn, records, args.calls)
+        print(f"{label:<28}{t_dict:10.1f}{t_rec:12.1f}")
+
+    batch_model = get_model(model_path())
+    start = time.perf_counter()
+    predict_er_batch(batch, model=batch_model)
+    print(f"\npredict_er_batch over PatientBatch: {(time.perf_counter() - start) / len(batch) * 1e6:.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark the compiled rule engine against the original dict-of-lambdas loop.
+
+Usage:
+    python benchmarks/bench_rules.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from features import FEATURES  # noqa: E402
+from predict import COMPILED_RULES, RULES  # noqa: E402
+from rule_catalogue import evaluate_rules  # noqa: E402
+
+
+# --- Original per-patient rule loop from src/predict.py, kept as the baseline ---
+
+def legacy_qsofa_score(input_data):
+    bp = input_data.get('blood_pressure', 120)
+    rr = input_data.get('respiratory_rate', 16)
+    ams = input_data.get('altered_mental_status', 0)
+    return (1 if ams == 1 else 0) + (1 if rr >= 22 else 0) + (1 if bp <= 100 else 0)
+
+
+def legacy_stroke_symptoms_count(input_data):
+    return sum([
+        input_data.get('unilateral_weakness', 0),
+        input_data.get('trouble_speaking', 0),
+        input_data.get('trouble_walking', 0),
+        input_data.get('syncope', 0)
+    ])
+
+
+def legacy_diabetes_glucose_check(input_data):
+    bs = input_data.get('blood_sugar', 100)
+    return input_data.get('diabetes', 0) == 1 and (bs <= 70 or bs >= 200)
+
+
+LEGACY_RULES = {
+    'SpO2': [(lambda x: x < 90, 0.60, 'SpO2 < 90%')],
+    'blood_pressure': [
+        (lambda x: x < 90, 0.60, 'Blood pressure < 90 mmHg'),
+        (lambda x: x > 140, 0.30, 'Blood pressure > 140 mmHg')
+    ],
+    'temperature': [(lambda x: x > 38, 0.50, 'Temperature > 38°C')],
+    'chest_pain': [(lambda x: x == 1, 0.60, 'Chest pain present')],
+    'shortness_of_breath': [(lambda x: x == 1, 0.50, 'Shortness of breath present')],
+    'heart_disease': [(lambda x: x == 1, 0.40, 'Heart disease present')],
+    'age': [(lambda x: x >= 65, 0.30, 'Age ≥ 65 years')],
+    'pulse': [
+        (lambda x: x < 60, 0.80, 'Pulse < 60 bpm (hypothermia risk)'),
+        (lambda x: x > 100, 0.60, 'Pulse > 100 bpm')
+    ],
+    'blood_sugar': [(lambda x: x <= 70 or x >= 272, 0.70, 'Blood glucose ≤ 70 or ≥ 272 mg/dL')],
+    'mode_of_arrival': [(lambda x: x == 1, 0.60, 'Ambulance arrival')],
+    'respiratory_rate': [
+        (lambda x: x < 8, 0.30, 'Respiratory rate < 8'),
+        (lambda x: 21 <= x <= 24, 0.30, 'Respiratory rate 21–24'),
+        (lambda x: x >= 25, 0.60, 'Respiratory rate ≥ 25')
+    ],
+    '_qsofa': [
+        (lambda _: legacy_qsofa_score(_) == 1, 0.50, 'qSOFA score = 1'),
+        (lambda _: legacy_qsofa_score(_) >= 2, 1.00, 'qSOFA score ≥ 2')
+    ],
+    '_stroke': [(lambda _: legacy_stroke_symptoms_count(_) >= 1, 0.80, 'Stroke symptoms present')],
+    '_diabetes_glucose': [(lambda _: legacy_diabetes_glucose_check(_), 0.80,
+                           'Diabetes with blood glucose ≤ 70 or ≥ 200 mg/dL')]
+}
+
+
+def legacy_fired(input_data):
+    fired = []
+    for feature, rule_list in LEGACY_RULES.items():
+        value = input_data if feature.startswith('_') else input_data.get(feature, 0)
+        for condition_fn, weight, description in rule_list:
+            if condition_fn(value):
+                fired.append(weight)
+    return fired
+
+
+def random_patients(n, seed=0):
+    """Random patients covering both sides of every rule threshold."""
+    rng = np.random.default_rng(seed)
+    cols = {
+        'SpO2': rng.uniform(80, 100, n), 'blood_pressure': rng.uniform(70, 200, n),
+        'temperature': rng.uniform(35, 40, n), 'age': rng.integers(18, 101, n),
+        'pulse': rng.integers(40, 181, n), 'blood_sugar': rng.integers(50, 401, n),
+        'mode_of_arrival': rng.integers(0, 3, n), 'respiratory_rate': rng.integers(6, 41, n),
+    }
+    for f in FEATURES:
+        if f not in cols:
+            cols[f] = rng.integers(0, 2, n)
+    return np.column_stack([cols[f] for f in FEATURES]).astype(np.float64)
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    X = random_patients(args.rows)
+    dicts = [dict(zip(FEATURES, row.tolist())) for row in X]
+
+    # Parity: both engines must apply the same set of weights (the catalogue splits
+    # the legacy blood glucose rule into two exclusive rules and orders rules as rules.py did)
+    fired = COMPILED_RULES.evaluate(X)
+    for row, row_dict, row_fired in zip(X, dicts, fired):
+        expected = legacy_fired(row_dict)
+        expected = sorted(expected)
+        got = sorted(RULES[i].weight for i in np.flatnonzero(row_fired))
+        single = sorted(RULES[i].weight for i in COMPILED_RULES.fired_indices(row))
+        if got != expected or single != expected:
+            raise SystemExit(f"Rule mismatch for {row_dict}: {got} / {single} != {expected}")
+
+    # Partial patient dicts: missing features count as 0, but the derived scores assume normal vitals
+    for row_dict in dicts[:1000]:
+        for dropped in (('blood_pressure', 'respiratory_rate', 'blood_sugar'), ('blood_pressure',), ('blood_sugar',)):
+            partial = {f: v for f, v in row_dict.items() if f not in dropped}
+            expected = sorted(legacy_fired(partial))
+            got = sorted(RULES[i].weight for i in evaluate_rules(partial).fired)
+            if got != expected:
+                raise SystemExit(f"Rule mismatch for partial {partial}: {got} != {expected}")
+
+    legacy = best_of(lambda: [legacy_fired(d) for d in dicts], args.repeat)
+    per_row = best_of(lambda: [COMPILED_RULES.fired_indices(row) for row in X], args.repeat)
+    batch = best_of(lambda: COMPILED_RULES.evaluate(X), args.repeat)
+
+    print(f"Rows: {args.rows}, rules: {len(RULES)}")
+    print(f"dict-of-lambdas loop: {legacy * 1e3:9.2f} ms ({legacy / args.rows * 1e6:7.2f} µs/row)")
+    print(f"compiled, per row:    {per_row * 1e3:9.2f} ms ({per_row / args.rows * 1e6:7.2f} µs/row)")
+    print(f"compiled, batch:      {batch * 1e3:9.2f} ms ({batch / args.rows * 1e6:7.2f} µs/row)")
+    print(f"batch speedup vs dict loop: {legacy / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
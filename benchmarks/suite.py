@@ -0,0 +1,286 @@
+"""
+Benchmark suite for scoring, rules, model loading and training, with saved results and regression checks.
+
+`run` times every case and writes a JSON file with the timings and a machine
+description; `compare` checks a run against a saved baseline and exits with
+status 1 if any case got slower by more than the threshold. Every case is
+reported as the median seconds per call over its repeats, so lower is always
+better.
+
+Usage:
+    python benchmarks/suite.py run [--output benchmarks/results/latest.json] [--quick]
+        [--batch-sizes 1 100 10000 1000000] [--train-sizes 10000 50000] [--case predict_er ...]
+    python benchmarks/suite.py compare BASELINE.json [CURRENT.json] [--threshold 10]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from bench_rules import random_patients  # noqa: E402
+from features import FEATURES  # noqa: E402
+
+RESULTS_DIR = os.path.join(SCRIPT_DIR, "results")
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, "latest.json")
+BATCH_SIZES = [1, 100, 10_000, 1_000_000]
+TRAIN_SIZES = [10_000, 50_000]
+CASES = ['predict_er', 'explain', 'get_recommendations', 'predict_er_batch', 'model_load', 'train']
+
+
+def timings(fn, repeat, warmup=1):
+    """Per-call seconds of fn over repeat calls, after warmup untimed calls."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def summarize(times, **extra):
+    """Result entry: median, p99, min and mean seconds plus case-specific fields."""
+    return dict(seconds=float(np.median(times)), p99_seconds=float(np.percentile(times, 99)),
+                min_seconds=float(times.min()), mean_seconds=float(times.mean()), repeat=len(times), **extra)
+
+
+def machine_info():
+    """Interpreter, library versions, CPU and memory of this machine, plus the git commit."""
+    import sklearn
+    info = {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'cpu_count': os.cpu_count(),
+        'cpu_model': platform.processor() or None,
+        'memory_gb': None,
+        'git_commit': None,
+    }
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    info['cpu_model'] = line.split(':', 1)[1].strip()
+                    break
+        with open('/proc/meminfo') as f:
+            info['memory_gb'] = round(int(f.readline().split()[1]) / 2**20, 1)
+    except OSError:
+        pass
+    try:
+        info['git_commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+
+def bench_predict_er(results, repeat):
+    from model_registry import get_model, serving_model_path
+    from predict import predict_er
+
+    patients = [dict(zip(FEATURES, row.tolist())) for row in random_patients(repeat, seed=1)]
+    rows = iter(patients * 2)
+    times = timings(lambda: predict_er(next(rows)), repeat)
+    results['predict_er'] = summarize(times, artifact=os.path.basename(serving_model_path()),
+                                      model=type(get_model(serving_model_path())).__name__)
+
+
+def bench_explain(results, repeat):
+    from model_registry import get_model, serving_model_path
+    from predict import predict_er
+
+    model = get_model(serving_model_path())
+    patients = [dict(zip(FEATURES, row.tolist())) for row in random_patients(repeat, seed=1)]
+    rows = iter(patients * 2)
+    # Full predict_er call with explanations; compare with the predict_er case for the overhead
+    results['predict_er[explain]'] = summarize(timings(lambda: predict_er(next(rows), model=model, explain=True),
+                                                       repeat))
+
+
+def bench_get_recommendations(results, repeat):
+    from rules import get_recommendations
+
+    patients = [dict(zip(FEATURES, row.tolist())) for row in random_patients(repeat, seed=2)]
+    rows = iter(patients * 2)
+    results['get_recommendations'] = summarize(timings(lambda: get_recommendations(next(rows)), repeat))
+
+
+def bench_predict_er_batch(results, repeat, sizes):
+    from predict import predict_er_batch
+
+    for n in sizes:
+        X = random_patients(n, seed=3)
+        # Large batches take seconds each; a few repeats are enough
+        times = timings(lambda: predict_er_batch(X), max(1, min(repeat, 100_000 // n)))
+        entry = summarize(times, rows=n)
+        entry['rows_per_second'] = n / entry['seconds']
+        results[f'predict_er_batch[{n}]'] = entry
+
+
+def bench_model_load(results, repeat):
+    from model_registry import MODEL_PATH, flat_model_path, load_artifact, mmap_model_path
+
+    for label, path in (('pkl', MODEL_PATH), ('npz', flat_model_path(MODEL_PATH)),
+                        ('mmap', mmap_model_path(MODEL_PATH))):
+        if os.path.exists(path):
+            # load_artifact bypasses the registry cache, so every call reads the file
+            results[f'model_load[{label}]'] = summarize(timings(lambda: load_artifact(path), repeat),
+                                                        artifact=os.path.basename(path))
+
+
+def bench_train(results, sizes):
+    from sklearn.ensemble import RandomForestClassifier
+    from synthetic import generate
+
+    for n in sizes:
+        data = next(generate(n, chunk_size=n, seed=42))
+        X = np.column_stack([data[f] for f in FEATURES]).astype(np.float64)
+        y = data['needs_er']
+
+        def fit():
+            # Same settings as scripts/train_model.py
+            RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced',
+                                   n_jobs=-1).fit(X, y)
+        results[f'train[{n}]'] = summarize(timings(fit, 1, warmup=0), rows=n, n_estimators=100)
+
+
+def run(args):
+    import warnings
+    # Models pickled by another sklearn release warn on every load
+    warnings.filterwarnings('ignore', category=UserWarning)
+
+    cases = args.case or CASES
+    repeat = 50 if args.quick else args.repeat
+    batch_sizes = [n for n in args.batch_sizes if not args.quick or n <= 10_000]
+    train_sizes = args.train_sizes[:1] if args.quick else args.train_sizes
+
+    results = {}
+    started = time.perf_counter()
+    for case in cases:
+        print(f"Running {case}...", flush=True)
+        if case == 'predict_er':
+            bench_predict_er(results, repeat)
+        elif case == 'explain':
+            bench_explain(results, repeat)
+        elif case == 'get_recommendations':
+            bench_get_recommendations(results, repeat)
+        elif case == 'predict_er_batch':
+            bench_predict_er_batch(results, repeat, batch_sizes)
+        elif case == 'model_load':
+            bench_model_load(results, max(3, repeat // 50))
+        elif case == 'train':
+            bench_train(results, train_sizes)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'duration_seconds': time.perf_counter() - started,
+        'machine': machine_info(),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'case':<28}{'median':>12}{'p99':>12}  extra")
+    for name, entry in results.items():
+        extra = f"{entry['rows_per_second']:,.0f} rows/s" if 'rows_per_second' in entry else ''
+        print(f"{name:<28}{format_seconds(entry['seconds']):>12}{format_seconds(entry['p99_seconds']):>12}  {extra}")
+    print(f"\nResults saved to {args.output}")
+
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Compare two saved runs case by case.
+
+    Args:
+        baseline: Report loaded from the baseline JSON.
+        current: Report loaded from the new run.
+        threshold: Allowed slowdown in percent before a case counts as a regression.
+
+    Returns:
+        List of (case, baseline_seconds, current_seconds, change_percent, status)
+        where status is 'regression', 'improvement', 'ok', 'new' or 'missing'.
+    """
+    rows = []
+    for name in sorted(set(baseline['results']) | set(current['results'])):
+        old, new = baseline['results'].get(name), current['results'].get(name)
+        if old is None or new is None:
+            rows.append((name, old and old['seconds'], new and new['seconds'], None,
+                         'new' if old is None else 'missing'))
+            continue
+        change = (new['seconds'] / old['seconds'] - 1) * 100
+        status = 'regression' if change > threshold else 'improvement' if change < -threshold else 'ok'
+        rows.append((name, old['seconds'], new['seconds'], change, status))
+    return rows
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    for key in ('cpu_model', 'cpu_count', 'python', 'numpy', 'sklearn'):
+        if baseline['machine'].get(key) != current['machine'].get(key):
+            print(f"Warning: {key} differs ({baseline['machine'].get(key)} vs {current['machine'].get(key)}); "
+                  "timings may not be comparable")
+
+    rows = compare_results(baseline, current, args.threshold)
+    print(f"{'case':<28}{'baseline':>12}{'current':>12}{'change':>10}  status")
+    for name, old, new, change, status in rows:
+        print(f"{name:<28}{format_seconds(old) if old else '-':>12}{format_seconds(new) if new else '-':>12}"
+              f"{f'{change:+.1f}%' if change is not None else '-':>10}  {status}")
+
+    regressions = [row[0] for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:g}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='Run the benchmarks and save the results')
+    run_parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Results JSON')
+    run_parser.add_argument('--case', action='append', choices=CASES, help='Run only this case (repeatable)')
+    run_parser.add_argument('--repeat', type=int, default=500, help='Calls per single-row case')
+    run_parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    run_parser.add_argument('--train-sizes', type=int, nargs='+', default=TRAIN_SIZES)
+    run_parser.add_argument('--quick', action='store_true',
+                            help='Fewer repeats, batches up to 10k rows and only the first training size')
+
+    compare_parser = sub.add_parser('compare', help='Flag regressions against a saved baseline')
+    compare_parser.add_argument('baseline', help='Baseline results JSON')
+    compare_parser.add_argument('current', nargs='?', default=DEFAULT_OUTPUT, help='Results JSON to check')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help='Allowed slowdown in percent (default: 10)')
+
+    args = parser.parse_args()
+    run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,51 @@
+import argparse
 import os
+import sys
 import pandas as pd
 from sklearn.metrics import accuracy_score, recall_score, precision_score, confusion_matrix
 import joblib
 
 # Get the directory of the current script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "src"))
+
+from evaluation import (average_precision, bootstrap_ci, metrics_at, plot_curves, roc_auc,  # noqa: E402
+                        threshold_sweep, write_metrics_json, write_sweep_csv)
+from dataset import open_dataset  # noqa: E402
+from features import FEATURES  # noqa: E402
+from model_registry import MODEL_PATH as SERVING_MODEL_PATH  # noqa: E402
+from predict import predict_er_batch  # noqa: E402
 
 # Define paths relative to project root
-X_TEST_PATH = os.path.join(SCRIPT_DIR, "..", "data", "X_test.csv")
-Y_TEST_PATH = os.path.join(SCRIPT_DIR, "..", "data", "y_test.csv")
+DATA_PATH = os.path.join(SCRIPT_DIR, "..", "data", "er_data.csv")
 MODEL_PATH = os.path.join(SCRIPT_DIR, "..", "model", "triage_model.pkl")
+EVAL_DIR = os.path.join(SCRIPT_DIR, "..", "evaluation")
+
+parser = argparse.ArgumentParser(description="Evaluate the triage model on the held-out test set.")
+parser.add_argument("--pipeline", action="store_true",
+                    help="Evaluate what patients receive: er_model.pkl plus the rule multipliers (predict_er_batch)")
+parser.add_argument("--model", default=None,
+                    help="Model to evaluate (default: triage_model.pkl, or er_model.pkl with --pipeline)")
+parser.add_argument("--data", default=DATA_PATH, help="Labelled CSV the split was made from (default: data/er_data.csv)")
+parser.add_argument("--split", default="default", help="Evaluate on the test side of this split (default: default)")
+parser.add_argument("--bootstrap", type=int, default=1000,
+                    help="Bootstrap resamples for sensitivity/specificity CIs (0 disables)")
+parser.add_argument("--workers", type=int, default=None, help="Processes for bootstrap resampling")
+parser.add_argument("--seed", type=int, default=42, help="Bootstrap seed")
+args = parser.parse_args()
+MODEL_PATH = args.model or (SERVING_MODEL_PATH if args.pipeline else MODEL_PATH)
+SUFFIX = "_pipeline" if args.pipeline else ""
 
-# Load data
+# Load the held-out rows from the columnar cache of the data
 try:
-    df = pd.read_csv(X_TEST_PATH)
-    y_test = pd.read_csv(Y_TEST_PATH)['needs_er']
-    print(f"Test data loaded from {X_TEST_PATH} and {Y_TEST_PATH}")
-except FileNotFoundError:
-    print(f"Error: Test data files not found")
+    data = open_dataset(args.data)
+    test_idx = data.split(args.split)[1]
+    print(f"Test data loaded from {args.data} (split '{args.split}', {len(test_idx)} rows)")
+except (FileNotFoundError, ValueError) as e:
+    print(f"Error: {e}")
+    exit(1)
+if data.y is None:
+    print(f"Error: {args.data} has no needs_er column")
     exit(1)
 
 # Load model
@@ -28,21 +56,21 @@ except FileNotFoundError:
     print(f"Error: Model file not found")
     exit(1)
 
-# Define features in the exact order used during training
-features = [
-    'SpO2', 'blood_pressure', 'temperature', 'chest_pain', 'shortness_of_breath',
-    'heart_disease', 'age', 'unilateral_weakness', 'trouble_speaking', 'trouble_walking',
-    'syncope', 'pulse', 'blood_sugar', 'diabetes', 'mode_of_arrival', 'respiratory_rate',
-    'altered_mental_status'
-]
-X_test = df[features]  # Reorder columns to match training order
+# Canonical feature order, as in training
+X_test = pd.DataFrame(data.X[test_idx], columns=FEATURES)
+y_test = pd.Series(data.y[test_idx], name='needs_er')
 
-# Predict
+# Score once; every metric below is derived from these probabilities
 try:
-    y_pred = model.predict(X_test)
+    if args.pipeline:
+        y_prob = predict_er_batch(X_test, model=model)[0]  # Adjusted probability served to patients
+        print("Evaluating the serving pipeline (model + rule multipliers)")
+    else:
+        y_prob = model.predict_proba(X_test)[:, 1]
 except ValueError as e:
     print(f"Prediction error: {e}")
     exit(1)
+y_pred = (y_prob > 0.5).astype(int)  # Same decision as model.predict
 
 # Calculate metrics
 accuracy = accuracy_score(y_test, y_pred)
@@ -52,31 +80,64 @@ conf_matrix = confusion_matrix(y_test, y_pred)
 tn, fp, fn, tp = conf_matrix.ravel()
 specificity = tn / (tn + fp) if (tn + fp) > 0 else 0  # Avoid division by zero
 
+# Sweep every distinct threshold from one sort of the probabilities
+sweep = threshold_sweep(y_test, y_prob)
+thresholds = [metrics_at(sweep, thresh) for thresh in (0.5, 0.7, 0.9)]
+
+# Bootstrap confidence intervals, resamples spread over a process pool
+ci = bootstrap_ci(y_test, y_pred, n_resamples=args.bootstrap, seed=args.seed, workers=args.workers) \
+    if args.bootstrap > 0 else None
+
 # Print metrics
 print(f"Accuracy: {accuracy:.3f}")
 print(f"Sensitivity (Recall): {sensitivity:.3f}")
 print(f"Specificity: {specificity:.3f}")
 print(f"Precision: {precision:.3f}")
 print(f"Confusion Matrix:\n{conf_matrix}")
+if ci is not None:
+    print(f"95% CI ({args.bootstrap} bootstrap resamples): "
+          f"Sensitivity [{ci['sensitivity'][0]:.3f}, {ci['sensitivity'][1]:.3f}], "
+          f"Specificity [{ci['specificity'][0]:.3f}, {ci['specificity'][1]:.3f}]")
+print(f"ROC AUC: {roc_auc(sweep):.3f}, Average precision: {average_precision(sweep):.3f}")
+for row in thresholds:
+    print(f"Threshold {row['threshold']}: Sensitivity = {row['sensitivity']:.3f}, "
+          f"Specificity = {row['specificity']:.3f}")
 
 # Save metrics
-os.makedirs(os.path.join(SCRIPT_DIR, "..", "evaluation"), exist_ok=True)
-with open(os.path.join(SCRIPT_DIR, "..", "evaluation", "metrics.txt"), "w") as f:
+os.makedirs(EVAL_DIR, exist_ok=True)
+METRICS_TXT = os.path.join(EVAL_DIR, f"metrics{SUFFIX}.txt")
+with open(METRICS_TXT, "w") as f:
     f.write(f"Accuracy: {accuracy:.3f}\n")
     f.write(f"Sensitivity (Recall): {sensitivity:.3f}\n")
     f.write(f"Specificity: {specificity:.3f}\n")
     f.write(f"Precision: {precision:.3f}\n")
     f.write(f"Confusion Matrix:\n{conf_matrix}\n")
-print(f"Metrics saved to {os.path.join(SCRIPT_DIR, '..', 'evaluation', 'metrics.txt')}")
+    if ci is not None:
+        f.write(f"95% CI ({args.bootstrap} bootstrap resamples): "
+                f"Sensitivity [{ci['sensitivity'][0]:.3f}, {ci['sensitivity'][1]:.3f}], "
+                f"Specificity [{ci['specificity'][0]:.3f}, {ci['specificity'][1]:.3f}]\n")
+    for row in thresholds:
+        f.write(f"\nThreshold {row['threshold']}: Sensitivity = {row['sensitivity']:.3f}, "
+                f"Specificity = {row['specificity']:.3f}\n")
+print(f"Metrics saved to {METRICS_TXT}")
 
-# Optional threshold analysis (if model provides probabilities)
-if hasattr(model, 'predict_proba'):
-    thresholds = [0.5, 0.7, 0.9]
-    for thresh in thresholds:
-        y_pred_prob = model.predict_proba(X_test)[:, 1]
-        y_pred_thresh = (y_pred_prob >= thresh).astype(int)
-        sensitivity_thresh = recall_score(y_test, y_pred_thresh)
-        specificity_thresh = tn / (tn + fp) if (tn + fp) > 0 else 0  # Recompute based on threshold
-        print(f"Threshold {thresh}: Sensitivity = {sensitivity_thresh:.3f}, Specificity = {specificity_thresh:.3f}")
-        with open(os.path.join(SCRIPT_DIR, "..", "evaluation", "metrics.txt"), "a") as f:
-            f.write(f"\nThreshold {thresh}: Sensitivity = {sensitivity_thresh:.3f}, Specificity = {specificity_thresh:.3f}\n")
\ No newline at end of file
+# Machine-readable metrics and curves
+write_metrics_json(os.path.join(EVAL_DIR, f"metrics{SUFFIX}.json"), {
+    'model': os.path.basename(MODEL_PATH),
+    'pipeline': bool(args.pipeline),
+    'n_samples': int(len(y_test)),
+    'accuracy': float(accuracy),
+    'sensitivity': float(sensitivity),
+    'specificity': float(specificity),
+    'precision': float(precision),
+    'confusion_matrix': conf_matrix.tolist(),
+    'roc_auc': roc_auc(sweep),
+    'average_precision': average_precision(sweep),
+    'bootstrap': None if ci is None else {'resamples': args.bootstrap, 'seed': args.seed,
+                                          'sensitivity_ci95': ci['sensitivity'],
+                                          'specificity_ci95': ci['specificity']},
+}, thresholds)
+write_sweep_csv(sweep, os.path.join(EVAL_DIR, f"threshold_sweep{SUFFIX}.csv"))
+plot_curves(sweep, os.path.join(EVAL_DIR, f"roc_curve{SUFFIX}.png"), os.path.join(EVAL_DIR, f"pr_curve{SUFFIX}.png"))
+print(f"Threshold sweep ({len(sweep['threshold'])} thresholds), metrics{SUFFIX}.json and ROC/PR curves "
+      f"saved to {EVAL_DIR}")
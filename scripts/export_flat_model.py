@@ -0,0 +1,35 @@
+import argparse
+import os
+import sys
+import joblib
+
+# Get the directory of the current script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "src"))
+
+from flat_forest import FlatForest  # noqa: E402
+from model_registry import MODEL_PATH, flat_model_path, mmap_model_path  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Export a fitted RandomForest .pkl to flattened node arrays.")
+parser.add_argument("--model-path", default=MODEL_PATH, help="Model to export (default: model/er_model.pkl)")
+parser.add_argument("--mmap", action="store_true",
+                    help="Also write the memory-mapped directory format (<model>_flat/) shared by worker processes")
+args = parser.parse_args()
+
+# Load model
+try:
+    model = joblib.load(args.model_path)
+    print(f"Model loaded from {args.model_path}")
+except FileNotFoundError:
+    print(f"Error: Model file not found")
+    exit(1)
+
+# Export
+flat = FlatForest.from_sklearn(model)
+flat_path = flat_model_path(args.model_path)
+flat.save(flat_path)
+print(f"Flattened forest saved to {flat_path}")
+if args.mmap:
+    mmap_path = mmap_model_path(args.model_path)
+    flat.save_dir(mmap_path)
+    print(f"Memory-mapped forest saved to {mmap_path}")
@@ -1,54 +1,48 @@
+import argparse
+import os
+import sys
 import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-import os
 import joblib
 
-# Set random seed for reproducibility
-np.random.seed(42)
+# Get the directory of the current script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "src"))
+
+from dataset import open_dataset  # noqa: E402
+from features import FEATURES  # noqa: E402
+
+DATA_PATH = os.path.join(SCRIPT_DIR, "..", "data", "er_data.csv")
+SCALER_DIR = os.path.join(SCRIPT_DIR, "..", "scaler")
 
-# Load the dataset
+parser = argparse.ArgumentParser(description="(Re)make a train/test split of er_data.csv and fit the scaler on its train side.")
+parser.add_argument("--data", default=DATA_PATH, help="Labelled CSV (default: data/er_data.csv)")
+parser.add_argument("--split", default="default", help="Split name (default: default)")
+parser.add_argument("--test-size", type=float, default=0.2, help="Fraction of rows held out (default: 0.2)")
+parser.add_argument("--seed", type=int, default=42, help="Shuffle seed (default: 42)")
+args = parser.parse_args()
+
+# Load the dataset (columnar cache next to the CSV, rebuilt when the CSV changes)
 try:
-    df = pd.read_csv("/Users/nn/PycharmProjects/triage-beta-tool/data/er_data.csv")
-except FileNotFoundError:
-    print("Error: er_data.csv not found in triage-beta-tool/data/")
+    data = open_dataset(args.data)
+except (FileNotFoundError, ValueError) as e:
+    print(f"Error: {e}")
+    exit(1)
+if data.y is None:
+    print(f"Error: {args.data} has no needs_er column")
     exit(1)
 
-# Define features and target (using needs_er from er_data.csv)
-features = [
-    'SpO2', 'blood_pressure', 'temperature', 'pulse', 'blood_sugar',
-    'respiratory_rate', 'chest_pain', 'shortness_of_breath', 'heart_disease',
-    'age', 'unilateral_weakness', 'trouble_speaking', 'trouble_walking',
-    'syncope', 'diabetes', 'altered_mental_status', 'mode_of_arrival'
-]
-X = df[features]
-y = df["needs_er"]
-
-# Split into training and testing sets (80% train, 20% test)
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
+# Split into training and testing sets (80% train, 20% test), stored as row indices in the cache
+train_idx, test_idx = data.make_split(args.split, test_size=args.test_size, seed=args.seed, stratify=True)
 
 # Scale continuous features
 scaler = StandardScaler()
 continuous_features = ['SpO2', 'blood_pressure', 'temperature', 'pulse', 'blood_sugar', 'respiratory_rate', 'age']
-X_train_scaled = X_train.copy()
-X_test_scaled = X_test.copy()
-X_train_scaled[continuous_features] = scaler.fit_transform(X_train[continuous_features])
-X_test_scaled[continuous_features] = scaler.transform(X_test[continuous_features])
-
-# Save unscaled test data for evaluate_model.py
-os.makedirs("/Users/nn/PycharmProjects/triage-beta-tool/data", exist_ok=True)
-X_test.to_csv("/Users/nn/PycharmProjects/triage-beta-tool/data/X_test.csv", index=False)
-y_test.to_csv("/Users/nn/PycharmProjects/triage-beta-tool/data/y_test.csv", index=False)
-
-# Optional: Save scaled data for reference
-X_test_scaled.to_csv("/Users/nn/PycharmProjects/triage-beta-tool/data/X_test_scaled.csv", index=False)
-joblib.dump(scaler, "/Users/nn/PycharmProjects/triage-beta-tool/scaler/scaler.pkl")
-
-print("Test data saved to triage-beta-tool/data/X_test.csv and y_test.csv")
-print("Scaled test data saved to triage-beta-tool/data/X_test_scaled.csv")
+columns = [FEATURES.index(f) for f in continuous_features]
+scaler.fit(pd.DataFrame(data.X[train_idx][:, columns], columns=continuous_features))
+
+os.makedirs(SCALER_DIR, exist_ok=True)
+joblib.dump(scaler, os.path.join(SCALER_DIR, "scaler.pkl"))
+
+print(f"Split '{args.split}' saved to {data.path}: {len(train_idx)} train / {len(test_idx)} test rows")
 print("Scaler saved to triage-beta-tool/scaler/scaler.pkl")
-print("X_test shape:", X_test.shape)
-print("y_test shape:", y_test.shape)
\ No newline at end of file
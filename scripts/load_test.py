@@ -0,0 +1,96 @@
+import argparse
+import http.client
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Get the directory of the current script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(SCRIPT_DIR, "..", "data", "er_data.csv")
+
+parser = argparse.ArgumentParser(description="Offline load generator for src/service/service.py.")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8000)
+parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent client connections")
+parser.add_argument("--requests", type=int, default=2000, help="Total number of requests")
+parser.add_argument("--batch-size", type=int, default=0,
+                    help="Patients per /score_batch request (0 sends single-patient /score requests)")
+args = parser.parse_args()
+
+# Load patients to replay
+try:
+    patients = pd.read_csv(DATA_PATH).drop(columns=["needs_er"]).to_dict(orient="records")
+    print(f"Replaying patients from {DATA_PATH}")
+except FileNotFoundError:
+    print(f"Error: {DATA_PATH} not found")
+    exit(1)
+
+if args.batch_size > 0:
+    path = "/score_batch"
+    bodies = [json.dumps({"patients": [patients[(i * args.batch_size + j) % len(patients)]
+                                       for j in range(args.batch_size)]})
+              for i in range(min(args.requests, 100))]
+else:
+    path = "/score"
+    bodies = [json.dumps(p) for p in patients]
+
+latencies = []
+errors = []
+lock = threading.Lock()
+per_worker = [args.requests // args.concurrency + (1 if i < args.requests % args.concurrency else 0)
+              for i in range(args.concurrency)]
+
+
+def worker(worker_id: int, n: int) -> None:
+    conn = http.client.HTTPConnection(args.host, args.port, timeout=30)
+    local = []
+    failed = 0
+    for i in range(n):
+        body = bodies[(worker_id + i * args.concurrency) % len(bodies)]
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                failed += 1
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(args.host, args.port, timeout=30)
+        local.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+        latencies.extend(local)
+        errors.append(failed)
+
+
+# Check the service is up
+try:
+    conn = http.client.HTTPConnection(args.host, args.port, timeout=5)
+    conn.request("GET", "/health")
+    print(f"Health: {conn.getresponse().read().decode('utf-8')}")
+    conn.close()
+except OSError as e:
+    print(f"Error: service not reachable at {args.host}:{args.port} ({e})")
+    exit(1)
+
+# Run load
+threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_worker)]
+start = time.perf_counter()
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - start
+
+# Report
+lat_ms = np.array(latencies) * 1e3
+rows = len(lat_ms) * max(args.batch_size, 1)
+print(f"Requests: {len(lat_ms)} to {path}, concurrency {args.concurrency}, errors {sum(errors)}")
+print(f"Throughput: {len(lat_ms) / elapsed:.1f} req/s, {rows / elapsed:.1f} patients/s")
+print(f"Latency (ms): p50 {np.percentile(lat_ms, 50):.2f}, p95 {np.percentile(lat_ms, 95):.2f}, "
+      f"p99 {np.percentile(lat_ms, 99):.2f}, max {lat_ms.max():.2f}")
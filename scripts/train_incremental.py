@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import pandas as pd
+import joblib
+
+# Get the directory of the current script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "src"))
+
+from dataset import open_dataset  # noqa: E402
+from evaluation import metrics_at, roc_auc, threshold_sweep  # noqa: E402
+from features import FEATURES  # noqa: E402
+from incremental import ColumnStore, IncrementalTrainer, full_refit  # noqa: E402
+
+# Define paths relative to project root
+DATA_PATH = os.path.join(SCRIPT_DIR, "..", "data", "er_data.csv")
+STORE_DIR = os.path.join(SCRIPT_DIR, "..", "data", "store")
+CHECKPOINT_DIR = os.path.join(SCRIPT_DIR, "..", "model", "incremental")
+
+
+def split_source(data):
+    """Identity of the dataset's default split, recorded with the rows seeded from its train side."""
+    entry = data.manifest['splits']['default']
+    return {'data': data.manifest['source'], 'split': 'default', 'side': 'train',
+            'test_size': entry['test_size'], 'seed': entry['seed']}
+
+
+parser = argparse.ArgumentParser(description="Incrementally retrain the ER RandomForest on newly appended rows.")
+parser.add_argument("--append", nargs="*", default=[],
+                    help="CSV files of labelled intake rows (17 features + needs_er) to add to the store first")
+parser.add_argument("--store", default=STORE_DIR, help="Columnar row store (default: data/store)")
+parser.add_argument("--checkpoint", default=CHECKPOINT_DIR, help="Checkpoint directory (default: model/incremental)")
+parser.add_argument("--initial-trees", type=int, default=100, help="Trees in the first fit (default: 100)")
+parser.add_argument("--trees", type=int, default=20, help="Trees added per update (default: 20)")
+parser.add_argument("--max-trees", type=int, default=200,
+                    help="Retire the oldest tree segments beyond this many trees (0 keeps all; default: 200)")
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--compare-full", action="store_true",
+                    help="Also refit from scratch on all store rows and compare time and metrics on the "
+                         "held-out test split")
+parser.add_argument("--drift-tolerance", type=float, default=0.02,
+                    help="Largest allowed metric difference between incremental and full refit (default: 0.02)")
+parser.add_argument("--export", default=None, help="Also save the updated model to this .pkl path")
+args = parser.parse_args()
+
+store = ColumnStore(args.store)
+if store.n_rows == 0 and not args.append:
+    # Seed an empty store with the train side of the default split, so its test side stays a holdout
+    try:
+        data = open_dataset(DATA_PATH)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        exit(1)
+    if 'default' in data.manifest['splits']:
+        first, end = store.append(data.frame(data.split()[0]), source=split_source(data))
+        print(f"Appended rows {first}-{end - 1} from the train side of {DATA_PATH}")
+    else:
+        first, end = store.append(data.frame())
+        print(f"Appended rows {first}-{end - 1} from {DATA_PATH} "
+              f"(no split yet, so --compare-full has no holdout to use)")
+for path in args.append:
+    try:
+        first, end = store.append(pd.read_csv(path))
+    except FileNotFoundError:
+        print(f"Error: {path} not found")
+        exit(1)
+    print(f"Appended rows {first}-{end - 1} from {path}")
+
+trainer = IncrementalTrainer(args.checkpoint, trees_per_update=args.trees, max_trees=args.max_trees or None,
+                             initial_trees=args.initial_trees, seed=args.seed)
+print(f"Store has {store.n_rows} rows; checkpoint watermark at {trainer.watermark}")
+try:
+    summary = trainer.update(store)
+except ValueError as e:
+    print(f"Error: {e}")
+    exit(1)
+if summary['rows_used'] == 0:
+    print("No new rows since the last checkpoint; model unchanged")
+else:
+    print(f"Trained {summary['trees_added']} trees on {summary['rows_used']} new rows in "
+          f"{summary['fit_seconds']:.2f}s (retired {summary['trees_retired']}, {summary['n_trees']} trees total); "
+          f"watermark now {summary['watermark']}")
+
+if args.export and trainer.checkpoint is not None:
+    joblib.dump(trainer.load_model(), args.export)
+    print(f"Model saved to {args.export}")
+
+if args.compare_full:
+    try:
+        data = open_dataset(DATA_PATH)
+        X_test, y_test = data.subset(data.split()[1])
+    except (FileNotFoundError, ValueError):
+        print("Error: holdout split not found; generate it with generate_test_data.py")
+        exit(1)
+    # Both models train on every store row, so the store must have been seeded from this split's train side
+    parts = store.manifest['parts']
+    if not parts or parts[0].get('source') != split_source(data):
+        print(f"Error: {args.store} was not seeded from the train side of the current split, so it may "
+              f"contain holdout rows; start from an empty store after generate_test_data.py")
+        exit(1)
+    X_test = pd.DataFrame(X_test, columns=FEATURES)
+
+    incremental_model = trainer.load_model()
+    full_model, full_seconds = full_refit(store, len(incremental_model.estimators_), seed=args.seed)
+    print(f"\nRetrain time: incremental {summary['fit_seconds']:.2f}s vs full refit {full_seconds:.2f}s "
+          f"on {store.n_rows} rows")
+
+    rows = {}
+    for label, model in (('incremental', incremental_model), ('full refit', full_model)):
+        sweep = threshold_sweep(y_test, model.predict_proba(X_test)[:, 1])
+        at = metrics_at(sweep, 0.5)
+        rows[label] = {'sensitivity': at['sensitivity'], 'specificity': at['specificity'], 'roc_auc': roc_auc(sweep)}
+    print(f"{'metric':<14}{'incremental':>12}{'full refit':>12}{'diff':>9}")
+    drifted = []
+    for metric in ('sensitivity', 'specificity', 'roc_auc'):
+        a, b = rows['incremental'][metric], rows['full refit'][metric]
+        print(f"{metric:<14}{a:12.3f}{b:12.3f}{a - b:+9.3f}")
+        if abs(a - b) > args.drift_tolerance:
+            drifted.append(metric)
+    if drifted:
+        print(f"Drift check FAILED: {', '.join(drifted)} differ by more than {args.drift_tolerance:g}; "
+              f"consider a full retrain with train_model.py")
+        exit(2)
+    print(f"Drift check passed (tolerance {args.drift_tolerance:g})")
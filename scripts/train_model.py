@@ -1,40 +1,75 @@
+import argparse
 import os
+import sys
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 import joblib
 
 # Get the directory of the current script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "src"))
+
+import drift  # noqa: E402
+from dataset import open_dataset  # noqa: E402
+from features import FEATURES  # noqa: E402
+from flat_forest import FlatForest  # noqa: E402
+from model_registry import flat_model_path, mmap_model_path  # noqa: E402
 
 # Define paths relative to project root
 DATA_PATH = os.path.join(SCRIPT_DIR, "..", "data", "er_data.csv")
 MODEL_PATH = os.path.join(SCRIPT_DIR, "..", "model", "triage_model.pkl")  # Changed to triage_model.pkl
 
-# Load data
+parser = argparse.ArgumentParser(description="Train the ER RandomForest model.")
+parser.add_argument("--model-path", default=MODEL_PATH, help="Where to save the fitted model (.pkl)")
+parser.add_argument("--export-flat", action="store_true",
+                    help="Also write the flattened forest (<model>_flat.npz) used for fast single-row scoring")
+parser.add_argument("--export-mmap", action="store_true",
+                    help="Also write the memory-mapped forest directory (<model>_flat/: .npy arrays + header.json) "
+                         "that serving workers share through the page cache")
+parser.add_argument("--split", default=None,
+                    help="Train only on the train side of this split (see generate_test_data.py; default: all rows)")
+args = parser.parse_args()
+MODEL_PATH = args.model_path
+
+# Load data (from the columnar cache in data/cache/, parsed from the CSV only when it changes)
 try:
-    df = pd.read_csv(DATA_PATH)
-    print(f"Data loaded from {DATA_PATH}")
-except FileNotFoundError:
-    print(f"Error: {DATA_PATH} not found")
+    data = open_dataset(DATA_PATH)
+    rows = data.split(args.split)[0] if args.split else slice(None)
+    print(f"Data loaded from {DATA_PATH} ({len(data.X[rows])} rows)")
+except (FileNotFoundError, ValueError) as e:
+    print(f"Error: {e}")
     exit(1)
 
-# Features (17 total)
-features = [
-    'SpO2', 'blood_pressure', 'temperature', 'chest_pain', 'shortness_of_breath',
-    'heart_disease', 'age', 'unilateral_weakness', 'trouble_speaking', 'trouble_walking',
-    'syncope', 'pulse', 'blood_sugar', 'diabetes', 'mode_of_arrival', 'respiratory_rate',
-    'altered_mental_status'
-]
-X = df[features]
-y = df['needs_er']
+# The 17 features in canonical order; a DataFrame so the model records their names
+X = pd.DataFrame(data.X[rows], columns=FEATURES)
+y = data.y[rows]
 
 # Train model
-model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
+# All cores for fitting; the forest depends on random_state only, not on n_jobs
+model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced', n_jobs=-1)
 model.fit(X, y)
+model.set_params(n_jobs=None)  # Single-row serving is slower with a thread pool per call
 print("Model trained successfully")
 print(f"Fitted features: {model.feature_names_in_}")  # Debug feature names
 
 # Save model
 os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
 joblib.dump(model, MODEL_PATH)
-print(f"Model saved to {MODEL_PATH}")
\ No newline at end of file
+print(f"Model saved to {MODEL_PATH}")
+
+# Training-data profile that the drift monitor compares live traffic against
+reference_file = drift.reference_path(MODEL_PATH)
+drift.save_reference(drift.build_reference(X.to_numpy()), reference_file)
+print(f"Drift reference saved to {reference_file}")
+
+# Optional: export flattened node arrays for the NumPy inference engine
+if args.export_flat or args.export_mmap:
+    flat = FlatForest.from_sklearn(model)
+if args.export_flat:
+    flat_path = flat_model_path(MODEL_PATH)
+    flat.save(flat_path)
+    print(f"Flattened forest saved to {flat_path}")
+if args.export_mmap:
+    mmap_path = mmap_model_path(MODEL_PATH)
+    flat.save_dir(mmap_path)
+    print(f"Memory-mapped forest saved to {mmap_path}")
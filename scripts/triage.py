@@ -0,0 +1,302 @@
+"""
+Command-line entry point for bulk triage tasks.
+
+Usage:
+    python scripts/triage.py score INPUT -o OUTPUT [--chunk-size N] [--workers N] [--unordered]
+                                   [--invalid skip|quarantine|score] [--quarantine PATH]
+    python scripts/triage.py profile [--top N] [--json PATH] [--max-seconds S]
+    python scripts/triage.py audit LOG [--export PATH] [--replay] [--model PATH]
+    python scripts/triage.py drift INPUT [--reference PATH] [--save-reference PATH]
+    python scripts/triage.py shadow CANDIDATE [--model PATH] [--data CSV] [--split NAME | --all-rows]
+                                              [--live STATS.json ...]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Get the directory of the current script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "src"))
+
+
+def cmd_score(args: argparse.Namespace) -> int:
+    from bulk_score import score_file
+
+    start = time.perf_counter()
+    try:
+        result = score_file(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers,
+                            ordered=not args.unordered, model_file=args.model, invalid=args.invalid,
+                            quarantine_path=args.quarantine)
+    except (FileNotFoundError, ValueError) as e:
+        # Missing input, or columns that do not match the feature schema
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"Scored {result['rows']} rows in {result['chunks']} chunks in {elapsed:.2f}s "
+          f"({result['rows'] / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}")
+    if result['invalid']:
+        action = f"quarantined to {result['quarantine_path']}" if 'quarantine_path' in result else "skipped"
+        print(f"{result['invalid']} invalid rows {action}")
+    return 0
+
+
+def cmd_profile(args: argparse.Namespace) -> int:
+    from startup_profile import profile_startup
+
+    try:
+        report = profile_startup(args.module)
+    except (RuntimeError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{'imports':<24}{report['import_seconds']:8.3f}s")
+    print(f"{'model load':<24}{report['model_load_seconds']:8.3f}s")
+    print(f"{'first prediction':<24}{report['first_predict_seconds']:8.3f}s")
+    print(f"{'total':<24}{report['total_seconds']:8.3f}s")
+    print("\nImport time by package (self):")
+    for name, seconds in list(report['packages'].items())[:args.top]:
+        print(f"  {name:<22}{seconds:8.3f}s")
+    print("\nSlowest modules (self / cumulative):")
+    for row in report['modules'][:args.top]:
+        print(f"  {row['module']:<48}{row['self_seconds']:8.3f}s {row['cumulative_seconds']:8.3f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.json}")
+    if args.max_seconds is not None and report['total_seconds'] > args.max_seconds:
+        print(f"Startup took {report['total_seconds']:.3f}s, over the {args.max_seconds:.3f}s budget")
+        return 1
+    return 0
+
+
+def cmd_audit(args: argparse.Namespace) -> int:
+    import numpy as np
+    from audit_log import read_frame
+    from bulk_score import fired_labels
+    from features import FEATURES
+    from rule_catalogue import CATALOGUE
+
+    try:
+        frame = read_frame(args.log)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    if frame.empty:
+        print(f"No audited decisions in {args.log}")
+        return 0
+
+    fired = frame['fired'].to_numpy()
+    print(f"{len(frame):,} decisions from {frame['time'].min()} to {frame['time'].max()} (UTC)")
+    print(f"Mean probability: base {frame['base_prob'].mean():.3f}, adjusted {frame['probability'].mean():.3f}; "
+          f"adjusted > 0.5: {(frame['probability'] > 0.5).mean():.1%}")
+    print("Rule fire rates:")
+    rates = [((fired >> i) & 1).mean() for i in range(len(CATALOGUE))]
+    for i in np.argsort(rates)[::-1][:args.top]:
+        print(f"  {CATALOGUE[i].label:<44}{rates[i]:8.1%}")
+
+    status = 0
+    if args.replay:
+        from model_registry import get_model, model_path
+        from predict import predict_er_batch
+
+        model = get_model(args.model or model_path())
+        replayed = predict_er_batch(frame[FEATURES].to_numpy(), model=model)[0]
+        changed = np.abs(replayed - frame['probability'].to_numpy()) > 1e-9
+        print(f"Replayed with {args.model or model_path()}: {int(changed.sum()):,} of {len(frame):,} decisions "
+              f"differ (max |delta| {np.abs(replayed - frame['probability'].to_numpy()).max():.4f})")
+        status = 1 if changed.any() else 0
+
+    if args.export:
+        frame['rules'] = fired_labels(fired)
+        if args.export.lower().endswith(('.parquet', '.pq')):
+            frame.to_parquet(args.export, index=False)
+        else:
+            frame.to_csv(args.export, index=False)
+        print(f"Exported to {args.export}")
+    return status
+
+
+def cmd_drift(args: argparse.Namespace) -> int:
+    import drift
+    from features import FEATURES
+
+    def chunks():
+        if os.path.isdir(args.input) or args.input.endswith('.log'):
+            from audit_log import scan
+            for block in scan(args.input):
+                yield block['features']
+        else:
+            from bulk_score import iter_chunks
+            for _, chunk in iter_chunks(args.input, args.chunk_size):
+                yield chunk[FEATURES].to_numpy()
+
+    try:
+        histograms = drift.profile(chunks())
+        if args.save_reference:
+            drift.save_reference(histograms, args.save_reference)
+            print(f"Drift reference of {histograms.n:,} rows saved to {args.save_reference}")
+            return 0
+        from model_registry import model_path
+        reference_file = args.reference or drift.reference_path(model_path())
+        report = drift.compare(drift.load_reference(reference_file), histograms)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{report['n']:,} rows vs {report['reference_n']:,} reference rows ({reference_file}): "
+          f"{report['status']}")
+    print(f"{'feature':<28}{'PSI':>8}{'KS':>8}  status")
+    for name, entry in sorted(report['features'].items(), key=lambda item: -item[1]['psi']):
+        print(f"  {name:<26}{entry['psi']:8.3f}{entry['ks']:8.3f}  {entry['status']}")
+    print(f"{'rule':<44}{'reference':>10}{'current':>10}{'PSI':>8}  status")
+    for label, entry in sorted(report['rules'].items(), key=lambda item: -item[1]['psi'])[:args.top]:
+        print(f"  {label:<42}{entry['reference_rate']:10.1%}{entry['current_rate']:10.1%}{entry['psi']:8.3f}"
+              f"  {entry['status']}")
+    return 1 if report['status'] == 'alert' else 0
+
+
+def cmd_shadow(args: argparse.Namespace) -> int:
+    from dataset import open_dataset
+    from model_registry import model_path
+    from shadow import compare_models
+
+    serving_path = args.model or model_path()
+    try:
+        data = open_dataset(args.data, label=args.label)
+        if args.all_rows:
+            X, y = data.X, data.y
+        else:
+            # The serving model was trained on the other side of the split, so only these rows are unseen
+            X, y = data.subset(data.split(args.split)[1])
+        report = compare_models(serving_path, args.candidate, X, y,
+                                threshold=args.threshold, sample=args.sample)
+        live = []
+        for source in args.live or []:
+            with open(source) as f:
+                live.append(json.load(f))
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    rows_from = args.data if args.all_rows else f"the test side of split '{args.split}' of {args.data}"
+    print(f"{report['rows']:,} patients from {rows_from}: agreement {report['agreement_rate']:.2%} "
+          f"({report['disagreements']} decisions differ at > {args.threshold:g}), "
+          f"mean |delta| {report['mean_abs_delta']:.4f}, max {report['max_abs_delta']:.4f}")
+    print(f"{'':<12}{'sensitivity':>12}{'specificity':>12}{'p50':>10}{'p99':>10}{'batch rows/s':>14}"
+          f"{'load':>9}{'memory':>10}{'disk':>10}")
+    for name, entry in report['models'].items():
+        quality = ''.join(f"{entry[m]:12.3f}" if entry.get(m) is not None else f"{'-':>12}"
+                          for m in ('sensitivity', 'specificity'))
+        print(f"{name:<12}{quality}{entry['p50_seconds'] * 1e3:8.3f}ms{entry['p99_seconds'] * 1e3:8.3f}ms"
+              f"{entry['batch_rows_per_second']:14,.0f}{entry['load_seconds']:8.3f}s"
+              f"{(entry['memory_bytes'] or 0) / 2**20:8.1f}MB{entry['disk_bytes'] / 2**20:8.1f}MB")
+    if 'sensitivity_delta' in report:
+        print(f"Sensitivity delta (candidate - serving): {report['sensitivity_delta']:+.3f}, "
+              f"specificity delta: {report.get('specificity_delta', 0.0):+.3f}")
+    else:
+        print(f"No {args.label} column or no ER cases in the data; sensitivity not compared")
+
+    if live:
+        compared = sum(stats['compared'] for stats in live)
+        disagreed = sum(stats['disagreements'] for stats in live)
+        print(f"Live shadow traffic ({len(live)} stats file(s)): {compared:,} patients compared, "
+              f"agreement {1 - disagreed / compared if compared else float('nan'):.2%}, "
+              f"{sum(stats['dropped'] for stats in live):,} dropped")
+        # Not a model-to-model comparison (different units); the p50/p99 above are the ones to promote on
+        for name, unit in (('serving_request', 'per served request, hooks included'),
+                           ('candidate_batch_row', 'per row of a shadow batch')):
+            total = sum((stats['latency'][name]['mean_seconds'] or 0) * stats['compared'] for stats in live)
+            print(f"  {name:<20} mean {total / compared * 1e3 if compared else float('nan'):.3f} ms {unit}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(report, live=live), f, indent=2)
+        print(f"Report saved to {args.json}")
+    if args.max_sensitivity_drop is not None:
+        if 'sensitivity_delta' not in report:
+            print("Error: --max-sensitivity-drop needs labelled data with ER cases; sensitivity was not compared")
+            return 1
+        drop = -report['sensitivity_delta']
+        if drop > args.max_sensitivity_drop:
+            print(f"Candidate loses {drop:.3f} sensitivity, over the {args.max_sensitivity_drop:g} allowed")
+            return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="triage", description="ER triage tool commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score = commands.add_parser("score", help="Stream-score a CSV/Parquet file through the batch path")
+    score.add_argument("input", help="Input CSV or Parquet file with the 17 feature columns")
+    score.add_argument("-o", "--output", required=True, help="Output CSV or Parquet file")
+    score.add_argument("--chunk-size", type=int, default=100_000, help="Rows per chunk (default: 100000)")
+    score.add_argument("--workers", type=int, default=1, help="Worker processes (default: 1)")
+    score.add_argument("--unordered", action="store_true",
+                       help="Write chunks as they finish instead of in input order")
+    score.add_argument("--model", default=None, help="Model artifact (default: model/er_model.pkl)")
+    score.add_argument("--invalid", choices=["skip", "quarantine", "score"], default="skip",
+                       help="Rows failing schema validation: drop them, write them to --quarantine, "
+                            "or score them unchecked (default: skip)")
+    score.add_argument("--quarantine", default=None,
+                       help="File for rejected rows (default: OUTPUT with .rejected before the extension)")
+    score.set_defaults(func=cmd_score)
+
+    profile = commands.add_parser("profile", help="Profile a cold start: import time per module and model load")
+    profile.add_argument("--module", action="append", default=None,
+                         help="Module to import (repeatable; default: the app's scoring modules)")
+    profile.add_argument("--top", type=int, default=15, help="Rows to show per table (default: 15)")
+    profile.add_argument("--json", default=None, help="Also write the full report to this JSON file")
+    profile.add_argument("--max-seconds", type=float, default=None,
+                         help="Exit with status 1 if the total startup time exceeds this budget")
+    profile.set_defaults(func=cmd_profile)
+
+    audit = commands.add_parser("audit", help="Summarize, export or replay an audit log of scoring decisions")
+    audit.add_argument("log", help="Audit log file or directory (see service.py --audit-log)")
+    audit.add_argument("--export", default=None,
+                       help="Write the decisions (features, probabilities, fired rules) to CSV or Parquet")
+    audit.add_argument("--replay", action="store_true",
+                       help="Re-score the logged inputs and exit with status 1 if any decision changed")
+    audit.add_argument("--model", default=None, help="Model for --replay (default: model/er_model.pkl)")
+    audit.add_argument("--top", type=int, default=20, help="Rules to show (default: 20)")
+    audit.set_defaults(func=cmd_audit)
+
+    drift = commands.add_parser("drift", help="Compare the feature distribution of a file with the training data")
+    drift.add_argument("input", help="CSV or Parquet file with the 17 feature columns, or an audit log")
+    drift.add_argument("--reference", default=None,
+                       help="Drift reference profile (default: model/er_model_drift.json)")
+    drift.add_argument("--save-reference", default=None,
+                       help="Write INPUT's profile as a new reference to this path instead of comparing")
+    drift.add_argument("--chunk-size", type=int, default=100_000, help="Rows per chunk (default: 100000)")
+    drift.add_argument("--top", type=int, default=20, help="Rules to show (default: 20)")
+    drift.set_defaults(func=cmd_drift)
+
+    shadow = commands.add_parser("shadow", help="Compare a candidate model with the serving model before promoting it")
+    shadow.add_argument("candidate", help="Candidate model artifact (.pkl, _flat.npz or _flat/ directory)")
+    shadow.add_argument("--model", default=None, help="Serving model (default: model/er_model.pkl)")
+    shadow.add_argument("--data", default=os.path.join(SCRIPT_DIR, "..", "data", "er_data.csv"),
+                        help="CSV with the 17 feature columns, labelled with --label (default: data/er_data.csv)")
+    shadow.add_argument("--split", default="default",
+                        help="Score the test side of this generate_test_data.py split of --data (default: default)")
+    shadow.add_argument("--all-rows", action="store_true",
+                        help="Score every row of --data instead (for data neither model was trained on)")
+    shadow.add_argument("--label", default="needs_er", help="Label column for sensitivity (default: needs_er)")
+    shadow.add_argument("--threshold", type=float, default=0.5, help="ER decision threshold (default: 0.5)")
+    shadow.add_argument("--sample", type=int, default=500,
+                        help="Patients scored one by one for latency percentiles (default: 500)")
+    shadow.add_argument("--live", nargs="+", default=None,
+                        help="Saved GET /shadow responses from a service run with --shadow-model (one per worker)")
+    shadow.add_argument("--json", default=None, help="Also write the full report to this JSON file")
+    shadow.add_argument("--max-sensitivity-drop", type=float, default=None,
+                        help="Exit with status 1 if the candidate's sensitivity is lower by more than this")
+    shadow.set_defaults(func=cmd_shadow)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import sys
+import time
+import pandas as pd
+import joblib
+
+# Get the directory of the current script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "src"))
+
+from dataset import open_dataset  # noqa: E402
+from features import FEATURES  # noqa: E402
+from flat_forest import FlatForest  # noqa: E402
+from model_registry import flat_model_path, mmap_model_path  # noqa: E402
+from tuning import PARAM_GRID, search  # noqa: E402
+
+# Define paths relative to project root
+DATA_PATH = os.path.join(SCRIPT_DIR, "..", "data", "er_data.csv")
+MODEL_PATH = os.path.join(SCRIPT_DIR, "..", "model", "triage_model.pkl")
+EVAL_DIR = os.path.join(SCRIPT_DIR, "..", "evaluation")
+
+parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for the ER RandomForest.")
+parser.add_argument("--data", default=DATA_PATH, help="Training data CSV with the 17 features and needs_er")
+parser.add_argument("--split", default="default",
+                    help="Tune on the train side of this split from generate_test_data.py, keeping its test side "
+                         "held out for evaluate_model.py (default: default)")
+parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds (default: 5)")
+parser.add_argument("--seed", type=int, default=42, help="Seed for folds and forests (default: 42)")
+parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+parser.add_argument("--min-specificity", type=float, default=0.8,
+                    help="Specificity at which candidates are scored by recall (default: 0.8)")
+parser.add_argument("--min-sensitivity", type=float, default=0.95,
+                    help="Recall the selected (smallest) forest must keep (default: 0.95)")
+parser.add_argument("--n-estimators", type=int, nargs="+", default=PARAM_GRID['n_estimators'])
+parser.add_argument("--max-depth", type=int, nargs="+", default=None,
+                    help="Depths to try; 0 means unlimited (default: unlimited, 8, 12, 16)")
+parser.add_argument("--min-samples-leaf", type=int, nargs="+", default=PARAM_GRID['min_samples_leaf'])
+parser.add_argument("--model-path", default=MODEL_PATH,
+                    help="Where to save the selected model refitted on the train side (.pkl)")
+parser.add_argument("--no-save", action="store_true", help="Only report; do not refit and save the selected model")
+parser.add_argument("--export-flat", action="store_true", help="Also write <model>_flat.npz")
+parser.add_argument("--export-mmap", action="store_true", help="Also write the memory-mapped <model>_flat/ directory")
+args = parser.parse_args()
+
+# Load data
+try:
+    data = open_dataset(args.data)
+    print(f"Data loaded from {args.data}")
+except (FileNotFoundError, ValueError) as e:
+    print(f"Error: {e}")
+    exit(1)
+if data.y is None:
+    print(f"Error: {args.data} has no needs_er column")
+    exit(1)
+try:
+    X, y = data.subset(data.split(args.split)[0])
+except ValueError as e:
+    print(f"Error: {e}")
+    exit(1)
+print(f"Tuning on the {len(X)} train rows of split '{args.split}'")
+
+grid = {
+    'n_estimators': args.n_estimators,
+    'max_depth': [d or None for d in args.max_depth] if args.max_depth else PARAM_GRID['max_depth'],
+    'min_samples_leaf': args.min_samples_leaf,
+    'class_weight': PARAM_GRID['class_weight'],
+}
+n_candidates = 1
+for values in grid.values():
+    n_candidates *= len(values)
+print(f"Searching {n_candidates} candidates x {args.folds} folds on {len(X)} rows")
+
+start = time.perf_counter()
+results, best = search(X, y, grid, n_folds=args.folds, seed=args.seed, workers=args.workers,
+                       min_specificity=args.min_specificity, min_sensitivity=args.min_sensitivity)
+print(f"Search finished in {time.perf_counter() - start:.1f}s")
+
+# Report, smallest forests first
+# Spell out None (unlimited depth, no class weights) so pandas does not turn it into NaN
+report = pd.DataFrame([{**r, 'max_depth': r['max_depth'] or 'None', 'class_weight': r['class_weight'] or 'None'}
+                       for r in results])
+report = report.sort_values(['n_nodes', 'recall_at_specificity'], ascending=[True, False])
+recall_col = f"recall@spec{args.min_specificity:g}"
+shown = report.rename(columns={'recall_at_specificity': recall_col})
+with pd.option_context('display.max_rows', None, 'display.width', 200):
+    print(shown.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+
+os.makedirs(EVAL_DIR, exist_ok=True)
+report_path = os.path.join(EVAL_DIR, "tuning.csv")
+report.to_csv(report_path, index=False)
+with open(os.path.join(EVAL_DIR, "tuning.json"), "w") as f:
+    json.dump({'min_specificity': args.min_specificity, 'min_sensitivity': args.min_sensitivity,
+               'folds': args.folds, 'seed': args.seed, 'best': best}, f, indent=2)
+print(f"Search results saved to {report_path} and tuning.json")
+
+if best is None:
+    print(f"No candidate reached recall {args.min_sensitivity:g} at specificity {args.min_specificity:g}")
+    exit(1)
+params = {name: best[name] for name in grid}
+print(f"Selected: {params} (recall {best['recall_at_specificity']:.3f}, {best['n_nodes']} nodes, "
+      f"{best['single_row_ms']:.3f} ms per row)")
+
+if not args.no_save:
+    from sklearn.ensemble import RandomForestClassifier
+
+    # Refit on the train side; n_jobs only affects speed, the forest depends on random_state alone
+    model = RandomForestClassifier(random_state=args.seed, n_jobs=-1, **params)
+    model.fit(pd.DataFrame(X, columns=FEATURES), y)
+    model.set_params(n_jobs=None)  # Single-row serving is slower with a thread pool per call
+    os.makedirs(os.path.dirname(os.path.abspath(args.model_path)), exist_ok=True)
+    joblib.dump(model, args.model_path)
+    print(f"Model saved to {args.model_path}")
+    if args.export_flat or args.export_mmap:
+        flat = FlatForest.from_sklearn(model)
+        if args.export_flat:
+            flat.save(flat_model_path(args.model_path))
+            print(f"Flattened forest saved to {flat_model_path(args.model_path)}")
+        if args.export_mmap:
+            flat.save_dir(mmap_model_path(args.model_path))
+            print(f"Memory-mapped forest saved to {mmap_model_path(args.model_path)}")
@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 import sys
+import threading
 
 # Ensure project directory is in sys.path
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,7 +11,9 @@ if PROJECT_DIR not in sys.path:
 
 # Import prediction and recommendation modules
 try:
-    from predict import predict_er
+    from features import SCHEMA, PatientRecord, validate_record
+    from predict import explain_er, warm_up
+    from prediction_cache import CACHE
     from rules import get_recommendations
 except ImportError as e:
     st.error(f"Import error: {str(e)}. Ensure predict.py and rules.py are in {PROJECT_DIR}")
@@ -20,28 +23,50 @@ except ImportError as e:
 st.set_page_config(page_title="ER Triage Tool", layout="wide")
 st.title("ER Triage Tool")
 
+
+@st.cache_resource(show_spinner=False)
+def start_model_warmup():
+    """Load the serving model once per server process, in the background, while the form renders."""
+    thread = threading.Thread(target=warm_up, args=(SCRIPT_DIR,), name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# A submit that arrives before warm-up finishes waits on the model registry instead of loading twice
+start_model_warmup()
+
+
+def schema_slider(label, name):
+    """Slider whose bounds, default and step come from the feature schema."""
+    spec = SCHEMA[name]
+    cast = type(spec.step)  # int steps give integer sliders
+    return st.slider(label, min_value=cast(spec.min), max_value=cast(spec.max), value=cast(spec.default),
+                     step=cast(spec.step))
+
+
 # Create input form
 with st.form("triage_form"):
     # Demographic inputs
     st.subheader("Demographics")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        sex = st.selectbox("Sex", ["Male", "Female"])
+        sex = st.selectbox("Sex", list(SCHEMA['sex'].encoding))
     with col2:
-        race = st.selectbox("Race", ["Asian", "Black", "White", "Hispanic", "Other"])
+        race = st.selectbox("Race", list(SCHEMA['race'].encoding))
     with col3:
-        age = st.number_input("Age (years)", min_value=18, max_value=100, value=50, step=1)
+        age = st.number_input("Age (years)", min_value=int(SCHEMA['age'].min), max_value=int(SCHEMA['age'].max),
+                              value=int(SCHEMA['age'].default), step=1)
     with col4:
-        mode_of_arrival = st.selectbox("Mode of Arrival", ["Walk-in", "Ambulance", "Other"])
+        mode_of_arrival = st.selectbox("Mode of Arrival", list(SCHEMA['mode_of_arrival'].encoding))
 
     # Vital signs
     st.subheader("Vital Signs")
-    temperature = st.slider("Temperature (°C)", min_value=35.0, max_value=40.0, value=37.0, step=0.1)
-    pulse = st.slider("Pulse (bpm)", min_value=40, max_value=180, value=75, step=1)
-    blood_pressure = st.slider("Systolic Blood Pressure (mmHg)", min_value=70.0, max_value=200.0, value=120.0, step=1.0)
-    respiratory_rate = st.slider("Respiratory Rate (breaths/min)", min_value=8, max_value=40, value=16, step=1)
-    spo2 = st.slider("SpO2 (%)", min_value=80.0, max_value=100.0, value=98.0, step=0.1)
-    blood_sugar = st.slider("Blood Glucose (mg/dL)", min_value=50, max_value=400, value=100, step=1)
+    temperature = schema_slider("Temperature (°C)", 'temperature')
+    pulse = schema_slider("Pulse (bpm)", 'pulse')
+    blood_pressure = schema_slider("Systolic Blood Pressure (mmHg)", 'blood_pressure')
+    respiratory_rate = schema_slider("Respiratory Rate (breaths/min)", 'respiratory_rate')
+    spo2 = schema_slider("SpO2 (%)", 'SpO2')
+    blood_sugar = schema_slider("Blood Glucose (mg/dL)", 'blood_sugar')
 
     # Past Medical History
     st.subheader("Past Medical History")
@@ -81,44 +106,30 @@ if submitted:
         'syncope': int(syncope),
         'diabetes': int(diabetes),
         'altered_mental_status': int(altered_mental_status),
-        'mode_of_arrival': {'Walk-in': 0, 'Ambulance': 1, 'Other': 2}[mode_of_arrival],
-        'sex': {'Male': 0, 'Female': 1}[sex],
-        'race': {'Asian': 0, 'Black': 1, 'White': 2, 'Hispanic': 3, 'Other': 4}[race]
+        'mode_of_arrival': SCHEMA['mode_of_arrival'].encoding[mode_of_arrival],
+        'sex': SCHEMA['sex'].encoding[sex],
+        'race': SCHEMA['race'].encoding[race]
     }
 
-    # Validate value ranges
-    if not (80 <= spo2 <= 100):
-        st.error(f"SpO2 value {spo2} is out of range (80–100%)")
-        st.stop()
-    if not (70 <= blood_pressure <= 200):
-        st.error(f"Blood pressure value {blood_pressure} is out of range (70–200 mmHg)")
-        st.stop()
-    if not (35 <= temperature <= 40):
-        st.error(f"Temperature value {temperature} is out of range (35–40°C)")
-        st.stop()
-    if not (40 <= pulse <= 180):
-        st.error(f"Pulse value {pulse} is out of range (40–180 bpm)")
-        st.stop()
-    if not (50 <= blood_sugar <= 400):
-        st.error(f"Blood glucose value {blood_sugar} is out of range (50–400 mg/dL)")
-        st.stop()
-    if not (8 <= respiratory_rate <= 40):
-        st.error(f"Respiratory rate value {respiratory_rate} is out of range (8–40 breaths/min)")
-        st.stop()
-    if not (18 <= age <= 100):
-        st.error(f"Age value {age} is out of range (18–100 years)")
+    # Validate against the shared feature schema (ranges, encodings)
+    errors = validate_record(input_data)
+    if errors:
+        for error in errors:
+            st.error(error)
         st.stop()
 
-    # Get prediction
+    # Get prediction; repeated inputs are served from the prediction cache, and the
+    # rule result feeds both the probability and the recommendations
     try:
-        prob, weights_applied = predict_er(input_data, SCRIPT_DIR)
+        patient = PatientRecord.from_dict(input_data)
+        prob, rule_result = CACHE.score(patient, SCRIPT_DIR)
     except Exception as e:
         st.error(f"Prediction error: {str(e)}")
         st.stop()
 
     # Get recommendations
     try:
-        recommendations = get_recommendations(input_data)
+        recommendations = get_recommendations(input_data, rule_result=rule_result)
     except Exception as e:
         st.error(f"Recommendation error: {str(e)}")
         st.stop()
@@ -132,4 +143,14 @@ if submitted:
             for rec in recommendations:
                 st.markdown(f"- {rec}")
         else:
-            st.markdown("No specific actions")
\ No newline at end of file
+            st.markdown("No specific actions")
+    with st.expander("View Model Factors"):
+        try:
+            explanation = explain_er(patient, SCRIPT_DIR)
+        except Exception as e:
+            st.error(f"Explanation error: {str(e)}")
+            st.stop()
+        st.markdown(f"**Model baseline**: {explanation.bias * 100:.1f}% (before rule adjustments)")
+        for feature, contribution in explanation.top(5):
+            if contribution:
+                st.markdown(f"- {SCHEMA[feature].label}: {contribution * 100:+.1f} points")
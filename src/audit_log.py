@@ -0,0 +1,377 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from features import FEATURES, N_FEATURES
+
+# One audited scoring decision; fired is the RULES bitmask (bit i = RULES[i] fired)
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('features', '<f8', (N_FEATURES,)),
+    ('base_prob', '<f8'),
+    ('probability', '<f8'),
+    ('fired', '<u4'),
+])
+
+# File: MAGIC, uint32 header length, JSON header, then blocks.
+# Block: BLOCK_MAGIC, uint32 record count, uint32 CRC32 of the payload, payload
+# (count packed RECORD_DTYPE records). A torn block at the end of a file (crash
+# mid-write) fails its length or CRC check and ends the scan of that file.
+MAGIC = b'TRIAGEAUDIT1'
+BLOCK_MAGIC = b'AUDB'
+_BLOCK_HEADER = struct.Struct('<4sII')
+FORMAT_VERSION = 1
+
+BACKPRESSURE = ('block', 'drop')
+
+
+class AuditLog:
+    """
+    Non-blocking, append-only binary log of scoring decisions.
+
+    submit and submit_batch only append the record to an in-memory queue (a
+    deque append, no thread wake-up). A background writer thread wakes every
+    flush_interval seconds, packs the queued records into CRC-checked blocks
+    of up to batch_size records, fsyncs every fsync_interval seconds and
+    rotates to a new file every rotate_bytes. It yields the GIL between blocks
+    so scoring threads are never held up for long. When max_pending records
+    are queued, backpressure='block' makes callers wait for the writer and
+    'drop' discards the record and counts it.
+
+    Files are named audit-<UTC start time>-<pid>-<seq>.log so processes
+    forked from one service can share a directory. The writer starts on the
+    first submit in each process.
+    """
+
+    def __init__(self, directory: str, max_pending: int = 262144, batch_size: int = 1024,
+                 flush_interval: float = 0.5, fsync_interval: float = 1.0,
+                 rotate_bytes: int = 64 * 1024 * 1024, backpressure: str = 'block'):
+        if backpressure not in BACKPRESSURE:
+            raise ValueError(f"backpressure must be one of {BACKPRESSURE}, got {backpressure!r}")
+        self.directory = directory
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.rotate_bytes = rotate_bytes
+        self.backpressure = backpressure
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pending: 'deque' = deque()
+        self._n_pending = 0
+        self._wake = threading.Event()
+        self._room = threading.Condition(threading.Lock())
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._seq = 0
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.blocks = 0
+        self.fsyncs = 0
+        self.files: List[str] = []
+        self.error: Optional[BaseException] = None
+
+    def _ensure_writer(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked child: the parent's queue, thread and file are not ours
+                self._reset()
+            os.makedirs(self.directory, exist_ok=True)
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _put(self, item: Any, n: int) -> None:
+        self._ensure_writer()
+        if self._n_pending >= self.max_pending:
+            if self.backpressure == 'drop':
+                with self._lock:
+                    self.dropped += n
+                return
+            with self._room:
+                while self._n_pending >= self.max_pending and self._thread is not None:
+                    self._wake.set()
+                    self._room.wait(self.flush_interval)
+        with self._lock:
+            self._pending.append(item)
+            self._n_pending += n
+            self.submitted += n
+
+    def submit(self, features: Any, base_prob: float, probability: float, fired: Sequence[int]) -> None:
+        """
+        Queue one decision.
+
+        Args:
+            features: 17 feature values in canonical order (vector or tuple;
+                copied, so callers may reuse it).
+            base_prob: Forest probability before rule weights.
+            probability: Adjusted probability returned to the caller.
+            fired: Indices of the RULES that fired.
+        """
+        self._put((time.time(), np.array(features, dtype=np.float64), base_prob, probability, fired), 1)
+
+    def submit_batch(self, X: np.ndarray, base_prob: np.ndarray, probability: np.ndarray,
+                     fired_bits: np.ndarray) -> None:
+        """
+        Queue the decisions of one predict_er_batch call.
+
+        Args:
+            X: Feature matrix (n, 17); copied, so callers may reuse it.
+            base_prob: Forest probabilities (n,).
+            probability: Adjusted probabilities (n,).
+            fired_bits: Fired-rule bitmask per row (n,).
+        """
+        block = np.empty(len(X), dtype=RECORD_DTYPE)
+        block['time'] = time.time()
+        block['features'] = X
+        block['base_prob'] = base_prob
+        block['probability'] = probability
+        block['fired'] = fired_bits
+        self._put(block, len(block))
+
+    def _open_file(self) -> None:
+        self._seq += 1
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+        path = os.path.join(self.directory, f"audit-{stamp}-{os.getpid()}-{self._seq:04d}.log")
+        header = json.dumps({'format': 'triage_audit', 'version': FORMAT_VERSION, 'features': FEATURES,
+                             'dtype': RECORD_DTYPE.descr}).encode('utf-8')
+        self._file = open(path, 'ab')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.files.append(path)
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _pack(singles: List[tuple]) -> np.ndarray:
+        block = np.empty(len(singles), dtype=RECORD_DTYPE)
+        block['time'] = [item[0] for item in singles]
+        block['features'] = [item[1] for item in singles]
+        block['base_prob'] = [item[2] for item in singles]
+        block['probability'] = [item[3] for item in singles]
+        # Fired rule indices -> bitmask: each bit is set at most once per record, so summing is OR-ing
+        fired = [item[4] for item in singles]
+        counts = np.fromiter(map(len, fired), dtype=np.intp, count=len(fired))
+        bits = np.left_shift(1, np.fromiter(chain.from_iterable(fired), dtype=np.int64, count=int(counts.sum())))
+        block['fired'] = np.bincount(np.repeat(np.arange(len(fired)), counts), weights=bits, minlength=len(fired))
+        return block
+
+    def _write(self, items: List[Any]) -> None:
+        # Runs of single records become one block; batches keep their own, in submit order
+        blocks, singles = [], []
+        for item in items:
+            if isinstance(item, tuple):
+                singles.append(item)
+                continue
+            if singles:
+                blocks.append(self._pack(singles))
+                singles = []
+            blocks.append(item)
+        if singles:
+            blocks.append(self._pack(singles))
+        if self._file is None:
+            self._open_file()
+        for block in blocks:
+            payload = block.tobytes()
+            self._file.write(_BLOCK_HEADER.pack(BLOCK_MAGIC, len(block), zlib.crc32(payload)) + payload)
+            self.written += len(block)
+            self.blocks += 1
+        self._file.flush()
+        if self._file.tell() >= self.rotate_bytes:
+            self._close_file()
+
+    def _take(self) -> List[Any]:
+        """Pop queued items up to about batch_size records."""
+        items, n = [], 0
+        with self._lock:
+            while self._pending and n < self.batch_size:
+                item = self._pending.popleft()
+                items.append(item)
+                n += 1 if isinstance(item, tuple) else len(item)
+            self._n_pending -= n
+        return items
+
+    def _run(self) -> None:
+        last_sync = time.monotonic()
+        unsynced = False
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            stopping = self._closing
+            try:
+                items = self._take()
+                while items:
+                    self._write(items)
+                    unsynced = True
+                    with self._room:
+                        self._room.notify_all()
+                    # Keep going only for full blocks (or when closing); stragglers wait for the next wake-up
+                    if self._n_pending < self.batch_size and not stopping:
+                        break
+                    time.sleep(0)  # Let scoring threads run between blocks
+                    items = self._take()
+                now = time.monotonic()
+                if unsynced and self._file is not None and (stopping or now - last_sync >= self.fsync_interval):
+                    os.fsync(self._file.fileno())
+                    self.fsyncs += 1
+                    last_sync, unsynced = now, False
+            except OSError as e:
+                # Keep draining so callers never block on a dead writer; the error is reported by stats()
+                self.error = e
+                dropped = sum(1 if isinstance(item, tuple) else len(item) for item in items)
+                with self._lock:
+                    self.dropped += dropped
+            if stopping:
+                break
+        self._close_file()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until everything submitted so far is written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.written + self.dropped < self.submitted and (deadline is None or time.monotonic() < deadline):
+            self._wake.set()
+            time.sleep(0.005)
+
+    def close(self) -> None:
+        """Write everything queued, fsync and stop the writer."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._closing = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            self._pid = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and submitted/written/dropped counters."""
+        return {
+            'pending': self._n_pending,
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'blocks': self.blocks,
+            'fsyncs': self.fsyncs,
+            'files': len(self.files),
+            'error': str(self.error) if self.error else None,
+        }
+
+
+def log_files(path: str) -> List[str]:
+    """Audit files at path (a file, or a directory scanned in name order)."""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.startswith('audit-') and name.endswith('.log')]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Audit log not found: {path}")
+    return [path]
+
+
+def scan(path: str) -> Iterator[np.ndarray]:
+    """
+    Stream an audit log back block by block.
+
+    Args:
+        path: Audit file or directory of audit files.
+
+    Yields:
+        RECORD_DTYPE arrays, one per block, in write order within each file.
+    """
+    for file_path in log_files(path):
+        with open(file_path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{file_path} is not an audit log")
+            (length,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(length))
+            if header.get('version') != FORMAT_VERSION or header.get('features') != FEATURES:
+                raise ValueError(f"{file_path} was written with an incompatible record layout")
+            while True:
+                raw = f.read(_BLOCK_HEADER.size)
+                if len(raw) < _BLOCK_HEADER.size:
+                    break
+                magic, count, crc = _BLOCK_HEADER.unpack(raw)
+                payload = f.read(count * RECORD_DTYPE.itemsize)
+                if magic != BLOCK_MAGIC or len(payload) < count * RECORD_DTYPE.itemsize \
+                        or zlib.crc32(payload) != crc:
+                    break  # Torn tail
+                yield np.frombuffer(payload, dtype=RECORD_DTYPE)
+
+
+def read_frame(path: str) -> Any:
+    """
+    Load an audit log as a DataFrame.
+
+    Args:
+        path: Audit file or directory of audit files.
+
+    Returns:
+        DataFrame with time, the 17 feature columns (canonical order, so it
+        can be passed straight to predict_er_batch), base_prob, probability
+        and fired.
+    """
+    blocks = list(scan(path))
+    return to_frame(np.concatenate(blocks) if blocks else np.empty(0, dtype=RECORD_DTYPE))
+
+
+def to_frame(records: np.ndarray) -> Any:
+    """DataFrame view of RECORD_DTYPE records (see read_frame)."""
+    import pandas as pd
+
+    frame = pd.DataFrame(records['features'], columns=FEATURES)
+    frame.insert(0, 'time', pd.to_datetime(records['time'], unit='s'))
+    for name in ('base_prob', 'probability', 'fired'):
+        frame[name] = records[name]
+    return frame
+
+
+# Process-wide sink used by predict_er and predict_er_batch (None = not auditing)
+SINK: Optional[AuditLog] = None
+
+
+def open_log(directory: str, **kwargs: Any) -> AuditLog:
+    """Start auditing every scoring decision in this process to directory (see AuditLog)."""
+    global SINK
+    close_log()
+    SINK = AuditLog(directory, **kwargs)
+    return SINK
+
+
+def close_log() -> None:
+    """Flush and stop the process-wide audit log, if any."""
+    global SINK
+    if SINK is not None:
+        SINK.close()
+        SINK = None
+
+
+def record(features: Any, base_prob: float, probability: float, fired: Sequence[int]) -> None:
+    """Audit one decision when a log is open (see AuditLog.submit)."""
+    if SINK is not None:
+        SINK.submit(features, base_prob, probability, fired)
+
+
+def record_batch(X: np.ndarray, base_prob: np.ndarray, probability: np.ndarray, fired_bits: np.ndarray) -> None:
+    """Audit a batch of decisions when a log is open (see AuditLog.submit_batch)."""
+    if SINK is not None:
+        SINK.submit_batch(X, base_prob, probability, fired_bits)
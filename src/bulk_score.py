@@ -0,0 +1,233 @@
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import to_matrix, validate
+from model_registry import get_model, model_path
+from predict import predict_er_batch
+from rule_catalogue import CATALOGUE, COMPILED_CATALOGUE
+
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet input/output requires pyarrow (pip install pyarrow)")
+    return pq
+
+
+def iter_chunks(path: str, chunk_size: int) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    Stream an input file in fixed-size chunks.
+
+    Args:
+        path: CSV or Parquet file.
+        chunk_size: Rows per chunk (Parquet is read in record batches of this size).
+
+    Yields:
+        (first_row_number, chunk) pairs.
+    """
+    offset = 0
+    if _is_parquet(path):
+        pq = _require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            yield offset, chunk
+            offset += len(chunk)
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_size):
+            yield offset, chunk
+            offset += len(chunk)
+
+
+def fired_labels(masks: np.ndarray) -> np.ndarray:
+    """Render fired-rule bitmasks as '|'-separated rule descriptions (one string per row)."""
+    unique, inverse = np.unique(masks, return_inverse=True)
+    rendered = np.array(['|'.join(CATALOGUE[i].label for i in COMPILED_CATALOGUE.from_bits(m)) for m in unique],
+                        dtype=object)
+    return rendered[inverse]
+
+
+# How score_chunk treats rows that fail schema validation
+INVALID_MODES = ('skip', 'quarantine', 'score')
+
+
+def score_chunk(offset: int, chunk: pd.DataFrame, model_file: Optional[str] = None,
+                invalid: str = 'skip') -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Validate one chunk against the feature schema and score it through predict_er_batch.
+
+    Args:
+        offset: Row number of the chunk's first row in the input file.
+        chunk: DataFrame containing the 17 feature columns.
+        model_file: Model artifact; defaults to er_model.pkl. Loaded once per process.
+        invalid: 'skip' or 'quarantine' leaves invalid rows out of the scores;
+            'score' scores every row without validation.
+
+    Returns:
+        Tuple of (scores, rejected). scores has row, probability, fired_mask
+        and fired_rules columns. rejected holds the invalid input rows with
+        their row number and an errors column, or None if every row is valid.
+    """
+    if invalid not in INVALID_MODES:
+        raise ValueError(f"invalid must be one of {INVALID_MODES}, got {invalid!r}")
+    model = get_model(model_file or model_path())
+    rows = np.arange(offset, offset + len(chunk), dtype=np.int64)
+    rejected = None
+    if invalid == 'score':
+        X = to_matrix(chunk)
+    else:
+        check = validate(chunk)
+        ok = check.valid
+        X, rows = check.values[ok], rows[ok]
+        bad = np.flatnonzero(~ok)
+        if len(bad):
+            rejected = chunk.iloc[bad].reset_index(drop=True)
+            rejected.insert(0, 'row', np.arange(offset, offset + len(chunk), dtype=np.int64)[bad])
+            rejected['errors'] = ['|'.join(f"{name}:{error}" for name, error in check.error_codes(i).items())
+                                  for i in bad]
+
+    probs, fired = predict_er_batch(X, model=model)
+    scores = pd.DataFrame({
+        'row': rows,
+        'probability': probs,
+        'fired_mask': fired,
+        'fired_rules': fired_labels(fired),
+    })
+    return scores, rejected
+
+
+def _score_schema() -> Any:
+    """Arrow schema of score_chunk's scores, fixed so chunks with no valid rows still match the file."""
+    import pyarrow as pa
+    return pa.schema([('row', pa.int64()), ('probability', pa.float64()), ('fired_mask', pa.uint32()),
+                      ('fired_rules', pa.string())])
+
+
+class _ChunkWriter:
+    """
+    Incremental CSV or Parquet writer.
+
+    Parquet needs every chunk in one schema: schema gives it up front,
+    otherwise it is taken from the first chunk. text=True writes every column
+    but row as strings, for rejected input whose column types vary by chunk.
+    """
+
+    def __init__(self, path: str, schema: Optional[Any] = None, text: bool = False):
+        self.path = path
+        self._parquet = _is_parquet(path)
+        self._schema = schema
+        self._text = text
+        self._writer = None
+        self._header = True
+        if not self._parquet and os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._parquet:
+            pq = _require_pyarrow()
+            import pyarrow as pa
+            if self._text:
+                df = df.astype({column: 'string' for column in df.columns if column != 'row'})
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a', header=self._header, index=False)
+            self._header = False
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(input_path: str, output_path: str, chunk_size: int = 100_000, workers: int = 1,
+               ordered: bool = True, model_file: Optional[str] = None, invalid: str = 'skip',
+               quarantine_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Score a CSV/Parquet file chunk by chunk, writing results incrementally.
+
+    At most 2 * workers chunks are in flight, so memory stays bounded by the
+    chunk size regardless of the input size.
+
+    Args:
+        input_path: Input CSV or Parquet file with the 17 feature columns.
+        output_path: Output CSV or Parquet file.
+        chunk_size: Rows per chunk.
+        workers: Worker processes (1 scores in this process).
+        ordered: Write chunks in input order; if False, write them as they finish.
+        model_file: Model artifact; defaults to er_model.pkl.
+        invalid: 'skip' drops rows that fail validation, 'quarantine' also
+            writes them (with their errors) to quarantine_path, 'score'
+            scores every row unchecked.
+        quarantine_path: Output for rejected rows; defaults to the output
+            path with '.rejected' before the extension.
+
+    Returns:
+        Dict with the number of rows scored, invalid rows and chunks written.
+    """
+    if invalid not in INVALID_MODES:
+        raise ValueError(f"invalid must be one of {INVALID_MODES}, got {invalid!r}")
+    if invalid == 'quarantine' and quarantine_path is None:
+        stem, ext = os.path.splitext(output_path)
+        quarantine_path = f"{stem}.rejected{ext}"
+
+    writer = _ChunkWriter(output_path, schema=_score_schema() if _is_parquet(output_path) else None)
+    quarantine = _ChunkWriter(quarantine_path, text=True) if invalid == 'quarantine' else None
+    rows = chunks = n_invalid = 0
+
+    def write(result: Tuple[pd.DataFrame, Optional[pd.DataFrame]]) -> None:
+        nonlocal rows, chunks, n_invalid
+        scores, rejected = result
+        writer.write(scores)
+        rows += len(scores)
+        chunks += 1
+        if rejected is not None:
+            n_invalid += len(rejected)
+            if quarantine is not None:
+                quarantine.write(rejected)
+
+    try:
+        if workers <= 1:
+            for offset, chunk in iter_chunks(input_path, chunk_size):
+                write(score_chunk(offset, chunk, model_file, invalid))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                max_in_flight = 2 * workers
+
+                def drain(block_until: int) -> None:
+                    nonlocal pending
+                    while len(pending) > block_until:
+                        if ordered:
+                            done = [pending.popleft()]
+                        else:
+                            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            done = [f for f in pending if f in finished]
+                            pending = deque(f for f in pending if f not in finished)
+                        for future in done:
+                            write(future.result())
+
+                for offset, chunk in iter_chunks(input_path, chunk_size):
+                    pending.append(pool.submit(score_chunk, offset, chunk, model_file, invalid))
+                    drain(max_in_flight - 1)
+                drain(0)
+    finally:
+        writer.close()
+        if quarantine is not None:
+            quarantine.close()
+    result = {'rows': rows, 'invalid': n_invalid, 'chunks': chunks}
+    if quarantine is not None:
+        result['quarantine_path'] = quarantine_path
+    return result
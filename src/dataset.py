@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from features import FEATURES, SCHEMA, to_matrix
+from fileio import write_json
+
+LABEL = 'needs_er'
+FORMAT_VERSION = 1
+# Rows parsed per CSV chunk while converting
+CHUNK_SIZE = 100_000
+# Split every labelled cache gets when it is built: the 80/20 stratified split the scripts evaluate on
+DEFAULT_SPLIT = {'test_size': 0.2, 'seed': 42, 'stratify': True}
+
+
+def schema_hash() -> str:
+    """Hash of the feature names, order, types, ranges and encodings a cache was written for."""
+    schema = [[name, SCHEMA[name].dtype, SCHEMA[name].min, SCHEMA[name].max, SCHEMA[name].encoding]
+              for name in FEATURES]
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def cache_path(csv_path: str) -> str:
+    """Cache directory for a CSV: cache/<name>/ next to it (data/er_data.csv -> data/cache/er_data/)."""
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, 'cache', os.path.splitext(name)[0])
+
+
+def _source_key(csv_path: str) -> Dict[str, Any]:
+    try:
+        stat = os.stat(csv_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Data file not found: {csv_path}")
+    return {'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class Dataset:
+    """
+    Memory-mapped columnar copy of a labelled CSV.
+
+    The cache directory holds features.npy, a column-major (Fortran-order)
+    float64 array of shape (rows, 17) in FEATURES order, so every feature is
+    contiguous on disk and X goes to the models without a copy; label.npy
+    (int64) when the CSV has a label; one pair of index arrays per named
+    train/test split; and manifest.json, which records the source file's
+    size and mtime, the schema hash and the splits. Opening maps the arrays
+    read-only, so it takes milliseconds whatever the size.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(os.path.join(path, self.MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Dataset cache not found: {path}")
+        if self.manifest.get('format') != 'triage_dataset' or self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported dataset cache: {path}")
+        if self.manifest['schema_hash'] != schema_hash() or self.manifest['features'] != FEATURES:
+            raise ValueError(f"Dataset cache {path} was written for a different feature schema")
+        self.X = np.load(os.path.join(path, 'features.npy'), mmap_mode='r')
+        self.y = np.load(os.path.join(path, 'label.npy'), mmap_mode='r') if self.manifest['label'] else None
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.X)
+
+    def frame(self, indices: Optional[np.ndarray] = None) -> Any:
+        """The rows (all, or indices) as a DataFrame with the 17 features and the label."""
+        import pandas as pd
+
+        X = self.X if indices is None else self.X[indices]
+        df = pd.DataFrame(X, columns=FEATURES)
+        if self.y is not None:
+            df[self.manifest['label']] = self.y if indices is None else self.y[indices]
+        return df
+
+    def split(self, name: str = 'default') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the (train_indices, test_indices) of a split made by make_split.
+
+        Raises:
+            ValueError: No split by that name (see make_split; unlabelled
+                caches have none).
+        """
+        entry = self.manifest['splits'].get(name)
+        if entry is None:
+            raise ValueError(f"No split '{name}' in {self.path}; create it with generate_test_data.py")
+        return tuple(np.load(os.path.join(self.path, entry[part]), mmap_mode='r') for part in ('train', 'test'))
+
+    def make_split(self, name: str = 'default', test_size: float = 0.2, seed: int = 42,
+                   stratify: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Split the rows into train and test sets and store the indices.
+
+        Uses sklearn's train_test_split on the row numbers, stratified on the
+        label when there is one, so a given seed selects the same rows as
+        splitting the DataFrame itself.
+
+        Args:
+            name: Split name (replaces an existing split of that name).
+            test_size: Fraction of rows in the test set.
+            seed: random_state for the shuffle.
+            stratify: Keep the label ratio in both sets.
+
+        Returns:
+            (train_indices, test_indices) as int64 arrays.
+        """
+        from sklearn.model_selection import train_test_split
+
+        train, test = train_test_split(np.arange(self.n_rows, dtype=np.int64), test_size=test_size,
+                                       random_state=seed,
+                                       stratify=self.y if stratify and self.y is not None else None)
+        entry = {'train': f'split-{name}-train.npy', 'test': f'split-{name}-test.npy',
+                 'test_size': test_size, 'seed': seed, 'stratify': stratify,
+                 'train_rows': len(train), 'test_rows': len(test)}
+        np.save(os.path.join(self.path, entry['train']), train)
+        np.save(os.path.join(self.path, entry['test']), test)
+        self.manifest['splits'][name] = entry
+        write_json(os.path.join(self.path, self.MANIFEST), self.manifest)
+        return train, test
+
+    def subset(self, indices: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(X, y) for the given rows, e.g. one side of a split."""
+        return self.X[indices], None if self.y is None else np.asarray(self.y[indices])
+
+
+def convert(csv_path: str, path: str, label: Optional[str] = LABEL, chunk_size: int = CHUNK_SIZE) -> Dataset:
+    """
+    Parse a CSV once into a Dataset cache at path (replacing any cache there).
+
+    A labelled cache gets the 'default' split (DEFAULT_SPLIT) and every split
+    the replaced cache had, re-made with the same parameters, so scripts that
+    rely on a split keep working after the CSV changes. The seeds are fixed,
+    so the same CSV always gives the same rows.
+
+    Args:
+        csv_path: CSV with the 17 feature columns in any order, plus label.
+        path: Cache directory.
+        label: Label column, or None. Ignored if the CSV does not have it.
+        chunk_size: Rows parsed (and held in memory) at a time.
+
+    Returns:
+        The opened Dataset.
+    """
+    import pandas as pd
+
+    source = _source_key(csv_path)
+    splits = {'default': DEFAULT_SPLIT}
+    try:
+        with open(os.path.join(path, Dataset.MANIFEST)) as f:
+            splits.update(json.load(f).get('splits', {}))
+    except (FileNotFoundError, ValueError):
+        pass
+    # Build next to the final directory and swap it in, so readers never see a half-written cache
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    # First pass: append each parsed chunk to row-major raw files, so only one chunk is in memory
+    features_raw, label_raw = os.path.join(tmp, 'features.raw'), os.path.join(tmp, 'label.raw')
+    columns: List[str] = []
+    n_rows = 0
+    with open(features_raw, 'wb') as features_file, open(label_raw, 'wb') as label_file:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+            columns = columns or list(chunk.columns)
+            to_matrix(chunk).tofile(features_file)
+            if label is not None and label in columns:
+                chunk[label].to_numpy(dtype=np.int64).tofile(label_file)
+            n_rows += len(chunk)
+    has_label = label is not None and label in columns
+
+    # Second pass: copy the raw rows into the column-major array, chunk_size rows at a time
+    X = np.lib.format.open_memmap(os.path.join(tmp, 'features.npy'), mode='w+', dtype=np.float64,
+                                  shape=(n_rows, len(FEATURES)), fortran_order=True)
+    if n_rows:
+        rows = np.memmap(features_raw, dtype=np.float64, mode='r', shape=(n_rows, len(FEATURES)))
+        for start in range(0, n_rows, chunk_size):
+            X[start:start + chunk_size] = rows[start:start + chunk_size]
+        del rows
+    X.flush()
+    del X
+    if has_label:
+        y = np.lib.format.open_memmap(os.path.join(tmp, 'label.npy'), mode='w+', dtype=np.int64,
+                                      shape=(n_rows,))
+        if n_rows:
+            y[:] = np.memmap(label_raw, dtype=np.int64, mode='r', shape=(n_rows,))
+        y.flush()
+        del y
+    os.remove(features_raw)
+    os.remove(label_raw)
+    write_json(os.path.join(tmp, Dataset.MANIFEST), {
+        'format': 'triage_dataset',
+        'version': FORMAT_VERSION,
+        'source': source,
+        'columns': columns,
+        'schema_hash': schema_hash(),
+        'features': FEATURES,
+        'dtypes': {name: SCHEMA[name].dtype for name in FEATURES},
+        'label': label if has_label else None,
+        'rows': n_rows,
+        'splits': {},
+    })
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    dataset = Dataset(path)
+    if has_label:
+        for name, entry in splits.items():
+            dataset.make_split(name, entry['test_size'], entry['seed'], entry['stratify'])
+    return dataset
+
+
+def open_dataset(csv_path: str, path: Optional[str] = None, label: Optional[str] = LABEL,
+                 rebuild: bool = False) -> Dataset:
+    """
+    Open the columnar cache of a CSV, converting it first if needed.
+
+    The cache is rebuilt when it is missing, when the CSV's size or mtime
+    differ from the ones recorded at conversion, or when the feature schema
+    has changed since.
+
+    Args:
+        csv_path: Source CSV (e.g. data/er_data.csv).
+        path: Cache directory (default: see cache_path).
+        label: Label column to keep (None: not needed; any cache of the CSV will do).
+        rebuild: Convert even if the cache is current.
+
+    Returns:
+        The opened Dataset.
+    """
+    path = path or cache_path(csv_path)
+    source = _source_key(csv_path)
+    if not rebuild:
+        try:
+            dataset = Dataset(path)
+            manifest = dataset.manifest
+            if manifest['source'] == source and \
+                    (label is None or manifest['label'] == (label if label in manifest['columns'] else None)):
+                return dataset
+        except (FileNotFoundError, ValueError):
+            pass
+    return convert(csv_path, path, label)
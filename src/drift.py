@@ -0,0 +1,317 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from features import FEATURES, SCHEMA
+from rule_catalogue import CATALOGUE, COMPILED_CATALOGUE
+
+# Equal-width bins over the schema range for continuous features; binary and
+# categorical features get one bin per value
+N_BINS = 20
+# Population stability index thresholds (common rule of thumb)
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+# Added to every bin proportion so empty bins do not make PSI infinite
+_EPSILON = 1e-4
+# Single patients are binned in blocks of this many rows
+BUFFER_ROWS = 1024
+FORMAT_VERSION = 1
+
+
+def _default_binning() -> Dict[str, List]:
+    """Per-feature (lower edge, bin width, bin count) from SCHEMA."""
+    lo, width, bins = [], [], []
+    for name in FEATURES:
+        spec = SCHEMA[name]
+        if spec.dtype in ('binary', 'category'):
+            values = sorted(spec.encoding.values()) if spec.encoding else [0, 1]
+            lo.append(values[0] - 0.5)
+            width.append(1.0)
+            bins.append(values[-1] - values[0] + 1)
+        else:
+            lo.append(float(spec.min))
+            width.append((spec.max - spec.min) / N_BINS)
+            bins.append(N_BINS)
+    return {'lo': lo, 'width': width, 'bins': bins}
+
+
+def reference_path(model_file: str) -> str:
+    """Drift reference profile written next to a model (<model>_drift.json)."""
+    return os.path.splitext(model_file)[0] + '_drift.json'
+
+
+class Histograms:
+    """
+    Fixed-size per-feature histograms and per-rule fire counts.
+
+    All bins live in one flat count array (feature i owns bins
+    offsets[i]:offsets[i] + bins[i]); values outside a feature's range fall
+    into its first or last bin. Memory does not grow with the number of
+    observations.
+    """
+
+    def __init__(self, binning: Optional[Dict[str, List]] = None):
+        binning = binning or _default_binning()
+        self.lo = np.asarray(binning['lo'], dtype=np.float64)
+        self.width = np.asarray(binning['width'], dtype=np.float64)
+        self.bins = np.asarray(binning['bins'], dtype=np.intp)
+        self.offsets = np.concatenate([[0], np.cumsum(self.bins)[:-1]])
+        self._last = (self.bins - 1).astype(np.float64)
+        self.counts = np.zeros(int(self.bins.sum()), dtype=np.int64)
+        self.rule_counts = np.zeros(len(CATALOGUE), dtype=np.int64)
+        self.n = 0
+
+    @property
+    def binning(self) -> Dict[str, List]:
+        return {'lo': self.lo.tolist(), 'width': self.width.tolist(), 'bins': self.bins.tolist()}
+
+    def bin_index(self, X: np.ndarray) -> np.ndarray:
+        """Flat count index of every value of X (n, 17); NaN counts in the first bin."""
+        bins = np.fmin(np.fmax(np.floor((X - self.lo) / self.width), 0), self._last)
+        return self.offsets + bins.astype(np.intp)
+
+    def add_values(self, X: np.ndarray) -> None:
+        """Count the feature values of a batch (n, 17) without touching the rule counts."""
+        if len(X):
+            self.counts += np.bincount(self.bin_index(X).ravel(), minlength=len(self.counts))
+            self.n += len(X)
+
+    def add_batch(self, X: np.ndarray, fired: np.ndarray) -> None:
+        """Count a batch; fired is the (n, n_rules) boolean matrix from CompiledRules.evaluate."""
+        self.add_values(X)
+        self.rule_counts += np.asarray(fired).sum(axis=0)
+
+    def copy(self) -> 'Histograms':
+        histograms = Histograms(self.binning)
+        histograms.counts, histograms.rule_counts = self.counts.copy(), self.rule_counts.copy()
+        histograms.n = self.n
+        return histograms
+
+    def feature_counts(self, i: int) -> np.ndarray:
+        return self.counts[self.offsets[i]:self.offsets[i] + self.bins[i]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format': 'triage_drift_reference',
+            'version': FORMAT_VERSION,
+            'n': int(self.n),
+            'binning': self.binning,
+            'features': {name: self.feature_counts(i).tolist() for i, name in enumerate(FEATURES)},
+            'rules': {rule.label: int(count) for rule, count in zip(CATALOGUE, self.rule_counts)},
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> 'Histograms':
+        if payload.get('format') != 'triage_drift_reference' or payload.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported drift reference: {payload.get('format')} v{payload.get('version')}")
+        if list(payload['features']) != FEATURES or list(payload['rules']) != [r.label for r in CATALOGUE]:
+            raise ValueError("Drift reference was built for different features or rules; rebuild it")
+        histograms = cls(payload['binning'])
+        histograms.counts = np.concatenate([np.asarray(payload['features'][name], dtype=np.int64)
+                                            for name in FEATURES])
+        histograms.rule_counts = np.asarray(list(payload['rules'].values()), dtype=np.int64)
+        histograms.n = int(payload['n'])
+        return histograms
+
+
+def profile(chunks: Iterable[np.ndarray]) -> Histograms:
+    """
+    Histograms of a stream of feature matrices.
+
+    Args:
+        chunks: Feature matrices (n, 17) in canonical order; rules are
+            evaluated on each chunk.
+
+    Returns:
+        Histograms of every feature and rule fire counts over all chunks.
+    """
+    histograms = Histograms()
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.float64)
+        histograms.add_batch(chunk, COMPILED_CATALOGUE.evaluate(chunk))
+    return histograms
+
+
+def build_reference(X: np.ndarray, chunk_size: int = 1_000_000) -> Histograms:
+    """Profile training data (n, 17) for drift monitoring, chunk_size rows at a time."""
+    return profile(X[start:start + chunk_size] for start in range(0, len(X), chunk_size))
+
+
+def save_reference(reference: Histograms, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(reference.to_dict(), f)
+
+
+def load_reference(path: str) -> Histograms:
+    try:
+        with open(path) as f:
+            return Histograms.from_dict(json.load(f))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Drift reference not found: {path}")
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population stability index between two histograms over the same bins."""
+    e = expected / max(expected.sum(), 1) + _EPSILON
+    a = actual / max(actual.sum(), 1) + _EPSILON
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Largest gap between the two binned cumulative distributions (KS statistic at bin resolution)."""
+    return float(np.abs(np.cumsum(expected) / max(expected.sum(), 1)
+                        - np.cumsum(actual) / max(actual.sum(), 1)).max())
+
+
+def compare(reference: Histograms, current: Histograms) -> Dict[str, Any]:
+    """
+    Score the drift of current traffic against the reference profile.
+
+    Args:
+        reference: Training-data profile.
+        current: Histograms of the traffic to check, with the same binning.
+
+    Returns:
+        Dict with n (observations compared), features (psi, ks and status per
+        feature), rules (reference and current fire rate, psi, status per
+        rule) and status: 'ok', 'warn' or 'alert' for the worst score, or
+        'no_data' (with no scores) when current is empty.
+    """
+    if current.n == 0:
+        return {'n': 0, 'reference_n': int(reference.n), 'status': 'no_data', 'features': {}, 'rules': {}}
+
+    def status(value: float) -> str:
+        return 'alert' if value >= PSI_ALERT else 'warn' if value >= PSI_WARN else 'ok'
+
+    features = {}
+    for i, name in enumerate(FEATURES):
+        expected, actual = reference.feature_counts(i), current.feature_counts(i)
+        score = psi(expected, actual)
+        features[name] = {'psi': score, 'ks': ks(expected, actual), 'status': status(score)}
+
+    rules = {}
+    for rule, ref_count, cur_count in zip(CATALOGUE, reference.rule_counts, current.rule_counts):
+        ref_rate, cur_rate = ref_count / max(reference.n, 1), cur_count / max(current.n, 1)
+        # Fire rate as a two-bin (fired / not fired) distribution
+        score = psi(np.array([ref_rate, 1 - ref_rate]), np.array([cur_rate, 1 - cur_rate]))
+        rules[rule.label] = {'reference_rate': float(ref_rate), 'current_rate': float(cur_rate),
+                             'psi': score, 'status': status(score)}
+
+    worst = max([f['psi'] for f in features.values()] + [r['psi'] for r in rules.values()])
+    return {
+        'n': int(current.n),
+        'reference_n': int(reference.n),
+        'status': status(worst),
+        'features': features,
+        'rules': rules,
+    }
+
+
+class DriftMonitor:
+    """
+    Streaming comparison of live inputs against a reference profile.
+
+    observe copies the patient into a fixed buffer and bumps the fired rules'
+    counters; full buffers are binned in one vectorized pass, so a request
+    costs a couple of microseconds. report compares the histograms gathered
+    since the last reset with the reference, and check closes the window and
+    keeps its report as last.
+    """
+
+    def __init__(self, reference: Histograms):
+        self.reference = reference
+        self._lock = threading.Lock()
+        self.current = Histograms(reference.binning)
+        self.last: Optional[Dict[str, Any]] = None
+        self._pending = np.empty((BUFFER_ROWS, len(FEATURES)), dtype=np.float64)
+        self._n_pending = 0
+
+    def _flush(self) -> None:
+        self.current.add_values(self._pending[:self._n_pending])
+        self._n_pending = 0
+
+    def observe(self, vector: Sequence[float], fired: Sequence[int]) -> None:
+        """Count one patient (17 features in canonical order) and the indices of its fired rules."""
+        with self._lock:
+            self._pending[self._n_pending] = vector
+            rule_counts = self.current.rule_counts
+            for i in fired:
+                rule_counts[i] += 1
+            self._n_pending += 1
+            if self._n_pending == BUFFER_ROWS:
+                self._flush()
+
+    def observe_batch(self, X: np.ndarray, fired: np.ndarray) -> None:
+        """Count a batch (n, 17) and its (n, n_rules) boolean fired-rule matrix."""
+        with self._lock:
+            self.current.add_batch(X, fired)
+
+    def report(self, reset: bool = False) -> Dict[str, Any]:
+        """
+        Compare traffic since the last reset with the reference.
+
+        Args:
+            reset: Start a new window after reporting.
+
+        Returns:
+            See compare.
+        """
+        with self._lock:
+            self._flush()
+            if reset:
+                current, self.current = self.current, Histograms(self.reference.binning)
+            else:
+                current = self.current.copy()
+        return compare(self.reference, current)
+
+    def check(self) -> Dict[str, Any]:
+        """Report on the current window and start a new one; non-empty reports are kept as last."""
+        report = self.report(reset=True)
+        if report['n']:
+            self.last = report
+        return report
+
+    def prometheus(self) -> str:
+        """PSI per feature and rule in the Prometheus text exposition format."""
+        report = self.report()
+        lines = ['# HELP triage_drift_psi Population stability index of live traffic vs the training data.',
+                 '# TYPE triage_drift_psi gauge']
+        for name, entry in report['features'].items():
+            lines.append(f'triage_drift_psi{{feature="{name}"}} {entry["psi"]!r}')
+        for i, entry in enumerate(report['rules'].values()):
+            lines.append(f'triage_drift_psi{{rule_index="{i}"}} {entry["psi"]!r}')
+        lines += ['# HELP triage_drift_observations Patients observed in the current drift window.',
+                  '# TYPE triage_drift_observations gauge',
+                  f'triage_drift_observations {report["n"]}']
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide monitor fed by predict_er and predict_er_batch (None = not monitoring)
+MONITOR: Optional[DriftMonitor] = None
+
+
+def start(reference_file: str) -> DriftMonitor:
+    """Monitor every scored patient in this process against the reference at reference_file."""
+    global MONITOR
+    MONITOR = DriftMonitor(load_reference(reference_file))
+    return MONITOR
+
+
+def stop() -> None:
+    global MONITOR
+    MONITOR = None
+
+
+def observe(vector: np.ndarray, fired: Sequence[int]) -> None:
+    """Count one scored patient when monitoring (see DriftMonitor.observe)."""
+    if MONITOR is not None:
+        MONITOR.observe(vector, fired)
+
+
+def observe_batch(X: np.ndarray, fired: np.ndarray) -> None:
+    """Count a scored batch when monitoring (see DriftMonitor.observe_batch)."""
+    if MONITOR is not None:
+        MONITOR.observe_batch(X, fired)
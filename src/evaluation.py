@@ -0,0 +1,198 @@
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# np.trapz was renamed to np.trapezoid in NumPy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+# Columns of the per-threshold sweep, in output order
+SWEEP_COLUMNS = ['threshold', 'tp', 'fp', 'tn', 'fn', 'sensitivity', 'specificity', 'precision', 'npv', 'fpr']
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    """num / den with 0 where den == 0 (avoid division by zero)."""
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    out = np.zeros(np.broadcast(num, den).shape)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def threshold_sweep(y_true: Iterable, y_score: Iterable) -> Dict[str, np.ndarray]:
+    """
+    Confusion counts and rates at every distinct score threshold in one pass.
+
+    Scores are sorted once; cumulative positive/negative counts then give the
+    confusion matrix for "predict ER if score >= threshold" at every distinct
+    score. A final threshold of +inf (nothing predicted positive) is included.
+
+    Args:
+        y_true: Binary labels (1 = needs ER).
+        y_score: Predicted probabilities (or any score, higher = more urgent).
+
+    Returns:
+        Dict of arrays keyed by SWEEP_COLUMNS, ordered by decreasing threshold.
+    """
+    y_true = np.asarray(y_true).astype(bool).ravel()
+    y_score = np.asarray(y_score, dtype=np.float64).ravel()
+    if y_true.shape != y_score.shape:
+        raise ValueError(f"y_true and y_score differ in length: {len(y_true)} != {len(y_score)}")
+
+    order = np.argsort(-y_score, kind='mergesort')
+    scores = y_score[order]
+    labels = y_true[order]
+
+    # Last index of each run of equal scores
+    distinct = np.flatnonzero(np.diff(scores)) if len(scores) else np.zeros(0, dtype=np.intp)
+    ends = np.r_[distinct, len(scores) - 1] if len(scores) else distinct
+    tp = np.r_[0, np.cumsum(labels)[ends]]
+    fp = np.r_[0, (ends + 1) - tp[1:]]
+    thresholds = np.r_[np.inf, scores[ends]]
+
+    n_pos = int(labels.sum())
+    n_neg = len(labels) - n_pos
+    fn = n_pos - tp
+    tn = n_neg - fp
+    return {
+        'threshold': thresholds,
+        'tp': tp, 'fp': fp, 'tn': tn, 'fn': fn,
+        'sensitivity': _ratio(tp, n_pos),
+        'specificity': _ratio(tn, n_neg),
+        'precision': _ratio(tp, tp + fp),
+        'npv': _ratio(tn, tn + fn),
+        'fpr': _ratio(fp, n_neg),
+    }
+
+
+def metrics_at(sweep: Dict[str, np.ndarray], threshold: float) -> Dict[str, float]:
+    """
+    Look up the sweep row for "predict ER if score >= threshold".
+
+    Args:
+        sweep: Output of threshold_sweep.
+        threshold: Decision threshold.
+
+    Returns:
+        Dict of SWEEP_COLUMNS values, with threshold set to the requested value.
+    """
+    # Thresholds are decreasing; take the last row whose threshold is still >= the requested one
+    i = int(np.searchsorted(-sweep['threshold'], -threshold, side='right')) - 1
+    row = {name: sweep[name][i].item() for name in SWEEP_COLUMNS}
+    row['threshold'] = float(threshold)
+    return row
+
+
+def roc_auc(sweep: Dict[str, np.ndarray]) -> float:
+    """Area under the ROC curve (trapezoidal over the sweep)."""
+    return float(_trapezoid(sweep['sensitivity'], sweep['fpr']))
+
+
+def average_precision(sweep: Dict[str, np.ndarray]) -> float:
+    """Average precision: precision weighted by the recall gained at each threshold."""
+    return float(np.sum(np.diff(sweep['sensitivity']) * sweep['precision'][1:]))
+
+
+def recall_at_specificity(sweep: Dict[str, np.ndarray], min_specificity: float) -> float:
+    """Highest sensitivity achievable while keeping specificity >= min_specificity."""
+    ok = sweep['specificity'] >= min_specificity
+    return float(sweep['sensitivity'][ok].max()) if ok.any() else 0.0
+
+
+def _bootstrap_cells(args) -> np.ndarray:
+    """Confusion cell counts (tn, fp, fn, tp) for a block of row-level resamples."""
+    codes, seed_seq, n_resamples = args
+    rng = np.random.default_rng(seed_seq)
+    n = len(codes)
+    out = np.empty((n_resamples, 4), dtype=np.int64)
+    for i in range(n_resamples):
+        out[i] = np.bincount(codes[rng.integers(0, n, n)], minlength=4)
+    return out
+
+
+def bootstrap_ci(y_true: Iterable, y_pred: Iterable, n_resamples: int = 1000, alpha: float = 0.05,
+                 seed: int = 0, workers: Optional[int] = None,
+                 block_size: int = 25) -> Dict[str, Tuple[float, float]]:
+    """
+    Percentile bootstrap confidence intervals for sensitivity and specificity.
+
+    Rows are resampled with replacement. Resamples are split into fixed blocks,
+    each with its own spawned seed, and the blocks are spread across a process
+    pool, so results depend on seed but not on the number of workers.
+
+    Args:
+        y_true: Binary labels.
+        y_pred: Binary predictions.
+        n_resamples: Number of bootstrap resamples.
+        alpha: 1 - confidence level (0.05 gives 95% intervals).
+        seed: Root seed.
+        workers: Worker processes (default: CPU count; 1 runs in this process).
+        block_size: Resamples per task.
+
+    Returns:
+        Dict mapping 'sensitivity' and 'specificity' to (lower, upper).
+    """
+    y_true = np.asarray(y_true).astype(bool).ravel()
+    y_pred = np.asarray(y_pred).astype(bool).ravel()
+    # One byte per row: 0 = TN, 1 = FP, 2 = FN, 3 = TP
+    codes = (2 * y_true + y_pred).astype(np.uint8)
+
+    blocks = [min(block_size, n_resamples - start) for start in range(0, n_resamples, block_size)]
+    tasks = [(codes, seed_seq, n) for seed_seq, n in zip(np.random.SeedSequence(seed).spawn(len(blocks)), blocks)]
+    if workers == 1:
+        cells = np.vstack([_bootstrap_cells(task) for task in tasks])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            cells = np.vstack(list(pool.map(_bootstrap_cells, tasks)))
+
+    tn, fp, fn, tp = cells.T
+    q = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+    return {
+        'sensitivity': tuple(float(v) for v in np.percentile(_ratio(tp, tp + fn), q)),
+        'specificity': tuple(float(v) for v in np.percentile(_ratio(tn, tn + fp), q)),
+    }
+
+
+def write_sweep_csv(sweep: Dict[str, np.ndarray], path: str) -> None:
+    """Write every threshold of the sweep as CSV rows."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(SWEEP_COLUMNS)
+        writer.writerows(zip(*(sweep[name].tolist() for name in SWEEP_COLUMNS)))
+
+
+def write_metrics_json(path: str, summary: Dict, thresholds: Optional[List[Dict]] = None) -> None:
+    """Write the summary metrics (and selected thresholds) as JSON."""
+    payload = dict(summary)
+    if thresholds is not None:
+        payload['thresholds'] = thresholds
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+
+
+def plot_curves(sweep: Dict[str, np.ndarray], roc_path: str, pr_path: str) -> None:
+    """Save ROC and precision-recall curve plots (requires matplotlib)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(5, 5))
+    ax.plot(sweep['fpr'], sweep['sensitivity'], label=f"AUC = {roc_auc(sweep):.3f}")
+    ax.plot([0, 1], [0, 1], linestyle='--', color='grey')
+    ax.set_xlabel('False positive rate (1 - specificity)')
+    ax.set_ylabel('Sensitivity')
+    ax.set_title('ROC curve')
+    ax.legend(loc='lower right')
+    fig.savefig(roc_path, bbox_inches='tight')
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(5, 5))
+    ax.plot(sweep['sensitivity'][1:], sweep['precision'][1:], label=f"AP = {average_precision(sweep):.3f}")
+    ax.set_xlabel('Sensitivity (recall)')
+    ax.set_ylabel('Precision')
+    ax.set_title('Precision-recall curve')
+    ax.legend(loc='lower left')
+    fig.savefig(pr_path, bbox_inches='tight')
+    plt.close(fig)
@@ -0,0 +1,384 @@
+import numpy as np
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+# Canonical model input order (matches feature_names_in_ of er_model.pkl)
+FEATURES = [
+    'SpO2', 'blood_pressure', 'temperature', 'chest_pain', 'shortness_of_breath',
+    'heart_disease', 'age', 'unilateral_weakness', 'trouble_speaking', 'trouble_walking',
+    'syncope', 'pulse', 'blood_sugar', 'diabetes', 'mode_of_arrival', 'respiratory_rate',
+    'altered_mental_status'
+]
+N_FEATURES = len(FEATURES)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+
+
+class FeatureSpec(NamedTuple):
+    """
+    Declarative description of one input field.
+
+    dtype is 'float', 'int', 'binary' (0/1) or 'category' (values of encoding).
+    min/max bound valid values; default and step are the app's form settings
+    (an int step gives an integer input widget).
+    label and unit are used in error messages (unit includes any leading space).
+    """
+    name: str
+    dtype: str
+    min: Optional[float] = None
+    max: Optional[float] = None
+    default: float = 0
+    step: Optional[float] = None
+    label: str = ''
+    unit: str = ''
+    encoding: Optional[Dict[str, int]] = None
+
+
+# Input schema shared by the app, the service and the batch paths
+SCHEMA = {spec.name: spec for spec in [
+    FeatureSpec('SpO2', 'float', 80, 100, 98.0, 0.1, 'SpO2', '%'),
+    FeatureSpec('blood_pressure', 'float', 70, 200, 120.0, 1.0, 'Blood pressure', ' mmHg'),
+    FeatureSpec('temperature', 'float', 35, 40, 37.0, 0.1, 'Temperature', '°C'),
+    FeatureSpec('chest_pain', 'binary', 0, 1, label='Chest pain'),
+    FeatureSpec('shortness_of_breath', 'binary', 0, 1, label='Shortness of breath'),
+    FeatureSpec('heart_disease', 'binary', 0, 1, label='Heart disease'),
+    FeatureSpec('age', 'int', 18, 100, 50, 1, 'Age', ' years'),
+    FeatureSpec('unilateral_weakness', 'binary', 0, 1, label='Unilateral weakness'),
+    FeatureSpec('trouble_speaking', 'binary', 0, 1, label='Trouble speaking'),
+    FeatureSpec('trouble_walking', 'binary', 0, 1, label='Trouble walking'),
+    FeatureSpec('syncope', 'binary', 0, 1, label='Syncope'),
+    FeatureSpec('pulse', 'float', 40, 180, 75, 1, 'Pulse', ' bpm'),
+    FeatureSpec('blood_sugar', 'float', 50, 400, 100, 1, 'Blood glucose', ' mg/dL'),
+    FeatureSpec('diabetes', 'binary', 0, 1, label='Diabetes'),
+    FeatureSpec('mode_of_arrival', 'category', label='Mode of arrival',
+                encoding={'Walk-in': 0, 'Ambulance': 1, 'Other': 2}),
+    FeatureSpec('respiratory_rate', 'float', 8, 40, 16, 1, 'Respiratory rate', ' breaths/min'),
+    FeatureSpec('altered_mental_status', 'binary', 0, 1, label='Altered mental status'),
+    # Demographics: collected by the app, never used for scoring
+    FeatureSpec('sex', 'category', label='Sex', encoding={'Male': 0, 'Female': 1}),
+    FeatureSpec('race', 'category', label='Race',
+                encoding={'Asian': 0, 'Black': 1, 'White': 2, 'Hispanic': 3, 'Other': 4}),
+]}
+
+# Per-value validation codes (see validate)
+VALID = 0
+MISSING = 1
+NOT_NUMERIC = 2
+BELOW_MIN = 3
+ABOVE_MAX = 4
+NOT_INTEGER = 5
+UNKNOWN_CATEGORY = 6
+ERROR_NAMES = ['valid', 'missing', 'not_numeric', 'below_min', 'above_max', 'not_integer', 'unknown_category']
+
+# Schema of the model features as per-column arrays, for whole-matrix checks
+_MIN = np.array([-np.inf if SCHEMA[f].min is None else SCHEMA[f].min for f in FEATURES])
+_MAX = np.array([np.inf if SCHEMA[f].max is None else SCHEMA[f].max for f in FEATURES])
+_INTEGRAL = np.flatnonzero([SCHEMA[f].dtype != 'float' for f in FEATURES])
+_CATEGORIES = [(FEATURE_INDEX[f], np.array(sorted(SCHEMA[f].encoding.values()), dtype=np.float64))
+               for f in FEATURES if SCHEMA[f].encoding is not None]
+
+
+class PatientRecord:
+    """
+    One patient as a read-only float64 vector in canonical feature order.
+
+    Values are converted once at construction; predict_er and the rule engine
+    then use the vector directly instead of looking features up by name.
+    Demographics (sex, race) are carried along but never used for scoring.
+    """
+
+    __slots__ = ('vector', 'sex', 'race')
+
+    def __init__(self, vector: Any, sex: Optional[int] = None, race: Optional[int] = None):
+        array = np.asarray(vector, dtype=np.float64)
+        if array.shape != (N_FEATURES,):
+            raise ValueError(f"Expected {N_FEATURES} features, got shape {array.shape}")
+        # Read-only; arrays passed in by the caller (e.g. batch rows) are shared through a view
+        if array is vector:
+            array = array.view()
+        array.flags.writeable = False
+        self.vector = array
+        self.sex = sex
+        self.race = race
+
+    @classmethod
+    def from_dict(cls, input_data: Dict) -> 'PatientRecord':
+        """Build a record from a patient dict (missing features default to 0)."""
+        try:
+            vector = np.array([input_data.get(f, 0) for f in FEATURES], dtype=np.float64)
+        except Exception as e:
+            raise ValueError(f"Error preparing input data: {str(e)}. Expected features: {FEATURES}")
+        return cls(vector, input_data.get('sex'), input_data.get('race'))
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The record as a (1, 17) view, ready for predict_proba."""
+        return self.vector[np.newaxis, :]
+
+    def __getitem__(self, name: str) -> float:
+        return float(self.vector[FEATURE_INDEX[name]])
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Dict-style lookup, so code written against patient dicts keeps working."""
+        i = FEATURE_INDEX.get(name)
+        if i is None:
+            return getattr(self, name) if name in ('sex', 'race') else default
+        return float(self.vector[i])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain patient dict (features plus demographics when set)."""
+        out = dict(zip(FEATURES, self.vector.tolist()))
+        for name in ('sex', 'race'):
+            if getattr(self, name) is not None:
+                out[name] = getattr(self, name)
+        return out
+
+    def __repr__(self) -> str:
+        return f"PatientRecord({self.to_dict()})"
+
+
+class PatientBatch:
+    """
+    Columnar counterpart of PatientRecord: an (n, 17) float64 matrix.
+
+    Indexing a batch yields PatientRecord views of its rows without copying.
+    """
+
+    __slots__ = ('matrix',)
+
+    def __init__(self, X: Any):
+        self.matrix = to_matrix(X)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any]) -> 'PatientBatch':
+        """Stack PatientRecords or patient dicts into a batch."""
+        rows = [as_vector(r) for r in records]
+        return cls(np.vstack(rows) if rows else np.zeros((0, N_FEATURES)))
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def __getitem__(self, i: int) -> PatientRecord:
+        return PatientRecord(self.matrix[i])
+
+    def __iter__(self):
+        return (PatientRecord(row) for row in self.matrix)
+
+    def column(self, name: str) -> np.ndarray:
+        """One feature across the batch (a view)."""
+        return self.matrix[:, FEATURE_INDEX[name]]
+
+
+def vector_from_dict(input_data: Any) -> np.ndarray:
+    """
+    Build a 1x17 float64 matrix from a patient dict (missing features default to 0).
+
+    Args:
+        input_data: Input data keyed by feature name, or a PatientRecord
+            (returned as a view without copying).
+
+    Returns:
+        Array of shape (1, 17) in canonical feature order.
+    """
+    if isinstance(input_data, PatientRecord):
+        return input_data.matrix
+    try:
+        return np.array([[input_data.get(f, 0) for f in FEATURES]], dtype=np.float64)
+    except Exception as e:
+        raise ValueError(f"Error preparing input data: {str(e)}. Expected features: {FEATURES}")
+
+
+def as_vector(input_data: Any) -> np.ndarray:
+    """
+    Return a single patient as a 1-D vector of 17 features.
+
+    Args:
+        input_data: Patient dict, PatientRecord or vector in canonical order.
+
+    Returns:
+        Array of shape (17,).
+    """
+    if isinstance(input_data, PatientRecord):
+        return input_data.vector
+    if isinstance(input_data, dict):
+        return vector_from_dict(input_data)[0]
+    return np.asarray(input_data, dtype=np.float64)
+
+
+def to_matrix(X: Any) -> np.ndarray:
+    """
+    Convert a batch of patients to a float64 matrix in canonical feature order.
+
+    Args:
+        X: pandas DataFrame (columns selected by name), NumPy structured array
+            (fields selected by name), PatientBatch or 2-D array already in
+            canonical order.
+
+    Returns:
+        Array of shape (n_rows, 17).
+    """
+    if isinstance(X, PatientBatch):
+        return X.matrix
+
+    # DataFrame: select and reorder columns by name
+    if hasattr(X, 'columns'):
+        missing = [f for f in FEATURES if f not in X.columns]
+        if missing:
+            raise ValueError(f"Missing features: {missing}. Expected features: {FEATURES}")
+        return X[FEATURES].to_numpy(dtype=np.float64)
+
+    X = np.asarray(X)
+
+    # Structured array: select fields by name
+    if X.dtype.names is not None:
+        missing = [f for f in FEATURES if f not in X.dtype.names]
+        if missing:
+            raise ValueError(f"Missing features: {missing}. Expected features: {FEATURES}")
+        return np.column_stack([X[f] for f in FEATURES]).astype(np.float64, copy=False)
+
+    if X.ndim != 2 or X.shape[1] != N_FEATURES:
+        raise ValueError(f"Expected a 2-D array with {N_FEATURES} columns, got shape {X.shape}")
+    return X.astype(np.float64, copy=False)
+
+
+def _numeric_column(values: Any) -> Any:
+    """Convert one column to float64; returns (values, not_numeric mask)."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return values.astype(np.float64, copy=False), np.zeros(len(values), dtype=bool)
+    out = np.empty(len(values), dtype=np.float64)
+    bad = np.zeros(len(values), dtype=bool)
+    for i, v in enumerate(values.tolist()):
+        try:
+            out[i] = np.nan if v is None or v == '' else float(v)
+        except (TypeError, ValueError):
+            out[i] = np.nan
+            bad[i] = True
+    return out, bad
+
+
+def _check(values: np.ndarray, spec: FeatureSpec) -> np.ndarray:
+    """Validation codes for one float64 column (NaN = missing)."""
+    codes = np.zeros(len(values), dtype=np.uint8)
+    with np.errstate(invalid='ignore'):
+        if spec.dtype != 'float':
+            codes[values != np.floor(values)] = NOT_INTEGER
+        if spec.encoding is not None:
+            codes[~np.isin(values, list(spec.encoding.values()))] = UNKNOWN_CATEGORY
+        if spec.min is not None:
+            codes[values < spec.min] = BELOW_MIN
+        if spec.max is not None:
+            codes[values > spec.max] = ABOVE_MAX
+    codes[np.isnan(values)] = MISSING
+    return codes
+
+
+class ValidationResult:
+    """
+    Per-value validation codes for a batch: codes[i, j] for row i, FEATURES[j].
+
+    Nothing is raised for bad values; callers decide whether to reject,
+    skip or quarantine the rows that are not valid.
+    """
+
+    __slots__ = ('codes', 'values')
+
+    def __init__(self, codes: np.ndarray, values: np.ndarray):
+        self.codes = codes
+        self.values = values
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Boolean mask of rows where every feature is valid."""
+        return ~self.codes.any(axis=1)
+
+    @property
+    def invalid_mask(self) -> np.ndarray:
+        """uint32 per row with bit j set when FEATURES[j] is invalid."""
+        return ((self.codes != VALID) * (np.uint32(1) << np.arange(N_FEATURES, dtype=np.uint32))).sum(
+            axis=1, dtype=np.uint32)
+
+    def error_codes(self, i: int) -> Dict[str, str]:
+        """{feature: error name} for the invalid features of row i."""
+        return {FEATURES[j]: ERROR_NAMES[self.codes[i, j]] for j in np.flatnonzero(self.codes[i])}
+
+    def messages(self, i: int) -> List[str]:
+        """Human-readable errors for row i, in feature order."""
+        return [error_message(SCHEMA[FEATURES[j]], self.values[i, j], self.codes[i, j])
+                for j in np.flatnonzero(self.codes[i])]
+
+
+def validate(X: Any) -> ValidationResult:
+    """
+    Check a batch against SCHEMA with whole-column NumPy masks.
+
+    Args:
+        X: pandas DataFrame (columns selected by name; missing cells and
+            non-numeric text are reported per row), PatientBatch or 2-D
+            array in canonical feature order (NaN = missing).
+
+    Returns:
+        ValidationResult with one code per row and feature.
+    """
+    if hasattr(X, 'columns'):
+        missing = [f for f in FEATURES if f not in X.columns]
+        if missing:
+            raise ValueError(f"Missing features: {missing}. Expected features: {FEATURES}")
+        columns = [_numeric_column(X[f].to_numpy()) for f in FEATURES]
+        values = np.column_stack([c[0] for c in columns]) if columns else np.zeros((0, N_FEATURES))
+        not_numeric = np.column_stack([c[1] for c in columns])
+    else:
+        values = to_matrix(X)
+        not_numeric = None
+
+    # Same precedence as _check, over all columns at once (strided per-column passes are slower)
+    with np.errstate(invalid='ignore'):
+        codes = np.zeros(values.shape, dtype=np.uint8)
+        integral = values[:, _INTEGRAL]
+        codes[:, _INTEGRAL] = np.where(integral != np.floor(integral), NOT_INTEGER, VALID)
+        for j, allowed in _CATEGORIES:
+            codes[:, j] = np.where(np.isin(values[:, j], allowed), codes[:, j], UNKNOWN_CATEGORY)
+        codes = np.where(values < _MIN, BELOW_MIN, codes)
+        codes = np.where(values > _MAX, ABOVE_MAX, codes)
+        codes = np.where(np.isnan(values), MISSING, codes).astype(np.uint8)
+    if not_numeric is not None:
+        codes[not_numeric] = NOT_NUMERIC
+    return ValidationResult(codes, values)
+
+
+def error_message(spec: FeatureSpec, value: Any, code: int) -> str:
+    """Render one validation error the way the app reports it."""
+    if code == MISSING:
+        return f"{spec.label} value is missing"
+    if code == NOT_NUMERIC:
+        # Batch validation only keeps the converted (NaN) value
+        shown = '' if isinstance(value, float) and np.isnan(value) else f" {value!r}"
+        return f"{spec.label} value{shown} is not a number"
+    if code == UNKNOWN_CATEGORY:
+        return f"{spec.label} value {value} is not one of {sorted(spec.encoding.values())}"
+    if code == NOT_INTEGER:
+        return f"{spec.label} value {value} is not a whole number"
+    return f"{spec.label} value {value} is out of range ({spec.min:g}–{spec.max:g}{spec.unit})"
+
+
+def validate_record(input_data: Dict) -> List[str]:
+    """
+    Validate one patient dict, including demographics when present.
+
+    Features missing from the dict are not errors here: predict_er defaults
+    them to 0, as before.
+
+    Args:
+        input_data: Input data keyed by feature name.
+
+    Returns:
+        Error messages (empty when the patient is valid).
+    """
+    errors = []
+    for name, spec in SCHEMA.items():
+        value = input_data.get(name)
+        if value is None:
+            continue
+        values, not_numeric = _numeric_column(np.array([value], dtype=object))
+        code = NOT_NUMERIC if not_numeric[0] else int(_check(values, spec)[0])
+        if code != VALID:
+            errors.append(error_message(spec, value, code))
+    return errors
@@ -0,0 +1,11 @@
+import json
+import os
+from typing import Any, Dict
+
+
+def write_json(path: str, payload: Dict[str, Any]) -> None:
+    """Write JSON through a temporary file and an atomic rename, so readers never see a partial file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
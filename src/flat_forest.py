@@ -0,0 +1,285 @@
+import json
+import os
+
+import numpy as np
+from typing import Any, Optional
+
+from fileio import write_json
+
+
+class FlatForest:
+    """
+    RandomForestClassifier flattened into contiguous NumPy node arrays.
+
+    All trees share one set of node arrays (feature, threshold, left, right,
+    value); roots holds the index of each tree's root node. Leaves point to
+    themselves. Rows are walked through all trees at once with a handful of
+    vectorized gathers and no per-tree Python loop or sklearn input validation,
+    which makes single-row and small-batch calls far cheaper than sklearn.
+    Large batches are still faster through sklearn's compiled tree code.
+
+    contribution holds, per node, the change in positive-class probability
+    from its parent to it. Summing it along a row's decision path in every
+    tree splits predict_proba into bias (the mean root value) plus one term
+    per split feature (Saabas tree-path decomposition).
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes')
+    # Saved with the forest but rebuilt from the node arrays if missing (older exports)
+    OPTIONAL_ARRAYS = ('contribution',)
+    # Directory format: one .npy per array plus this JSON header (written last)
+    HEADER = 'header.json'
+    FORMAT_VERSION = 1
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, value: np.ndarray, roots: np.ndarray, classes: np.ndarray,
+                 max_depth: int, n_features: int, is_leaf: Optional[np.ndarray] = None,
+                 contribution: Optional[np.ndarray] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.is_leaf = left == np.arange(len(left)) if is_leaf is None else is_leaf
+        self.contribution = self._node_contributions() if contribution is None else contribution
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def bias(self) -> float:
+        """Positive-class probability before any split: the mean root value over trees."""
+        return float(self.value[self.roots, 1].mean())
+
+    def _node_contributions(self) -> np.ndarray:
+        """Positive-class value of every node minus that of its parent (0 at the roots)."""
+        internal = np.flatnonzero(~self.is_leaf)
+        parent = np.arange(len(self.left))
+        parent[self.left[internal]] = internal
+        parent[self.right[internal]] = internal
+        return self.value[:, 1] - self.value[parent, 1]
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> 'FlatForest':
+        """
+        Flatten a fitted sklearn RandomForestClassifier.
+
+        Args:
+            model: Fitted RandomForestClassifier.
+
+        Returns:
+            FlatForest producing the same predict_proba output.
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+            features.append(np.where(leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, own, tree.children_left + offset).astype(np.intp))
+            rights.append(np.where(leaf, own, tree.children_right + offset).astype(np.intp))
+            # Per-node class probabilities, normalized exactly as tree.predict_proba does
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer[:, None])
+            roots.append(offset)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.intp),
+            classes=np.asarray(model.classes_),
+            max_depth=max(e.tree_.max_depth for e in model.estimators_),
+            n_features=model.n_features_in_,
+        )
+
+    def save(self, path: str) -> None:
+        """Write the node arrays to an uncompressed .npz file."""
+        np.savez(path, max_depth=self.max_depth, n_features=self.n_features_in_,
+                 **{name: getattr(self, 'classes_' if name == 'classes' else name)
+                    for name in self.ARRAYS + self.OPTIONAL_ARRAYS})
+
+    @classmethod
+    def load(cls, path: str) -> 'FlatForest':
+        """Load a forest written by save."""
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS + cls.OPTIONAL_ARRAYS if name in data}
+            return cls(max_depth=int(data['max_depth']), n_features=int(data['n_features']), **arrays)
+
+    def save_dir(self, path: str) -> None:
+        """
+        Write the node arrays as uncompressed .npy files plus a JSON header.
+
+        Each export is a new generation: its arrays get their own file names
+        (<name>.<generation>.npy), and the header that lists them is renamed
+        into place last. A reader therefore sees either the old header with
+        the old arrays or the new header with the new ones, never a mix. The
+        previous generation's files are kept for processes that read the old
+        header just before the switch; older ones are removed.
+
+        Args:
+            path: Output directory (created if needed).
+        """
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(os.path.join(path, self.HEADER)) as f:
+                previous = json.load(f)
+        except (FileNotFoundError, ValueError):
+            previous = {}
+        generation = previous.get('generation', 0) + 1
+        arrays = {name: getattr(self, 'classes_' if name == 'classes' else name)
+                  for name in self.ARRAYS + self.OPTIONAL_ARRAYS}
+        arrays['is_leaf'] = self.is_leaf
+        header = {
+            'format': 'flat_forest',
+            'version': self.FORMAT_VERSION,
+            'generation': generation,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features_in_,
+            'n_estimators': self.n_estimators,
+            'arrays': {},
+        }
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            file = f"{name}.{generation}.npy"
+            with open(os.path.join(path, file), 'wb') as f:
+                np.save(f, array)
+            header['arrays'][name] = {'file': file, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        write_json(os.path.join(path, self.HEADER), header)
+
+        keep = {meta['file'] for h in (header, previous) for meta in h.get('arrays', {}).values()}
+        for file in os.listdir(path):
+            if file.endswith('.npy') and file not in keep:
+                os.remove(os.path.join(path, file))
+
+    @classmethod
+    def load_dir(cls, path: str, mmap: bool = True) -> 'FlatForest':
+        """
+        Load a forest written by save_dir.
+
+        Args:
+            path: Directory containing header.json and the .npy files.
+            mmap: Memory-map the arrays read-only (np.load(mmap_mode='r')), so
+                every process serving the model shares one page-cache copy.
+
+        Returns:
+            FlatForest backed by the mapped arrays.
+        """
+        try:
+            with open(os.path.join(path, cls.HEADER)) as f:
+                header = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Model file not found: {os.path.join(path, cls.HEADER)}")
+        if header.get('format') != 'flat_forest' or header.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported model header in {path}: {header.get('format')} "
+                             f"v{header.get('version')}")
+
+        arrays = {}
+        for name, meta in header['arrays'].items():
+            array = np.load(os.path.join(path, meta['file']), mmap_mode='r' if mmap else None)
+            if array.dtype.str != meta['dtype'] or list(array.shape) != meta['shape']:
+                raise ValueError(f"{meta['file']} does not match header.json (partially written model?)")
+            # Plain ndarray view of the mapping: indexing np.memmap subclasses is slower
+            arrays[name] = np.asarray(array)
+        return cls(max_depth=header['max_depth'], n_features=header['n_features'], **arrays)
+
+    def _check_input(self, X: np.ndarray) -> np.ndarray:
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected a 2-D array with {self.n_features_in_} columns, got shape {X.shape}")
+        return X
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Return the leaf node index reached by every row in every tree.
+
+        All (row, tree) pairs are walked together; pairs that reach a leaf drop
+        out of the active set, so the work is proportional to the path lengths.
+
+        Args:
+            X: Matrix of shape (n_rows, n_features).
+
+        Returns:
+            Array of shape (n_rows, n_estimators) of global node indices.
+        """
+        X = self._check_input(X)
+        n_rows, n_trees = len(X), len(self.roots)
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        flat_X = X.ravel()
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            nxt = np.where(go_left, self.left[current], self.right[current])
+            node[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+        return node.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Mean class probabilities over all trees, as RandomForestClassifier.predict_proba.
+
+        Args:
+            X: Matrix of shape (n_rows, n_features).
+
+        Returns:
+            Array of shape (n_rows, n_classes).
+        """
+        return self.value[self.apply(X)].sum(axis=1) / self.n_estimators
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predicted class labels."""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def contributions(self, X: np.ndarray, chunk_size: int = 10_000) -> np.ndarray:
+        """
+        Per-feature contributions to the positive-class probability.
+
+        Walks the same paths as apply, adding each visited node's contribution
+        to the feature its parent split on. For every row,
+        bias + contributions.sum() equals predict_proba(X)[:, 1] (up to
+        floating-point rounding).
+
+        Args:
+            X: Matrix of shape (n_rows, n_features).
+            chunk_size: Rows walked together (bounds the (rows x trees) work arrays).
+
+        Returns:
+            Array of shape (n_rows, n_features).
+        """
+        X = self._check_input(X)
+        n_rows, n_trees, n_features = len(X), len(self.roots), X.shape[1]
+        out = np.zeros((n_rows, n_features))
+        for start in range(0, n_rows, chunk_size):
+            chunk = X[start:start + chunk_size]
+            n = len(chunk)
+            node = np.tile(self.roots, n)
+            row_offset = np.repeat(np.arange(n) * n_features, n_trees)
+            flat_X = chunk.ravel()
+            totals = np.zeros(n * n_features)
+            active = np.flatnonzero(~self.is_leaf[node])
+            while active.size:
+                current = node[active]
+                cell = row_offset[active] + self.feature[current]
+                go_left = flat_X[cell] <= self.threshold[current]
+                nxt = np.where(go_left, self.left[current], self.right[current])
+                totals += np.bincount(cell, weights=self.contribution[nxt], minlength=len(totals))
+                node[active] = nxt
+                active = active[~self.is_leaf[nxt]]
+            out[start:start + n] = totals.reshape(n, n_features) / n_trees
+        return out
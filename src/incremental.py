@@ -0,0 +1,223 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from features import FEATURES, N_FEATURES, to_matrix
+from fileio import write_json
+
+# Store columns: the 17 features followed by the label
+STORE_COLUMNS = FEATURES + ['needs_er']
+
+
+class ColumnStore:
+    """
+    Append-only columnar store of labelled intake rows.
+
+    Each append becomes one part file: a column-major (Fortran-order) float64
+    .npy of shape (rows, 18) in STORE_COLUMNS order, so every column is
+    contiguous on disk. manifest.json lists the parts and is replaced
+    atomically after the part is written. Reads memory-map the parts.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(os.path.join(path, self.MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'columns': STORE_COLUMNS, 'parts': []}
+        if self.manifest['columns'] != STORE_COLUMNS:
+            raise ValueError(f"Store {path} has columns {self.manifest['columns']}, expected {STORE_COLUMNS}")
+
+    @property
+    def n_rows(self) -> int:
+        return sum(part['rows'] for part in self.manifest['parts'])
+
+    def append(self, data: Any, source: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
+        """
+        Append labelled rows.
+
+        Args:
+            data: DataFrame with the 17 features and needs_er.
+            source: Where the rows came from, recorded with the part (e.g.
+                the dataset split they were taken from).
+
+        Returns:
+            (first_row, end_row) of the appended rows in store order.
+        """
+        if 'needs_er' not in data:
+            raise ValueError("Rows to append need a needs_er label")
+        block = np.empty((len(data), len(STORE_COLUMNS)), dtype=np.float64, order='F')
+        block[:, :N_FEATURES] = to_matrix(data)
+        block[:, N_FEATURES] = np.asarray(data['needs_er'], dtype=np.float64)
+
+        os.makedirs(self.path, exist_ok=True)
+        start = self.n_rows
+        name = f"part-{len(self.manifest['parts']):05d}.npy"
+        with open(os.path.join(self.path, name), 'wb') as f:
+            np.save(f, block)
+        part = {'file': name, 'rows': len(block), 'first_row': start}
+        if source is not None:
+            part['source'] = source
+        self.manifest['parts'].append(part)
+        write_json(os.path.join(self.path, self.MANIFEST), self.manifest)
+        return start, start + len(block)
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (X, y) for store rows [start, end), reading only the parts that overlap.
+
+        Args:
+            start: First row.
+            end: End row (default: all rows).
+
+        Returns:
+            Feature matrix (rows, 17) and integer labels.
+        """
+        end = self.n_rows if end is None else end
+        blocks = []
+        for part in self.manifest['parts']:
+            lo, hi = part['first_row'], part['first_row'] + part['rows']
+            if hi <= start or lo >= end:
+                continue
+            data = np.load(os.path.join(self.path, part['file']), mmap_mode='r')
+            blocks.append(data[max(start, lo) - lo:min(end, hi) - lo])
+        if not blocks:
+            return np.zeros((0, N_FEATURES)), np.zeros(0, dtype=np.int64)
+        data = np.concatenate(blocks)
+        return np.ascontiguousarray(data[:, :N_FEATURES]), data[:, N_FEATURES].astype(np.int64)
+
+
+class IncrementalTrainer:
+    """
+    Warm-start RandomForest retraining against a ColumnStore.
+
+    The forest grows by trees_per_update trees fitted only on rows past the
+    checkpoint's watermark; once it holds more than max_trees trees the oldest
+    are retired. The model is written as model-<version>.pkl and
+    checkpoint.json (watermark and which rows each tree segment saw) is
+    replaced last, so a crash never advances the watermark past a model that
+    was not saved.
+    """
+
+    CHECKPOINT = 'checkpoint.json'
+
+    def __init__(self, checkpoint_dir: str, trees_per_update: int = 20, max_trees: Optional[int] = 200,
+                 initial_trees: int = 100, seed: int = 42, params: Optional[Dict[str, Any]] = None):
+        self.checkpoint_dir = checkpoint_dir
+        self.trees_per_update = trees_per_update
+        self.max_trees = max_trees
+        self.initial_trees = initial_trees
+        self.seed = seed
+        self.params = dict(class_weight='balanced') if params is None else params
+        try:
+            with open(os.path.join(checkpoint_dir, self.CHECKPOINT)) as f:
+                self.checkpoint = json.load(f)
+        except FileNotFoundError:
+            self.checkpoint = None
+
+    @property
+    def watermark(self) -> int:
+        """Store rows already used for training."""
+        return self.checkpoint['watermark'] if self.checkpoint else 0
+
+    @property
+    def model_path(self) -> Optional[str]:
+        return os.path.join(self.checkpoint_dir, self.checkpoint['model']) if self.checkpoint else None
+
+    def load_model(self) -> Any:
+        """Load the checkpointed forest."""
+        import joblib
+        if self.checkpoint is None:
+            raise FileNotFoundError(f"Model file not found: no checkpoint in {self.checkpoint_dir}")
+        return joblib.load(self.model_path)
+
+    def _new_forest(self, n_estimators: int) -> Any:
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(n_estimators=n_estimators, random_state=self.seed, warm_start=True,
+                                      n_jobs=-1, **self.params)
+
+    def update(self, store: ColumnStore) -> Dict[str, Any]:
+        """
+        Train on the store rows past the watermark and checkpoint the result.
+
+        Args:
+            store: Store holding all labelled rows so far.
+
+        Returns:
+            Dict with the rows used, trees added and retired, total trees,
+            watermark and fit seconds (rows_used is 0 if nothing was new).
+        """
+        start_row, end_row = self.watermark, store.n_rows
+        summary = {'rows_used': 0, 'trees_added': 0, 'trees_retired': 0, 'watermark': start_row,
+                   'fit_seconds': 0.0}
+        if end_row <= start_row:
+            summary['n_trees'] = sum(s['trees'] for s in self.checkpoint['segments']) if self.checkpoint else 0
+            return summary
+
+        X, y = store.read(start_row, end_row)
+        if len(np.unique(y)) < 2:
+            raise ValueError(f"Rows {start_row}-{end_row} contain a single class; append more data before retraining")
+
+        start = time.perf_counter()
+        if self.checkpoint is None:
+            model = self._new_forest(self.initial_trees)
+            segments = []
+            added = self.initial_trees
+        else:
+            model = self.load_model()
+            segments = list(self.checkpoint['segments'])
+            added = self.trees_per_update
+            model.set_params(warm_start=True, n_jobs=-1, n_estimators=len(model.estimators_) + added)
+        # With warm_start only the new trees are fitted, on the new rows only
+        model.fit(X, y)
+        segments.append({'trees': added, 'rows': [start_row, end_row]})
+
+        retired = 0
+        if self.max_trees is not None:
+            while len(segments) > 1 and sum(s['trees'] for s in segments) > self.max_trees:
+                retired += segments.pop(0)['trees']
+            if retired:
+                model.estimators_ = model.estimators_[retired:]
+                model.set_params(n_estimators=len(model.estimators_))
+        fit_seconds = time.perf_counter() - start
+        model.set_params(n_jobs=None)  # Single-row serving is slower with a thread pool per call
+
+        self._save(model, segments, end_row, fit_seconds)
+        summary.update(rows_used=end_row - start_row, trees_added=added, trees_retired=retired,
+                       n_trees=len(model.estimators_), watermark=end_row, fit_seconds=fit_seconds)
+        return summary
+
+    def _save(self, model: Any, segments: List[Dict], watermark: int, fit_seconds: float) -> None:
+        import joblib
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        previous = self.model_path
+        version = self.checkpoint['version'] + 1 if self.checkpoint else 1
+        name = f"model-{version:05d}.pkl"
+        joblib.dump(model, os.path.join(self.checkpoint_dir, name))
+        history = (self.checkpoint['history'] if self.checkpoint else []) + [
+            {'version': version, 'watermark': watermark, 'fit_seconds': fit_seconds}]
+        self.checkpoint = {'version': version, 'model': name, 'watermark': watermark,
+                           'segments': segments, 'history': history}
+        write_json(os.path.join(self.checkpoint_dir, self.CHECKPOINT), self.checkpoint)
+        if previous and os.path.exists(previous):
+            os.remove(previous)
+
+
+def full_refit(store: ColumnStore, n_estimators: int, seed: int = 42,
+               params: Optional[Dict[str, Any]] = None) -> Tuple[Any, float]:
+    """Fit a fresh forest on every store row; returns (model, fit_seconds) as the baseline."""
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = store.read()
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=seed, n_jobs=-1,
+                                   **(dict(class_weight='balanced') if params is None else params))
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+    model.set_params(n_jobs=None)
+    return model, fit_seconds
@@ -0,0 +1,196 @@
+import bisect
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+from rule_catalogue import CATALOGUE
+
+# Off by default: timer() then hands out a shared no-op timer
+ENABLED = False
+
+# Histogram bucket upper bounds in seconds (Prometheus "le"), plus +Inf
+BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (cumulative form is produced on export)."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds: Iterable[float] = BUCKETS):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf if it is past the last bound)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + [float('inf')], self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """
+    Stage latency histograms and per-rule fire counts for one process.
+
+    Stages are named '<operation>.<stage>', e.g. 'predict_er.predict_proba'.
+    Rule counts are indexed like CATALOGUE (RULES).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Histogram] = {}
+        self.rule_counts = np.zeros(len(CATALOGUE), dtype=np.int64)
+        self.patients = 0
+
+    def observe(self, stage: str, seconds: float) -> None:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def count_rules(self, fired: Any) -> None:
+        """
+        Add fired rules to the per-rule counters.
+
+        Args:
+            fired: Rule indices fired for one patient, or an (n, n_rules)
+                boolean matrix from CompiledRules.evaluate for a batch.
+        """
+        fired = np.asarray(fired)
+        with self._lock:
+            if fired.ndim == 2:
+                self.rule_counts += fired.sum(axis=0)
+                self.patients += len(fired)
+            else:
+                np.add.at(self.rule_counts, fired.astype(np.intp), 1)
+                self.patients += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.rule_counts[:] = 0
+            self.patients = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready snapshot: per-stage count/sum/mean/p50/p99 and buckets, plus rule counts."""
+        stages = {}
+        for name, h in sorted(self.stages.items()):
+            stages[name] = {
+                'count': h.count,
+                'sum_seconds': h.sum,
+                'mean_seconds': h.sum / h.count if h.count else 0.0,
+                'p50_seconds': h.quantile(0.5),
+                'p99_seconds': h.quantile(0.99),
+                'buckets': dict(zip([str(b) for b in h.bounds] + ['+Inf'], h.counts)),
+            }
+        return {
+            'stages': stages,
+            'patients': self.patients,
+            'rules': {rule.label: int(n) for rule, n in zip(CATALOGUE, self.rule_counts)},
+        }
+
+    def dump_json(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = ['# HELP triage_stage_seconds Time spent in each scoring stage.',
+                 '# TYPE triage_stage_seconds histogram']
+        for name, h in sorted(self.stages.items()):
+            stage = _escape(name)
+            cumulative = 0
+            for bound, n in zip(h.bounds + [float('inf')], h.counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'triage_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'triage_stage_seconds_sum{{stage="{stage}"}} {h.sum!r}')
+            lines.append(f'triage_stage_seconds_count{{stage="{stage}"}} {h.count}')
+        lines += ['# HELP triage_rule_fired_total Patients for which each rule fired.',
+                  '# TYPE triage_rule_fired_total counter']
+        for i, (rule, n) in enumerate(zip(CATALOGUE, self.rule_counts)):
+            lines.append(f'triage_rule_fired_total{{rule="{_escape(rule.label)}",index="{i}"}} {int(n)}')
+        lines += ['# HELP triage_patients_total Patients whose rules were evaluated.',
+                  '# TYPE triage_patients_total counter',
+                  f'triage_patients_total {self.patients}']
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class StageTimer:
+    """Records the time since the previous lap into '<operation>.<stage>' histograms."""
+
+    __slots__ = ('_metrics', '_operation', '_start', '_last')
+
+    def __init__(self, metrics: Metrics, operation: str):
+        self._metrics = metrics
+        self._operation = operation
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self._metrics.observe(f"{self._operation}.{stage}", now - self._last)
+        self._last = now
+
+    def done(self) -> None:
+        """Record the whole operation as '<operation>.total'."""
+        self._metrics.observe(f"{self._operation}.total", time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    """Stand-in used while metrics are disabled."""
+
+    __slots__ = ()
+
+    def lap(self, stage: str) -> None:
+        pass
+
+    def done(self) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+# Process-wide metrics used by predict, rules and the service
+METRICS = Metrics()
+
+
+def enable(enabled: bool = True) -> None:
+    """Turn stage timing and rule counting on or off for this process."""
+    global ENABLED
+    ENABLED = enabled
+
+
+def timer(operation: str) -> Any:
+    """Start timing one operation; a shared no-op timer when metrics are disabled."""
+    return StageTimer(METRICS, operation) if ENABLED else _NULL_TIMER
+
+
+def count_rules(fired: Any) -> None:
+    """Count fired rules when metrics are enabled (see Metrics.count_rules)."""
+    if ENABLED:
+        METRICS.count_rules(fired)
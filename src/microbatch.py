@@ -0,0 +1,159 @@
+import asyncio
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from features import vector_from_dict
+from predict import decode_fired, predict_er_batch
+
+
+def _cancel(batch: List) -> None:
+    """Cancel every future in batch that has no result yet."""
+    for _, future in batch:
+        if not future.done():
+            future.cancel()
+
+
+class MicroBatcher:
+    """
+    Asyncio front end that coalesces concurrent predict_er calls into batches.
+
+    Requests are queued and a background task collects them until max_batch
+    rows are waiting or max_wait_ms has passed since the first one arrived.
+    It then runs one predict_er_batch pass (forest and rules) in an executor
+    and resolves each caller's future with its own result.
+
+    Usage:
+        batcher = MicroBatcher(max_wait_ms=5, max_batch=64)
+        await batcher.start()
+        prob, weights_applied = await batcher.predict_er(input_data)
+        await batcher.stop()
+    """
+
+    def __init__(self, max_wait_ms: float = 5.0, max_batch: int = 64, model: Optional[Any] = None,
+                 executor: Optional[Any] = None):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+        self.model = model
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Histogram buckets: powers of two up to max_batch
+        self.buckets = [1 << i for i in range(max_batch.bit_length())]
+        if self.buckets[-1] < max_batch:
+            self.buckets.append(max_batch)
+        self.batch_size_counts = [0] * len(self.buckets)
+        self.queue_depth_counts = [0] * (len(self.buckets) + 1)
+        self.batches = 0
+        self.rows = 0
+        self.max_queue_depth = 0
+
+    async def start(self) -> None:
+        """Start the background batching task on the running loop."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the batching task; requests still queued or in the current batch are cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+
+    async def predict_er(self, input_data: Dict) -> Tuple[float, List[Tuple[float, str]]]:
+        """
+        Score one patient through the next batch.
+
+        Args:
+            input_data: Input data with 17 features (sex, race ignored).
+
+        Returns:
+            Tuple of (adjusted_probability, weights_applied), as predict.predict_er.
+        """
+        if self._task is None:
+            raise RuntimeError("MicroBatcher is not started")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((vector_from_dict(input_data)[0], future))
+        return await future
+
+    def _observe(self, batch_size: int, queue_depth: int) -> None:
+        self.batches += 1
+        self.rows += batch_size
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+        self.batch_size_counts[next(i for i, b in enumerate(self.buckets) if batch_size <= b)] += 1
+        self.queue_depth_counts[next((i for i, b in enumerate(self.buckets) if queue_depth < b),
+                                     len(self.buckets))] += 1
+
+    async def _collect(self) -> List:
+        """Wait for the first request, then gather more until the batch is full or the wait expires."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        try:
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopped while gathering: these requests are no longer in the queue for stop() to cancel
+            _cancel(batch)
+            raise
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            self._observe(len(batch), self._queue.qsize())
+            X = np.vstack([vector for vector, _ in batch])
+            try:
+                try:
+                    probs, fired = await loop.run_in_executor(self.executor, predict_er_batch, X, None,
+                                                              self.model)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), prob, mask in zip(batch, probs, fired):
+                    if not future.done():
+                        future.set_result((prob, decode_fired(mask)))
+            finally:
+                # Cancelled by stop() mid-batch: fail the callers instead of leaving them waiting
+                _cancel(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return batching counters.
+
+        Returns:
+            Dict with current and maximum queue depth, batch/row totals, and
+            histograms of batch size and of the queue depth left behind when a
+            batch was taken (bucket upper bound -> count).
+        """
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue_depth': self.max_queue_depth,
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'batch_size_histogram': dict(zip(self.buckets, self.batch_size_counts)),
+            'queue_depth_histogram': dict(zip([b - 1 for b in self.buckets] + ['+Inf'], self.queue_depth_counts)),
+        }
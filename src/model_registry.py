@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Project-relative location of the serving model and its optional flattened export
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+MODEL_PATH = os.path.join(PROJECT_ROOT, "model", "er_model.pkl")
+FLAT_SUFFIX = "_flat.npz"
+MMAP_SUFFIX = "_flat"
+
+
+def load_artifact(path: str) -> Any:
+    """Load a model artifact: a memory-mapped forest directory, a flattened forest (.npz) or a joblib pickle."""
+    # Imported on first load: joblib (and sklearn, pulled in by unpickling) dominate startup time
+    if os.path.isdir(path):
+        from flat_forest import FlatForest
+        return FlatForest.load_dir(path)
+    if path.endswith(".npz"):
+        from flat_forest import FlatForest
+        return FlatForest.load(path)
+    import joblib
+    return joblib.load(path)
+
+
+def _file_key(path: str) -> Tuple[int, int]:
+    """Return the (mtime_ns, size) pair used to detect a replaced artifact."""
+    if os.path.isdir(path):
+        # Memory-mapped forests: the header is rewritten last on every export
+        path = os.path.join(path, "header.json")
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded model artifacts.
+
+    Each artifact is loaded once and kept in memory, keyed on its absolute path.
+    The file's mtime and size are checked on every lookup so that replacing the
+    file on disk triggers a reload on the next request.
+    """
+
+    def __init__(self, loader: Callable[[str], Any] = load_artifact):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self.loads = 0
+        self.hits = 0
+        self.load_seconds = 0.0
+
+    def get(self, path: str) -> Any:
+        """
+        Return the model stored at path, loading it only if it is new or has changed.
+
+        Args:
+            path: Path to the model artifact.
+
+        Returns:
+            The loaded model object.
+        """
+        path = os.path.abspath(path)
+        try:
+            key = _file_key(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Model file not found: {path}")
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+
+            start = time.perf_counter()
+            try:
+                model = self._loader(path)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Model file not found: {path}")
+            except Exception as e:
+                raise Exception(f"Error loading model: {str(e)}")
+            self.load_seconds += time.perf_counter() - start
+            self.loads += 1
+            self._entries[path] = (key, model)
+            return model
+
+    def version(self, path: str) -> Optional[Tuple[int, int]]:
+        """Return the (mtime_ns, size) key of the currently cached artifact, if any."""
+        entry = self._entries.get(os.path.abspath(path))
+        return entry[0] if entry is not None else None
+
+    def clear(self) -> None:
+        """Drop all cached models; the next lookup reloads from disk."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return load and cache-hit counters."""
+        return {
+            'loads': self.loads,
+            'hits': self.hits,
+            'load_seconds': self.load_seconds,
+            'cached_models': len(self._entries),
+        }
+
+
+# Shared registry used by predict_er and the app
+REGISTRY = ModelRegistry()
+
+
+def model_path(script_dir: Optional[str] = None) -> str:
+    """
+    Resolve the serving model path.
+
+    Args:
+        script_dir: Directory of a script two levels below the project root
+            (e.g. src/app). Defaults to this project's root.
+
+    Returns:
+        Absolute path to er_model.pkl.
+    """
+    if script_dir is None:
+        return MODEL_PATH
+    project_root = os.path.abspath(os.path.join(script_dir, "../.."))
+    return os.path.join(project_root, "model", "er_model.pkl")
+
+
+def flat_model_path(path: str) -> str:
+    """Path of the flattened export written next to a .pkl model."""
+    return os.path.splitext(path)[0] + FLAT_SUFFIX
+
+
+def mmap_model_path(path: str) -> str:
+    """Directory of the memory-mapped export written next to a .pkl model."""
+    return os.path.splitext(path)[0] + MMAP_SUFFIX
+
+
+def serving_model_path(script_dir: Optional[str] = None) -> str:
+    """
+    Resolve the artifact used for single-patient scoring.
+
+    Prefers the flattened exports of er_model.pkl when they are at least as
+    new as the pickle, since they score one row far faster: first the
+    memory-mapped directory (shared between worker processes), then the .npz.
+
+    Args:
+        script_dir: See model_path.
+
+    Returns:
+        Absolute path to er_model_flat/, er_model_flat.npz or er_model.pkl.
+    """
+    path = model_path(script_dir)
+    try:
+        pkl_mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return path
+    for candidate in (mmap_model_path(path), flat_model_path(path)):
+        try:
+            if _file_key(candidate)[0] >= pkl_mtime:
+                return candidate
+        except FileNotFoundError:
+            pass
+    return path
+
+
+def get_model(path: Optional[str] = None) -> Any:
+    """Load (or fetch from cache) the model at path, defaulting to er_model.pkl."""
+    return REGISTRY.get(path or MODEL_PATH)
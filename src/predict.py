@@ -1,124 +1,319 @@
-import os
+import time
+import weakref
+
 import numpy as np
-import joblib
-from typing import Dict, List, Tuple
-
-
-def qsofa_score(input_data: Dict) -> int:
-    """Calculate qSOFA score."""
-    bp = input_data.get('blood_pressure', 120)
-    rr = input_data.get('respiratory_rate', 16)
-    ams = input_data.get('altered_mental_status', 0)
-    return (
-        (1 if ams == 1 else 0) +
-        (1 if rr >= 22 else 0) +
-        (1 if bp <= 100 else 0)
-    )
-
-
-def stroke_symptoms_count(input_data: Dict) -> int:
-    """Count stroke symptoms."""
-    return sum([
-        input_data.get('unilateral_weakness', 0),
-        input_data.get('trouble_speaking', 0),
-        input_data.get('trouble_walking', 0),
-        input_data.get('syncope', 0)
-    ])
-
-
-def diabetes_glucose_check(input_data: Dict) -> bool:
-    """Check diabetes with abnormal glucose."""
-    diabetes = input_data.get('diabetes', 0)
-    bs = input_data.get('blood_sugar', 100)
-    return diabetes == 1 and (bs <= 70 or bs >= 200)
-
-
-# Rule definitions: feature -> (condition_function, weight, description)
-RULES = {
-    'SpO2': [(lambda x: x < 90, 0.60, 'SpO2 < 90%')],
-    'blood_pressure': [
-        (lambda x: x < 90, 0.60, 'Blood pressure < 90 mmHg'),
-        (lambda x: x > 140, 0.30, 'Blood pressure > 140 mmHg')
-    ],
-    'temperature': [(lambda x: x > 38, 0.50, 'Temperature > 38°C')],
-    'chest_pain': [(lambda x: x == 1, 0.60, 'Chest pain present')],
-    'shortness_of_breath': [(lambda x: x == 1, 0.50, 'Shortness of breath present')],
-    'heart_disease': [(lambda x: x == 1, 0.40, 'Heart disease present')],
-    'age': [(lambda x: x >= 65, 0.30, 'Age ≥ 65 years')],
-    'pulse': [
-        (lambda x: x < 60, 0.80, 'Pulse < 60 bpm (hypothermia risk)'),
-        (lambda x: x > 100, 0.60, 'Pulse > 100 bpm')
-    ],
-    'blood_sugar': [(lambda x: x <= 70 or x >= 272, 0.70, 'Blood glucose ≤ 70 or ≥ 272 mg/dL')],
-    'mode_of_arrival': [(lambda x: x == 1, 0.60, 'Ambulance arrival')],
-    'respiratory_rate': [
-        (lambda x: x < 8, 0.30, 'Respiratory rate < 8'),
-        (lambda x: 21 <= x <= 24, 0.30, 'Respiratory rate 21–24'),
-        (lambda x: x >= 25, 0.60, 'Respiratory rate ≥ 25')
-    ],
-    '_qsofa': [
-        (lambda _: qsofa_score(_) == 1, 0.50, 'qSOFA score = 1'),
-        (lambda _: qsofa_score(_) >= 2, 1.00, 'qSOFA score ≥ 2')
-    ],
-    '_stroke': [(lambda _: stroke_symptoms_count(_) >= 1, 0.80, 'Stroke symptoms present')],
-    '_diabetes_glucose': [(lambda _: diabetes_glucose_check(_), 0.80, 'Diabetes with blood glucose ≤ 70 or ≥ 200 mg/dL')]
-}
-
-
-def predict_er(input_data: Dict, script_dir: str) -> Tuple[float, List[Tuple[float, str]]]:
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import audit_log
+import drift
+import shadow
+from features import FEATURES, SCHEMA, PatientRecord, to_matrix, vector_from_dict
+from metrics import count_rules, timer
+from model_registry import get_model, model_path, serving_model_path
+from rule_catalogue import CATALOGUE, COMPILED_CATALOGUE, RuleResult, evaluate_rules
+from rule_engine import diabetes_glucose_check, qsofa_score, stroke_symptoms_count  # noqa: F401
+
+
+# Rules are defined once in rule_catalogue and shared with rules.get_recommendations
+RULES = CATALOGUE
+COMPILED_RULES = COMPILED_CATALOGUE
+
+# sklearn forests flattened for explanations, kept while the model object lives
+_FLATTENED: 'weakref.WeakKeyDictionary[Any, Any]' = weakref.WeakKeyDictionary()
+
+
+class Explanation(NamedTuple):
     """
-    Generate ER probability with multiplicative weighting using optimized rules.
+    Tree-path decomposition of the forest's base_prob (before rule weights).
+
+    base_prob == bias + contributions.sum(axis=-1), with contributions in
+    FEATURES order: shape (17,) for one patient, (n, 17) for a batch.
+    """
+    bias: float
+    contributions: np.ndarray
+
+    def top(self, n: int = 5, row: Optional[int] = None) -> List[Tuple[str, float]]:
+        """The n features with the largest absolute contribution, as (feature, contribution)."""
+        values = self.contributions if row is None else self.contributions[row]
+        order = np.argsort(-np.abs(values), kind='stable')[:n]
+        return [(FEATURES[i], float(values[i])) for i in order]
+
+    def to_dict(self, row: Optional[int] = None) -> Dict[str, Any]:
+        values = self.contributions if row is None else self.contributions[row]
+        return {'bias': self.bias, 'contributions': dict(zip(FEATURES, values.tolist()))}
+
+
+def _flat_forest(model: Any) -> Any:
+    """The FlatForest form of model (flattened once per sklearn model object)."""
+    from flat_forest import FlatForest
+    if isinstance(model, FlatForest):
+        return model
+    flat = _FLATTENED.get(model)
+    if flat is None:
+        flat = _FLATTENED[model] = FlatForest.from_sklearn(model)
+    return flat
+
+
+def _explain(X: np.ndarray, model: Any) -> Explanation:
+    """
+    Feature contributions to model's positive-class probability.
+
+    Args:
+        X: Matrix of shape (n_rows, 17) in canonical feature order.
+        model: FlatForest or fitted RandomForestClassifier.
+
+    Returns:
+        Explanation with one row of contributions per row of X.
+    """
+    flat = _flat_forest(model)
+    return Explanation(flat.bias, flat.contributions(X))
+
+
+def explain_er(input_data: Union[Dict, PatientRecord], script_dir: Optional[str] = None,
+               model: Optional[Any] = None) -> Explanation:
+    """
+    Explain the forest's base probability for one patient without scoring it.
+
+    For callers that already have the decision (e.g. from the prediction
+    cache), so it is not computed or audited twice.
+
+    Args:
+        input_data: Input data with 17 features, as a dict or a PatientRecord.
+        script_dir: Directory of the calling script for path resolution.
+            Ignored when model is given.
+        model: Preloaded model handle (default: the serving model).
+
+    Returns:
+        Explanation with contributions of shape (17,).
+    """
+    stages = timer('explain_er')
+    if model is None:
+        model = get_model(serving_model_path(script_dir))
+    stages.lap('model_load')
+    explanation = _explain(vector_from_dict(input_data), model)
+    stages.lap('explain')
+    stages.done()
+    return Explanation(explanation.bias, explanation.contributions[0])
+
+
+def predict_er_details(input_data: Union[Dict, PatientRecord], script_dir: Optional[str] = None,
+                       model: Optional[Any] = None,
+                       rule_result: Optional[RuleResult] = None) -> Tuple[float, float, RuleResult]:
+    """
+    Score one patient and return every part of the decision.
+
+    This is predict_er's scoring path; the decision is written to the audit
+    log when one is open (see audit_log.open_log), counted by the drift
+    monitor when one is running (see drift.start) and queued for the shadow
+    model when one is set (see shadow.start).
 
     Args:
-        input_data: Input data with 17 features (sex, race ignored).
+        input_data: Input data with 17 features (sex, race ignored), as a dict
+            or a PatientRecord (used without copying).
         script_dir: Directory of the calling script for path resolution.
+            Ignored when model is given.
+        model: Preloaded model handle. Defaults to the flattened export of
+            er_model.pkl if present (see train_model.py --export-flat), else
+            er_model.pkl, from the process-wide model registry.
+        rule_result: Result of evaluate_rules for this patient, so callers that
+            also need recommendations evaluate the rules only once.
 
     Returns:
-        Tuple of (adjusted_probability, weights_applied).
+        Tuple of (base_probability, adjusted_probability, rule_result).
     """
-    # Load model
-    PROJECT_ROOT = os.path.abspath(os.path.join(script_dir, "../.."))
-    MODEL_PATH = os.path.join(PROJECT_ROOT, "model", "er_model.pkl")
+    # Per-stage timing (a no-op unless metrics are enabled)
+    start = time.perf_counter()
+    stages = timer('predict_er')
+
+    # Load model (cached per process, reloaded only if the file changes)
+    if model is None:
+        model = get_model(serving_model_path(script_dir))
+    stages.lap('model_load')
+
+    # Prepare input
+    X = vector_from_dict(input_data)
+    stages.lap('features')
+
+    # Predict base probability
     try:
-        model = joblib.load(MODEL_PATH)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
+        base_prob = model.predict_proba(X)[0][1]
     except Exception as e:
-        raise Exception(f"Error loading model: {str(e)}")
+        raise ValueError(f"Prediction error: {str(e)}")
+    stages.lap('predict_proba')
 
-    # Define features
-    features = [
-        'SpO2', 'blood_pressure', 'temperature', 'chest_pain', 'shortness_of_breath',
-        'heart_disease', 'age', 'unilateral_weakness', 'trouble_speaking', 'trouble_walking',
-        'syncope', 'pulse', 'blood_sugar', 'diabetes', 'mode_of_arrival', 'respiratory_rate',
-        'altered_mental_status'
-    ]
+    # Apply weights in rule order
+    if rule_result is None:
+        # Dicts keep their missing keys, so the derived scores can use normal vitals for them
+        rule_result = evaluate_rules(input_data if isinstance(input_data, dict) else X[0])
+    adjusted_prob = rule_result.adjust(base_prob)
+    stages.lap('rules')
+    count_rules(rule_result.fired)
+
+    audit_log.record(X[0], base_prob, adjusted_prob, rule_result.fired)
+    drift.observe(X[0], rule_result.fired)
+    shadow.submit(X[0], adjusted_prob, time.perf_counter() - start)
+    stages.lap('audit')
+    stages.done()
+    return base_prob, adjusted_prob, rule_result
+
+
+def predict_er(input_data: Union[Dict, PatientRecord], script_dir: Optional[str] = None,
+               model: Optional[Any] = None, rule_result: Optional[RuleResult] = None,
+               explain: bool = False) -> Union[Tuple[float, List[Tuple[float, str]]],
+                                               Tuple[float, List[Tuple[float, str]], Explanation]]:
+    """
+    Generate ER probability with multiplicative weighting using optimized rules.
+
+    Args:
+        input_data: Input data with 17 features (sex, race ignored), as a dict
+            or a PatientRecord (used without copying).
+        script_dir: Directory of the calling script for path resolution.
+            Ignored when model is given.
+        model: Preloaded model handle. Defaults to the flattened export of
+            er_model.pkl if present (see train_model.py --export-flat), else
+            er_model.pkl, from the process-wide model registry.
+        rule_result: Result of evaluate_rules for this patient, so callers that
+            also need recommendations evaluate the rules only once.
+        explain: Also return the forest's per-feature contributions to
+            base_prob (about 0.1 ms per patient, timed as explain_er).
+
+    Returns:
+        Tuple of (adjusted_probability, weights_applied), plus an Explanation
+        when explain is True.
+    """
+    _, adjusted_prob, rule_result = predict_er_details(input_data, script_dir, model, rule_result)
+    if not explain:
+        return adjusted_prob, rule_result.weights_applied
+
+    explanation = explain_er(input_data, script_dir, model)
+    return adjusted_prob, rule_result.weights_applied, explanation
+
+
+def decode_fired(mask: int) -> List[Tuple[float, str]]:
+    """
+    Expand a fired-rule bitmask from predict_er_batch into (weight, description) pairs.
+
+    Args:
+        mask: Bitmask for one row.
+
+    Returns:
+        List of (weight, description) in rule order, as in predict_er's weights_applied.
+    """
+    return RuleResult.from_bits(mask).weights_applied
+
+
+def predict_er_batch(X: Any, script_dir: Optional[str] = None, model: Optional[Any] = None,
+                     explain: bool = False) -> Union[Tuple[np.ndarray, np.ndarray],
+                                                     Tuple[np.ndarray, np.ndarray, Explanation]]:
+    """
+    Generate adjusted ER probabilities for many patients at once.
+
+    Runs a single predict_proba over the whole matrix and evaluates RULES as
+    boolean masks over the batch. Rules and weights match predict_er row by
+    row, and so do the probabilities when both score the same model. By
+    default, though, this scores er_model.pkl while predict_er prefers the
+    flattened export: probabilities then agree to about 1e-12, and rows with
+    missing (NaN) values may be routed differently.
+
+    Args:
+        X: DataFrame, structured array, PatientBatch or 2-D array in canonical
+            feature order.
+        script_dir: Directory of the calling script for path resolution.
+            Ignored when model is given.
+        model: Preloaded model handle. Defaults to er_model.pkl from the
+            process-wide model registry (not the flattened export; pass the
+            same model as predict_er for exact parity).
+        explain: Also return per-feature contributions to each row's base
+            probability.
+
+    Returns:
+        Tuple of (adjusted_probabilities, fired_rules) where fired_rules is a
+        uint32 bitmask per row (bit i set when RULES[i] fired), plus an
+        Explanation with (n, 17) contributions when explain is True.
+    """
+    start = time.perf_counter()
+    stages = timer('predict_er_batch')
+    if model is None:
+        model = get_model(model_path(script_dir))
+    stages.lap('model_load')
+
+    X = to_matrix(X)
+    if len(X) == 0:
+        empty = np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.uint32)
+        stages.done()
+        return empty + (_explain(np.zeros((0, len(FEATURES))), model),) if explain else empty
+    stages.lap('features')
 
-    # Prepare input
     try:
-        X = np.array([[input_data.get(f, 0) for f in features]])
+        base = model.predict_proba(X)[:, 1]
     except Exception as e:
-        raise ValueError(f"Error preparing input data: {str(e)}. Expected features: {features}")
+        raise ValueError(f"Prediction error: {str(e)}")
+    stages.lap('predict_proba')
 
-    # Predict base probability
+    fired = COMPILED_RULES.evaluate(X)
+    adjusted, bits = COMPILED_RULES.apply_weights(base, fired), COMPILED_RULES.to_bits(fired)
+    stages.lap('rules')
+    count_rules(fired)
+
+    audit_log.record_batch(X, base, adjusted, bits)
+    drift.observe_batch(X, fired)
+    shadow.submit_batch(X, adjusted, time.perf_counter() - start)
+    stages.lap('audit')
+
+    if explain:
+        explanation = _explain(X, model)
+        stages.lap('explain')
+        stages.done()
+        return adjusted, bits, explanation
+    stages.done()
+    return adjusted, bits
+
+
+def score_matrix(X: np.ndarray, model: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    predict_er_batch's scoring alone: no timers, audit log or drift monitor.
+
+    Used to score a shadow model on live traffic without it being recorded as
+    served decisions.
+
+    Args:
+        X: Feature matrix (n, 17) in canonical order.
+        model: Model handle.
+
+    Returns:
+        Tuple of (base_probabilities, adjusted_probabilities, fired) where
+        fired is the (n, n_rules) boolean matrix.
+    """
     try:
-        base_prob = model.predict_proba(X)[0][1]
+        base = model.predict_proba(X)[:, 1]
     except Exception as e:
         raise ValueError(f"Prediction error: {str(e)}")
+    fired = COMPILED_RULES.evaluate(X)
+    return base, COMPILED_RULES.apply_weights(base, fired), fired
 
-    # Apply weights
-    weights_applied = []
-    adjusted_prob = base_prob
 
-    for feature, rule_list in RULES.items():
-        # Special features start with '_'
-        value = input_data if feature.startswith('_') else input_data.get(feature, 0)
-        for condition_fn, weight, description in rule_list:
-            if condition_fn(value):
-                adjusted_prob *= (1 + weight)
-                weights_applied.append((weight, description))
+def warm_up(script_dir: Optional[str] = None) -> Dict[str, float]:
+    """
+    Load the serving model and score one patient with default vitals.
 
-    # Cap probability at 1.0
-    adjusted_prob = min(adjusted_prob, 1.0)
+    Run at startup (the app does this in a background thread) so the first
+    real request does not pay for importing joblib/sklearn and loading the
+    model. The patient goes through score_matrix and the rule engine, not
+    predict_er, so it is never audited, counted as drift or shadow-scored.
 
-    return adjusted_prob, weights_applied
\ No newline at end of file
+    Args:
+        script_dir: Directory of the calling script for path resolution.
+
+    Returns:
+        Dict with model_load_seconds and first_predict_seconds.
+    """
+    start = time.perf_counter()
+    model = get_model(serving_model_path(script_dir))
+    loaded = time.perf_counter()
+    patient = PatientRecord([SCHEMA[f].default for f in FEATURES])
+    score_matrix(patient.matrix, model)
+    evaluate_rules(patient)
+    return {
+        'model_load_seconds': loaded - start,
+        'first_predict_seconds': time.perf_counter() - loaded,
+    }
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+import audit_log
+import drift
+from features import FEATURES, PatientRecord, as_vector
+from metrics import count_rules, timer
+from model_registry import get_model, serving_model_path
+from predict import predict_er_details
+from rule_catalogue import RuleResult, evaluate_rules
+
+# Decimal places kept per feature when building cache keys: the app's SpO2 and
+# temperature sliders step by 0.1, everything else is an integer or a flag
+DECIMALS = {name: 0 for name in FEATURES}
+DECIMALS.update({'SpO2': 1, 'temperature': 1})
+_DECIMALS = [DECIMALS[f] for f in FEATURES]
+
+
+def quantize(input_data: Any) -> Tuple[float, ...]:
+    """
+    Canonical cache key for a patient: the 17 features, rounded per DECIMALS.
+
+    Args:
+        input_data: Patient dict, PatientRecord or a vector of 17 features in
+            canonical order.
+
+    Returns:
+        Tuple of 17 floats in canonical feature order.
+    """
+    return tuple(round(v, d) for v, d in zip(as_vector(input_data).tolist(), _DECIMALS))
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of (adjusted_probability, RuleResult) per quantized patient.
+
+    Only patients whose values already sit on the quantization grid (as the
+    app's sliders produce) are cached; anything finer is scored as sent and
+    counted as a bypass, since rounding could cross a rule threshold (e.g.
+    temperature 38.04 -> 38.0); so are patient dicts with missing features. A hit therefore returns exactly what scoring
+    the input would. The cache is cleared whenever the model
+    registry hands back a different model object (the artifact was replaced
+    on disk), and entries older than ttl seconds are recomputed. Hits are
+    audited and counted by the drift monitor like misses (the base
+    probability is kept with each entry).
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (expires, (adjusted_probability, rule_result), base_probability)
+        self._entries: 'OrderedDict[Tuple[float, ...], Tuple[Optional[float], Tuple[float, RuleResult], float]]' = \
+            OrderedDict()
+        self._model: Optional[Any] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.bypasses = 0
+
+    def score(self, input_data: Union[Dict, PatientRecord], script_dir: Optional[str] = None) -> Tuple[float, RuleResult]:
+        """
+        Score one patient, serving repeated inputs from the cache.
+
+        Args:
+            input_data: Input data with 17 features (sex, race ignored).
+            script_dir: Directory of the calling script for path resolution.
+
+        Returns:
+            Tuple of (adjusted_probability, rule_result); rule_result provides
+            weights_applied and recommendations.
+        """
+        stages = timer('cache')
+        vector = as_vector(input_data)
+        key = quantize(vector)
+        # Registry lookups stat the artifact, so a replaced model shows up as a new object
+        model = get_model(serving_model_path(script_dir))
+        now = time.monotonic()
+
+        partial = isinstance(input_data, dict) and any(f not in input_data for f in FEATURES)
+        if partial or list(key) != vector.tolist():
+            # Off the grid (the quantized key could score differently) or a partial dict (its derived
+            # scores assume normal vitals, which the key does not record): score the input itself
+            with self._lock:
+                self.bypasses += 1
+            patient = input_data if isinstance(input_data, PatientRecord) else PatientRecord(vector)
+            rule_result = evaluate_rules(input_data if partial else patient)
+            _, prob, _ = predict_er_details(patient, model=model, rule_result=rule_result)
+            stages.lap('bypass')
+            stages.done()
+            return prob, rule_result
+
+        hit = None
+        with self._lock:
+            if model is not self._model:
+                if self._model is not None:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._model = model
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    hit = entry
+                else:
+                    del self._entries[key]
+                    self.expirations += 1
+            if hit is None:
+                self.misses += 1
+
+        if hit is not None:
+            stages.lap('hit')
+            # Misses are counted and audited by predict_er_details; a full audit
+            # queue may block here, so this runs outside the cache lock
+            (prob, rule_result), base_prob = hit[1], hit[2]
+            count_rules(rule_result.fired)
+            audit_log.record(key, base_prob, prob, rule_result.fired)
+            drift.observe(key, rule_result.fired)
+            stages.done()
+            return hit[1]
+
+        patient = PatientRecord(key)
+        rule_result = evaluate_rules(patient)
+        base_prob, prob, _ = predict_er_details(patient, model=model, rule_result=rule_result)
+        value = (prob, rule_result)
+
+        if self.maxsize > 0:
+            expires = now + self.ttl if self.ttl is not None else None
+            with self._lock:
+                if model is self._model:
+                    self._entries[key] = (expires, value, base_prob)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        stages.lap('miss')
+        stages.done()
+        return value
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return size, hit/miss and eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'bypasses': self.bypasses,
+        }
+
+
+# Shared cache used by the app and the scoring service
+CACHE = PredictionCache()
@@ -0,0 +1,116 @@
+import numpy as np
+from typing import Dict, List, Sequence, Tuple, Union
+
+from features import PatientRecord, as_vector
+from rule_engine import CompiledRules, Rule, helper_row
+
+# Single rule catalogue shared by predict_er (probability weights) and
+# get_recommendations (clinical actions): (source, operator, bounds, weight,
+# description, recommendation). Sources starting with '_' are derived scores
+# (see rule_engine.DERIVED). Weights are applied in this order.
+CATALOGUE = [
+    Rule('SpO2', '<', (90,), 0.60, 'SpO2 < 90%',
+         "Hypoxia Assessment: Administer oxygen, consider imaging"),
+    Rule('blood_pressure', '<', (90,), 0.60, 'Blood pressure < 90 mmHg',
+         "Hypotension Assessment: Fluid resuscitation, monitor vitals"),
+    Rule('blood_pressure', '>', (140,), 0.30, 'Blood pressure > 140 mmHg',
+         "Hypertension Assessment: Monitor, consider antihypertensives"),
+    Rule('temperature', '>', (38,), 0.50, 'Temperature > 38°C',
+         "Infection Assessment: Initiate blood work, antipyretics"),
+    Rule('chest_pain', '==', (1,), 0.60, 'Chest pain present',
+         "Cardiac Assessment: ECG, troponin test"),
+    Rule('shortness_of_breath', '==', (1,), 0.50, 'Shortness of breath present',
+         "Pulmonary Assessment: Oxygen, BNP test"),
+    Rule('heart_disease', '==', (1,), 0.40, 'Heart disease present',
+         "Cardiac Monitoring: Assess for exacerbation"),
+    Rule('age', '>=', (65,), 0.30, 'Age ≥ 65 years',
+         "Geriatric Assessment: Evaluate frailty, comorbidities"),
+    Rule('pulse', '<', (60,), 0.80, 'Pulse < 60 bpm (hypothermia risk)',
+         "Bradycardia Assessment: Check hypothermia, ECG"),
+    Rule('pulse', '>', (100,), 0.60, 'Pulse > 100 bpm',
+         "Tachycardia Assessment: ECG, evaluate cause"),
+    Rule('blood_sugar', '<=', (70,), 0.70, 'Blood glucose ≤ 70 mg/dL',
+         "Hypoglycemia Treatment: Administer glucose"),
+    Rule('blood_sugar', '>=', (272,), 0.70, 'Blood glucose ≥ 272 mg/dL',
+         "Hyperglycemia Assessment: Insulin, monitor"),
+    Rule('respiratory_rate', '<', (8,), 0.30, 'Respiratory rate < 8',
+         "Respiratory Assessment: Possible opioid toxicity or stroke"),
+    Rule('respiratory_rate', 'between', (21, 24), 0.30, 'Respiratory rate 21–24',
+         "Pulmonary Evaluation: Moderate tachypnea, assess hypoxia"),
+    Rule('respiratory_rate', '>=', (25,), 0.60, 'Respiratory rate ≥ 25',
+         "Pulmonary Evaluation: Severe tachypnea, risk of decompensation"),
+    Rule('mode_of_arrival', '==', (1,), 0.60, 'Ambulance arrival',
+         "Rapid Assessment: Ambulance arrival indicates high acuity"),
+    Rule('_qsofa', '==', (1,), 0.50, 'qSOFA score = 1',
+         "Monitor for Sepsis: Intermediate risk"),
+    Rule('_qsofa', '>=', (2,), 1.00, 'qSOFA score ≥ 2',
+         "Sepsis Workup: Initiate protocol (blood cultures, CRP)"),
+    Rule('_stroke', '>=', (1,), 0.80, 'Stroke symptoms present',
+         "Stroke Assessment: Urgent imaging (MRI/CT)"),
+    Rule('_diabetes_glucose', '==', (1,), 0.80, 'Diabetes with blood glucose ≤ 70 or ≥ 200 mg/dL',
+         "Diabetic Infection Risk: Blood cultures, antibiotics"),
+]
+COMPILED_CATALOGUE = CompiledRules(CATALOGUE)
+
+
+class RuleResult:
+    """
+    Outcome of evaluating the catalogue once for one patient.
+
+    Provides both the probability adjustment used by predict_er and the
+    recommendation list returned by get_recommendations.
+    """
+
+    __slots__ = ('fired',)
+
+    def __init__(self, fired: Sequence[int]):
+        self.fired = list(fired)
+
+    @classmethod
+    def from_bits(cls, mask: int) -> 'RuleResult':
+        """Rebuild a result from a predict_er_batch fired-rule bitmask."""
+        return cls(COMPILED_CATALOGUE.from_bits(mask))
+
+    @property
+    def weights_applied(self) -> List[Tuple[float, str]]:
+        """(weight, description) for every fired rule, in catalogue order."""
+        return [(CATALOGUE[i].weight, CATALOGUE[i].label) for i in self.fired]
+
+    def adjust(self, base_prob: float) -> float:
+        """Multiply base_prob by (1 + weight) for every fired rule, capped at 1.0."""
+        adjusted_prob = base_prob
+        for i in self.fired:
+            adjusted_prob *= (1 + CATALOGUE[i].weight)
+        return min(adjusted_prob, 1.0)
+
+    @property
+    def recommendations(self) -> List[str]:
+        """Unique recommendations sorted by weight (descending)."""
+        recommendations = sorted(((CATALOGUE[i].recommendation, CATALOGUE[i].weight) for i in self.fired),
+                                 key=lambda x: x[1], reverse=True)
+        seen = set()
+        unique_recommendations = []
+        for rec, _ in recommendations:
+            if rec not in seen:
+                seen.add(rec)
+                unique_recommendations.append(rec)
+
+        return unique_recommendations if unique_recommendations else ["No recommendations"]
+
+
+def evaluate_rules(input_data: Union[Dict, PatientRecord, np.ndarray]) -> RuleResult:
+    """
+    Evaluate the rule catalogue once for a single patient.
+
+    Args:
+        input_data: Patient dict, PatientRecord or a vector of 17 features in
+            canonical order. Features missing from a dict count as 0, except
+            that the derived scores (qSOFA, diabetes with abnormal glucose)
+            assume normal vitals (rule_engine.HELPER_DEFAULTS).
+
+    Returns:
+        RuleResult holding the fired rules.
+    """
+    if isinstance(input_data, dict):
+        return RuleResult(COMPILED_CATALOGUE.fired_indices(as_vector(input_data), helper_row(input_data)))
+    return RuleResult(COMPILED_CATALOGUE.fired_indices(as_vector(input_data)))
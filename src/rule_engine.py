@@ -0,0 +1,216 @@
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from features import FEATURE_INDEX, FEATURES, N_FEATURES, PatientRecord
+
+# Derived per-patient scores, appended after the 17 raw features when rules are evaluated
+DERIVED = ['_qsofa', '_stroke', '_diabetes_glucose']
+SOURCE_INDEX = dict(FEATURE_INDEX, **{name: N_FEATURES + i for i, name in enumerate(DERIVED)})
+# Values the derived scores assume for vitals missing from a patient dict (normal readings, so
+# nothing is scored); other missing features count as 0, as they do for the model and single-feature rules
+HELPER_DEFAULTS = {'blood_pressure': 120, 'respiratory_rate': 16, 'blood_sugar': 100}
+
+# Comparison operators: value <op> bounds
+OPS = ['<', '<=', '>', '>=', '==', 'between', 'outside']
+
+# Scalar form of each operator, used for single-row evaluation
+_SCALAR_OPS = {
+    '<': lambda v, lo, hi: v < lo,
+    '<=': lambda v, lo, hi: v <= lo,
+    '>': lambda v, lo, hi: v > lo,
+    '>=': lambda v, lo, hi: v >= lo,
+    '==': lambda v, lo, hi: v == lo,
+    'between': lambda v, lo, hi: lo <= v <= hi,
+    'outside': lambda v, lo, hi: v <= lo or v >= hi,
+}
+
+
+class Rule(NamedTuple):
+    """
+    Declarative rule: fires when the source value satisfies op against bounds.
+
+    'between' fires for lo <= x <= hi and 'outside' for x <= lo or x >= hi;
+    the other operators compare against a single bound. label describes the
+    finding for weights_applied; recommendation is the clinician-facing action.
+    """
+    source: str
+    op: str
+    bounds: Tuple[float, ...]
+    weight: float
+    label: str
+    recommendation: Optional[str] = None
+
+
+def derived_scores(X: np.ndarray) -> np.ndarray:
+    """
+    Compute the derived scores (qSOFA, stroke symptom count, diabetes with
+    abnormal glucose) once per row.
+
+    Args:
+        X: Matrix of shape (n_rows, 17) in canonical feature order.
+
+    Returns:
+        Array of shape (n_rows, 3) in DERIVED order.
+    """
+    col = FEATURE_INDEX
+    out = np.empty((len(X), len(DERIVED)), dtype=np.float64)
+    out[:, 0] = (
+        (X[:, col['altered_mental_status']] == 1).astype(np.float64) +
+        (X[:, col['respiratory_rate']] >= 22) +
+        (X[:, col['blood_pressure']] <= 100)
+    )
+    out[:, 1] = (
+        X[:, col['unilateral_weakness']] + X[:, col['trouble_speaking']] +
+        X[:, col['trouble_walking']] + X[:, col['syncope']]
+    )
+    bs = X[:, col['blood_sugar']]
+    out[:, 2] = (X[:, col['diabetes']] == 1) & ((bs <= 70) | (bs >= 200))
+    return out
+
+
+def _derived_row(x: List[float]) -> List[float]:
+    """Scalar version of derived_scores for a single row given as a list."""
+    col = FEATURE_INDEX
+    bs = x[col['blood_sugar']]
+    return [
+        float((x[col['altered_mental_status']] == 1) + (x[col['respiratory_rate']] >= 22) +
+              (x[col['blood_pressure']] <= 100)),
+        x[col['unilateral_weakness']] + x[col['trouble_speaking']] +
+        x[col['trouble_walking']] + x[col['syncope']],
+        float(x[col['diabetes']] == 1 and (bs <= 70 or bs >= 200)),
+    ]
+
+
+def helper_row(input_data: Dict) -> List[float]:
+    """Feature values for the derived scores: a patient dict's missing vitals come from HELPER_DEFAULTS."""
+    if isinstance(input_data, PatientRecord):
+        return input_data.vector.tolist()
+    return [float(input_data.get(f, HELPER_DEFAULTS.get(f, 0))) for f in FEATURES]
+
+
+def qsofa_score(input_data: Dict) -> int:
+    """Calculate qSOFA score."""
+    return int(_derived_row(helper_row(input_data))[0])
+
+
+def stroke_symptoms_count(input_data: Dict) -> int:
+    """Count stroke symptoms."""
+    return int(_derived_row(helper_row(input_data))[1])
+
+
+def diabetes_glucose_check(input_data: Dict) -> bool:
+    """Check diabetes with abnormal glucose (≤ 70 or ≥ 200 mg/dL)."""
+    return bool(_derived_row(helper_row(input_data))[2])
+
+
+class CompiledRules:
+    """
+    Rule table compiled into flat arrays and evaluated as boolean masks over whole batches.
+
+    Rule i is identified by its position in the table it was compiled from; fired rules
+    are returned as indices (or a bitmask) rather than label strings.
+    """
+
+    def __init__(self, rules: Sequence[Rule]):
+        for rule in rules:
+            if rule.source not in SOURCE_INDEX:
+                raise ValueError(f"Unknown rule source: {rule.source}")
+            if rule.op not in OPS:
+                raise ValueError(f"Unknown rule operator: {rule.op}")
+        self.rules = list(rules)
+        self.columns = np.array([SOURCE_INDEX[r.source] for r in rules], dtype=np.intp)
+        self.ops = np.array([OPS.index(r.op) for r in rules], dtype=np.intp)
+        self.lo = np.array([r.bounds[0] for r in rules], dtype=np.float64)
+        self.hi = np.array([r.bounds[-1] for r in rules], dtype=np.float64)
+        self.weights = np.array([r.weight for r in rules], dtype=np.float64)
+        self.labels = [r.label for r in rules]
+        self.needs_derived = bool((self.columns >= N_FEATURES).any())
+        # Group rule positions by operator so each operator is one vectorized comparison
+        self._groups = [(op, np.flatnonzero(self.ops == op)) for op in range(len(OPS))
+                        if (self.ops == op).any()]
+        self._scalar = [(SOURCE_INDEX[r.source], _SCALAR_OPS[r.op], r.bounds[0], r.bounds[-1])
+                        for r in rules]
+        self._bits = np.left_shift(np.uint32(1), np.arange(len(rules), dtype=np.uint32))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def evaluate(self, X: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every rule on every row.
+
+        Args:
+            X: Matrix of shape (n_rows, 17) in canonical feature order.
+
+        Returns:
+            Boolean array of shape (n_rows, n_rules).
+        """
+        if self.needs_derived:
+            X = np.hstack([X, derived_scores(X)])
+        values = X[:, self.columns]
+        fired = np.empty(values.shape, dtype=bool)
+        for op, idx in self._groups:
+            v, lo, hi = values[:, idx], self.lo[idx], self.hi[idx]
+            if op == 0:
+                fired[:, idx] = v < lo
+            elif op == 1:
+                fired[:, idx] = v <= lo
+            elif op == 2:
+                fired[:, idx] = v > lo
+            elif op == 3:
+                fired[:, idx] = v >= lo
+            elif op == 4:
+                fired[:, idx] = v == lo
+            elif op == 5:
+                fired[:, idx] = (v >= lo) & (v <= hi)
+            else:
+                fired[:, idx] = (v <= lo) | (v >= hi)
+        return fired
+
+    def fired_indices(self, x: np.ndarray, derived_from: Optional[Sequence[float]] = None) -> List[int]:
+        """
+        Return the indices of the rules fired by a single row of 17 features.
+
+        A single row is evaluated with plain Python comparisons, which is much
+        cheaper than building (1, n_rules) masks.
+
+        Args:
+            x: The 17 feature values.
+            derived_from: Row to compute the derived scores from instead of x
+                (see helper_row, for patient dicts with missing vitals).
+        """
+        values = np.asarray(x, dtype=np.float64).tolist()
+        if self.needs_derived:
+            values += _derived_row(values if derived_from is None else list(derived_from))
+        return [i for i, (column, test, lo, hi) in enumerate(self._scalar)
+                if test(values[column], lo, hi)]
+
+    def to_bits(self, fired: np.ndarray) -> np.ndarray:
+        """Pack a (n_rows, n_rules) boolean mask into one uint32 bitmask per row."""
+        return (fired * self._bits).sum(axis=1, dtype=np.uint32)
+
+    def from_bits(self, mask: int) -> List[int]:
+        """Expand a single row's bitmask back into fired rule indices."""
+        mask = int(mask)
+        return [i for i in range(len(self.rules)) if mask >> i & 1]
+
+    def apply_weights(self, base: np.ndarray, fired: np.ndarray) -> np.ndarray:
+        """
+        Multiply each row's base probability by (1 + weight) for every fired rule.
+
+        Weights are applied in table order so the float results match applying
+        them one rule at a time. The result is capped at 1.0.
+
+        Args:
+            base: Base probabilities of shape (n_rows,).
+            fired: Boolean mask from evaluate.
+
+        Returns:
+            Adjusted probabilities of shape (n_rows,).
+        """
+        adjusted = np.array(base, dtype=np.float64)
+        factors = np.where(fired, 1 + self.weights, 1.0)
+        for i in range(len(self.rules)):
+            adjusted *= factors[:, i]
+        np.minimum(adjusted, 1.0, out=adjusted)
+        return adjusted
@@ -0,0 +1,330 @@
+"""
+HTTP/JSON scoring service for machine-to-machine access to predict_er.
+
+Endpoints:
+    GET  /health       liveness and model-registry counters
+    GET  /metrics      stage latency histograms and rule fire counts (Prometheus text)
+    GET  /metrics.json the same metrics as JSON
+    GET  /drift        input drift vs the training data (with --drift-reference)
+    GET  /shadow       agreement and latency of the shadow model (with --shadow-model)
+    POST /score        one patient dict -> probability, fired rules, recommendations
+    POST /score_batch  {"patients": [patient, ...]} -> {"results": [...]}
+
+Patients must carry all 17 features with values inside SCHEMA; otherwise the
+response is 400 with the validation messages in "details" (per patient index
+for /score_batch).
+
+Add "explain": true to a /score patient or the /score_batch body to include
+the forest's per-feature contributions to its base probability.
+
+Usage:
+    python src/service/service.py --port 8000 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# Ensure project directory is in sys.path
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+import audit_log  # noqa: E402
+import drift  # noqa: E402
+import metrics  # noqa: E402
+import shadow  # noqa: E402
+from features import FEATURES, MISSING, SCHEMA, error_message, validate_record  # noqa: E402
+from model_registry import REGISTRY, get_model, model_path, serving_model_path  # noqa: E402
+from prediction_cache import CACHE  # noqa: E402
+from predict import explain_er, predict_er_batch  # noqa: E402
+from rule_catalogue import RuleResult  # noqa: E402
+
+# Largest request body accepted (bytes)
+MAX_BODY = 16 * 1024 * 1024
+
+
+class InvalidPatient(ValueError):
+    """Request patients failed validation; errors are the messages to return (400)."""
+
+    def __init__(self, errors):
+        super().__init__("Invalid patient data")
+        self.errors = errors
+
+
+def patient_errors(patient: Dict) -> List[str]:
+    """
+    Validation messages for one request patient.
+
+    Unlike predict_er, the service does not default missing features to 0
+    (an omitted blood pressure would score as hypotension): every feature is
+    required, and values must pass the SCHEMA checks.
+    """
+    missing = [error_message(SCHEMA[f], None, MISSING) for f in FEATURES if patient.get(f) is None]
+    return missing + validate_record(patient)
+
+
+def score_one(patient: Dict) -> Dict:
+    """Score a single patient dict through the prediction cache."""
+    errors = patient_errors(patient)
+    if errors:
+        raise InvalidPatient(errors)
+    prob, rule_result = CACHE.score(patient)
+    result = {
+        'probability': float(prob),
+        'weights_applied': [[w, d] for w, d in rule_result.weights_applied],
+        'recommendations': rule_result.recommendations,
+    }
+    if patient.get('explain'):
+        # Explanations are not cached; only the forest's share of the score is explained
+        result['explanation'] = explain_er(patient).to_dict()
+    return result
+
+
+def score_many(patients: List[Dict], explain: bool = False) -> List[Dict]:
+    """Score a list of patient dicts through the batch path."""
+    errors = {i: e for i, e in enumerate(patient_errors(p) for p in patients) if e}
+    if errors:
+        raise InvalidPatient(errors)
+    X = [[p[f] for f in FEATURES] for p in patients]
+    if not X:
+        return []
+    scored = predict_er_batch(X, explain=explain)
+    results = []
+    for i, (prob, mask) in enumerate(zip(scored[0], scored[1])):
+        rule_result = RuleResult.from_bits(mask)
+        results.append({
+            'probability': float(prob),
+            'weights_applied': [[w, d] for w, d in rule_result.weights_applied],
+            'recommendations': rule_result.recommendations,
+        })
+        if explain:
+            results[-1]['explanation'] = scored[2].to_dict(i)
+    return results
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """Request handler for the scoring endpoints."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # Per-request access logging would dominate latency; stay quiet
+        pass
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            raise ValueError(f"Request body too large ({length} bytes)")
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'pid': os.getpid(), 'model': serving_model_path(),
+                                  'registry': REGISTRY.stats(), 'cache': CACHE.stats(),
+                                  'audit': audit_log.SINK.stats() if audit_log.SINK else None})
+        elif self.path == '/metrics':
+            text = metrics.METRICS.prometheus()
+            if drift.MONITOR is not None:
+                text += drift.MONITOR.prometheus()
+            body = text.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/metrics.json':
+            self._send_json(200, metrics.METRICS.to_dict())
+        elif self.path == '/drift':
+            if drift.MONITOR is None:
+                self._send_json(404, {'error': "Drift monitoring is off (start with --drift-reference)"})
+            else:
+                self._send_json(200, {'pid': os.getpid(), 'current': drift.MONITOR.report(),
+                                      'last_window': drift.MONITOR.last})
+        elif self.path == '/shadow':
+            if shadow.SHADOW is None:
+                self._send_json(404, {'error': "No shadow model (start with --shadow-model)"})
+            else:
+                self._send_json(200, dict(shadow.SHADOW.stats(), pid=os.getpid()))
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {'error': f"Invalid JSON body: {str(e)}"})
+            return
+
+        try:
+            if self.path == '/score':
+                if not isinstance(payload, dict):
+                    raise TypeError("Expected a JSON object with patient features")
+                self._send_json(200, score_one(payload))
+            elif self.path == '/score_batch':
+                patients = payload.get('patients') if isinstance(payload, dict) else payload
+                if not isinstance(patients, list) or not all(isinstance(p, dict) for p in patients):
+                    raise TypeError("Expected {\"patients\": [patient, ...]}")
+                explain = isinstance(payload, dict) and bool(payload.get('explain'))
+                self._send_json(200, {'results': score_many(patients, explain)})
+            else:
+                self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+        except InvalidPatient as e:
+            self._send_json(400, {'error': str(e), 'details': e.errors})
+        except TypeError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': f"Prediction error: {str(e)}"})
+
+
+def _check_drift(interval: float) -> None:
+    """Close a drift window every interval seconds and log it unless it is ok or empty."""
+    while True:
+        time.sleep(interval)
+        report = drift.MONITOR.check()
+        if report['status'] in ('warn', 'alert'):
+            drifted = [f"{name} (PSI {entry['psi']:.2f})"
+                       for name, entry in {**report['features'], **report['rules']}.items()
+                       if entry['status'] != 'ok']
+            print(f"[pid {os.getpid()}] Input drift {report['status']} over {report['n']} patients: "
+                  f"{', '.join(drifted)}", file=sys.stderr, flush=True)
+
+
+def _start_drift_checks(interval: Optional[float]) -> None:
+    if drift.MONITOR is not None and interval:
+        threading.Thread(target=_check_drift, args=(interval,), name='drift-check', daemon=True).start()
+
+
+def _serve_worker(server: ThreadingHTTPServer, drift_interval: Optional[float] = None) -> None:
+    """Worker process body: serve until terminated, then flush this worker's audit log and shadow queue."""
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # Threads do not survive fork, so each worker checks its own drift window
+    _start_drift_checks(drift_interval)
+    try:
+        server.serve_forever()
+    finally:
+        audit_log.close_log()
+        shadow.stop()
+
+
+def serve(host: str = '127.0.0.1', port: int = 8000, workers: int = 1, cache_size: int = 4096,
+          cache_ttl: Optional[float] = None, enable_metrics: bool = True,
+          audit_dir: Optional[str] = None, drift_reference: Optional[str] = None,
+          drift_interval: Optional[float] = 300.0, shadow_model: Optional[str] = None,
+          shadow_pool: str = 'thread') -> None:
+    """
+    Run the scoring service.
+
+    The models are loaded and the socket bound before forking, so every
+    worker process shares the resident model pages and accepts on the same
+    listening socket.
+
+    Args:
+        host: Interface to bind.
+        port: TCP port to bind.
+        workers: Number of worker processes.
+        cache_size: Prediction cache entries per worker (0 disables caching).
+        cache_ttl: Seconds before a cached prediction is recomputed (default: never).
+        enable_metrics: Record stage timings and rule counts for /metrics
+            (each worker process reports its own).
+        audit_dir: Write every scoring decision to an audit log in this
+            directory (one file sequence per worker process).
+        drift_reference: Compare scored inputs with this training-data
+            profile (see drift.build_reference); served on /drift and /metrics.
+        drift_interval: Seconds per drift window; each closed window that
+            drifted is logged to stderr (None keeps one window since start).
+        shadow_model: Also score every /score miss and /score_batch row with
+            this candidate artifact in the background; responses are
+            unchanged and /shadow reports agreement and latency.
+        shadow_pool: Where the candidate runs: 'thread' or 'process' (see
+            shadow.ShadowScorer).
+    """
+    CACHE.maxsize = cache_size
+    CACHE.ttl = cache_ttl
+    metrics.enable(enable_metrics)
+    if audit_dir:
+        # Each worker starts its own writer thread on its first decision
+        audit_log.open_log(audit_dir)
+    if drift_reference:
+        drift.start(drift_reference)
+    if shadow_model:
+        # Loaded before forking; each worker starts its own scoring thread on first use
+        shadow.start(shadow_model, pool=shadow_pool)
+
+    # Keep both artifacts resident: single rows use the serving model, batches the pickle
+    get_model(serving_model_path())
+    get_model(model_path())
+
+    server = ThreadingHTTPServer((host, port), ScoringHandler)
+    server.daemon_threads = True
+    print(f"Serving on http://{host}:{server.server_address[1]} with {workers} worker(s)")
+
+    if workers <= 1:
+        _start_drift_checks(drift_interval)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            audit_log.close_log()
+            shadow.stop()
+        return
+
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_serve_worker, args=(server, drift_interval), daemon=True) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+
+    def stop(signum, frame):
+        for proc in procs:
+            proc.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        stop(None, None)
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ER triage HTTP scoring service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--cache-size", type=int, default=4096,
+                        help="Prediction cache entries per worker for /score (0 disables)")
+    parser.add_argument("--cache-ttl", type=float, default=None,
+                        help="Seconds before a cached prediction is recomputed (default: never)")
+    parser.add_argument("--no-metrics", action="store_true", help="Disable stage timing and rule counting")
+    parser.add_argument("--audit-log", default=None, help="Directory for the audit log of every scoring decision")
+    parser.add_argument("--drift-reference", default=None,
+                        help="Training-data profile to monitor input drift against (<model>_drift.json)")
+    parser.add_argument("--drift-interval", type=float, default=300.0,
+                        help="Seconds per drift window; drifted windows are logged to stderr (0: one window)")
+    parser.add_argument("--shadow-model", default=None,
+                        help="Candidate artifact scored alongside the serving model without changing responses")
+    parser.add_argument("--shadow-pool", choices=shadow.POOLS, default="thread",
+                        help="Run the candidate on a background thread or in a separate process (default: thread)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.cache_size, args.cache_ttl, not args.no_metrics, args.audit_log,
+          args.drift_reference, args.drift_interval, args.shadow_model, args.shadow_pool)
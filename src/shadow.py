@@ -0,0 +1,420 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from flat_forest import FlatForest
+from features import PatientRecord
+from model_registry import get_model, load_artifact
+
+# Probability above which a patient is sent to the ER (as in evaluate_model.py)
+THRESHOLD = 0.5
+POOLS = ('thread', 'process')
+# Recent latency samples kept per measure for the percentiles in stats()
+LATENCY_WINDOW = 10000
+
+# Candidate loaded in a pool process (see _init_process)
+_PROCESS_CANDIDATE: Optional[Any] = None
+
+
+def load_candidate(path: str) -> FlatForest:
+    """Load a candidate artifact as a FlatForest (batches of a few hundred rows score fastest flattened)."""
+    model = get_model(path)
+    return model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+
+
+def _init_process(path: str) -> None:
+    global _PROCESS_CANDIDATE
+    _PROCESS_CANDIDATE = load_candidate(path)
+
+
+def _score_in_process(X: np.ndarray) -> np.ndarray:
+    from predict import score_matrix
+    return score_matrix(X, _PROCESS_CANDIDATE)[1]
+
+
+class ShadowScorer:
+    """
+    Scores a candidate model on the patients the serving model scored.
+
+    submit and submit_batch copy the patients, the served probabilities and
+    the serving latency into an in-memory queue and return. A background
+    thread wakes every flush_interval seconds and scores up to batch_size
+    queued patients with one score_matrix call on the candidate (the
+    predict_er_batch path), so the candidate's cost is amortized over the
+    batch and never added to a response. Callers are never blocked: when
+    max_pending patients are waiting, new ones are dropped and counted.
+    pool='process' scores in a separate process instead, so the candidate
+    does not hold the GIL while serving threads run (candidate must then be
+    a path).
+
+    The scorer counts compared patients and ER decisions (probability >
+    threshold) that differ, and keeps the last max_disagreements
+    disagreements. Its two latency measures are not comparable: serving
+    requests are timed end to end, one patient at a time (registry lookup
+    and audit/drift hooks included), while the candidate is timed per row of
+    a shadow batch. Compare models' latency with profile_model (triage.py
+    shadow) instead. The thread starts on the
+    first submit in each process, so a scorer created before forking serves
+    every worker.
+    """
+
+    def __init__(self, candidate: Union[str, Any], threshold: float = THRESHOLD, batch_size: int = 256,
+                 flush_interval: float = 0.05, max_pending: int = 65536, max_disagreements: int = 1000,
+                 pool: str = 'thread'):
+        if pool not in POOLS:
+            raise ValueError(f"pool must be one of {POOLS}, got {pool!r}")
+        if pool == 'process' and not isinstance(candidate, str):
+            raise ValueError("pool='process' needs the candidate's path")
+        self.candidate_path = candidate if isinstance(candidate, str) else None
+        # Loaded now so a bad artifact fails at startup, not in the background thread
+        self.candidate = load_candidate(candidate) if isinstance(candidate, str) else candidate
+        self.pool = pool
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_disagreements = max_disagreements
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pending: 'deque' = deque()
+        self._n_pending = 0
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.disagreements: 'deque' = deque(maxlen=self.max_disagreements)
+        # Recent samples: seconds per served request (per row for batch requests), and per row of each shadow batch
+        self.serving_latency: 'deque' = deque(maxlen=LATENCY_WINDOW)
+        self.candidate_latency: 'deque' = deque(maxlen=LATENCY_WINDOW)
+        self.serving_seconds = 0.0
+        self.candidate_seconds = 0.0
+        self.submitted = 0
+        self.compared = 0
+        self.disagreed = 0
+        self.dropped = 0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.error: Optional[BaseException] = None
+
+    def _ensure_worker(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked child: the parent's queue and thread are not ours
+                self._reset()
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _put(self, item: Any, n: int) -> None:
+        self._ensure_worker()
+        with self._lock:
+            self.submitted += n
+            if self._n_pending >= self.max_pending:
+                self.dropped += n
+                return
+            self._pending.append(item)
+            self._n_pending += n
+
+    def submit(self, features: Any, probability: float, seconds: float) -> None:
+        """
+        Queue one served patient for the candidate.
+
+        Args:
+            features: 17 feature values in canonical order (copied).
+            probability: Adjusted probability the serving model returned.
+            seconds: Time the serving model took for this request.
+        """
+        self._put((np.array(features, dtype=np.float64), probability, seconds), 1)
+
+    def submit_batch(self, X: np.ndarray, probability: np.ndarray, seconds: float) -> None:
+        """
+        Queue the patients of one predict_er_batch call.
+
+        Args:
+            X: Feature matrix (n, 17) (copied).
+            probability: Adjusted probabilities the serving model returned (n,).
+            seconds: Time the serving model took for the whole batch.
+        """
+        if len(X):
+            self._put((np.array(X, dtype=np.float64), np.array(probability, dtype=np.float64),
+                       seconds / len(X)), len(X))
+
+    def _take(self) -> List[Any]:
+        """Pop queued items up to about batch_size patients."""
+        items, n = [], 0
+        with self._lock:
+            while self._pending and n < self.batch_size:
+                item = self._pending.popleft()
+                items.append(item)
+                n += 1 if item[0].ndim == 1 else len(item[0])
+            self._n_pending -= n
+        return items
+
+    def _score(self, items: List[Any]) -> None:
+        # predict imports this module for its submit hooks, so it is imported where it is used
+        from predict import score_matrix
+        X = np.vstack([item[0] for item in items])
+        served = np.concatenate([np.atleast_1d(item[1]) for item in items])
+        start = time.perf_counter()
+        if self._executor is not None:
+            candidate = self._executor.submit(_score_in_process, X).result()
+        else:
+            candidate = score_matrix(X, self.candidate)[1]
+        seconds = time.perf_counter() - start
+
+        delta = np.abs(candidate - served)
+        differ = (candidate > self.threshold) != (served > self.threshold)
+        with self._lock:
+            for item in items:
+                rows = 1 if item[0].ndim == 1 else len(item[0])
+                self.serving_seconds += item[2] * rows
+                self.serving_latency.append(item[2])
+            self.candidate_seconds += seconds
+            self.candidate_latency.append(seconds / len(X))
+            self.compared += len(X)
+            self.disagreed += int(differ.sum())
+            self.abs_delta_sum += float(delta.sum())
+            self.max_abs_delta = max(self.max_abs_delta, float(delta.max()))
+            for i in np.flatnonzero(differ)[-self.max_disagreements:]:
+                self.disagreements.append({'time': time.time(), 'features': X[i].tolist(),
+                                           'serving': float(served[i]), 'candidate': float(candidate[i])})
+
+    def _run(self) -> None:
+        if self.pool == 'process':
+            # Spawned, not forked: this process already runs serving threads
+            self._executor = ProcessPoolExecutor(1, multiprocessing.get_context('spawn'),
+                                                 initializer=_init_process, initargs=(self.candidate_path,))
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            stopping = self._closing
+            items = self._take()
+            while items:
+                try:
+                    self._score(items)
+                except Exception as e:
+                    # The candidate must never take the service down; stats() reports the failure
+                    self.error = e
+                    with self._lock:
+                        self.dropped += sum(1 if item[0].ndim == 1 else len(item[0]) for item in items)
+                time.sleep(0)  # Let serving threads run between shadow batches
+                items = self._take()
+            if stopping:
+                break
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until everything submitted so far is compared (or dropped)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.compared + self.dropped < self.submitted and (deadline is None or time.monotonic() < deadline):
+            self._wake.set()
+            time.sleep(0.005)
+
+    def close(self) -> None:
+        """Score everything queued and stop the thread."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._closing = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            self._pid = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return agreement and latency counters for this process.
+
+        Returns:
+            Dict with the candidate path, queue and compared/dropped counts,
+            agreement_rate, disagreements, mean and max absolute probability
+            delta, and latency: mean over all patients and p50/p99 over the
+            last LATENCY_WINDOW samples of serving_request (seconds per served
+            request, per row for batch requests) and candidate_batch_row
+            (seconds per row of a shadow batch). The two are different
+            measures; see the class docstring.
+        """
+        with self._lock:
+            compared = self.compared
+            return {
+                'candidate': self.candidate_path,
+                'pool': self.pool,
+                'threshold': self.threshold,
+                'pending': self._n_pending,
+                'submitted': self.submitted,
+                'compared': compared,
+                'dropped': self.dropped,
+                'agreement_rate': 1 - self.disagreed / compared if compared else None,
+                'disagreements': self.disagreed,
+                'mean_abs_delta': self.abs_delta_sum / compared if compared else None,
+                'max_abs_delta': self.max_abs_delta,
+                'latency': {
+                    name: {'mean_seconds': total / compared if compared else None,
+                           'p50_seconds': float(np.percentile(samples, 50)) if samples else None,
+                           'p99_seconds': float(np.percentile(samples, 99)) if samples else None}
+                    for name, total, samples in (
+                        ('serving_request', self.serving_seconds, self.serving_latency),
+                        ('candidate_batch_row', self.candidate_seconds, self.candidate_latency))
+                },
+                'recent_disagreements': list(self.disagreements),
+                'error': str(self.error) if self.error else None,
+            }
+
+
+def model_bytes(model: Any) -> Optional[int]:
+    """Bytes of a forest's node arrays (memory-mapped arrays included), or None for other models."""
+    if isinstance(model, FlatForest):
+        return sum(array.nbytes for array in vars(model).values() if isinstance(array, np.ndarray))
+    if hasattr(model, 'estimators_'):
+        total = 0
+        for estimator in model.estimators_:
+            state = estimator.tree_.__getstate__()
+            total += state['nodes'].nbytes + state['values'].nbytes
+        return total
+    return None
+
+
+def profile_model(path: str, X: np.ndarray, sample: int = 500) -> Dict[str, Any]:
+    """
+    Measure what serving an artifact costs.
+
+    Args:
+        path: Model artifact (.pkl, flattened .npz or memory-mapped directory).
+        X: Feature matrix (n, 17) to score.
+        sample: Rows scored one by one through predict_er for the latency percentiles.
+
+    Returns:
+        Dict with load_seconds (second load, so imports are not counted),
+        memory_bytes (see model_bytes), disk_bytes, predict_er p50/p99
+        seconds and predict_er_batch rows per second.
+    """
+    from predict import predict_er, predict_er_batch
+    load_artifact(path)
+    start = time.perf_counter()
+    model = load_artifact(path)
+    load_seconds = time.perf_counter() - start
+    if os.path.isdir(path):
+        # Only the current generation's arrays (the previous export's are kept alongside)
+        with open(os.path.join(path, FlatForest.HEADER)) as f:
+            files = [meta['file'] for meta in json.load(f)['arrays'].values()] + [FlatForest.HEADER]
+        disk = sum(os.path.getsize(os.path.join(path, name)) for name in files)
+    else:
+        disk = os.path.getsize(path)
+
+    rows = [PatientRecord(row) for row in X[:sample]]
+    predict_er(rows[0], model=model)  # Warm up
+    times = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        predict_er(row, model=model)
+        times[i] = time.perf_counter() - start
+    start = time.perf_counter()
+    probability = predict_er_batch(X, model=model)[0]
+    batch_seconds = time.perf_counter() - start
+    return {
+        'path': path,
+        'load_seconds': load_seconds,
+        'memory_bytes': model_bytes(model),
+        'disk_bytes': disk,
+        'p50_seconds': float(np.percentile(times, 50)),
+        'p99_seconds': float(np.percentile(times, 99)),
+        'batch_rows_per_second': len(X) / batch_seconds,
+        'probability': probability,
+    }
+
+
+def compare_models(serving_path: str, candidate_path: str, X: np.ndarray, y: Optional[np.ndarray] = None,
+                   threshold: float = THRESHOLD, sample: int = 500) -> Dict[str, Any]:
+    """
+    Offline shadow report: score the same patients with both artifacts.
+
+    Args:
+        serving_path: Artifact currently served.
+        candidate_path: Artifact to promote.
+        X: Feature matrix (n, 17).
+        y: needs_er labels for X, if known.
+        threshold: ER decision threshold on the adjusted probability.
+        sample: Rows for the single-patient latency percentiles.
+
+    Returns:
+        Dict with rows, agreement_rate, disagreements, mean/max absolute
+        probability delta, models (profile_model results plus sensitivity
+        and specificity when y is given) and, with y, sensitivity_delta and
+        specificity_delta (candidate minus serving).
+
+    Raises:
+        ValueError: X has no rows.
+    """
+    if len(X) == 0:
+        raise ValueError("No patients to compare")
+    models = {name: profile_model(path, X, sample)
+              for name, path in (('serving', serving_path), ('candidate', candidate_path))}
+    served, candidate = models['serving'].pop('probability'), models['candidate'].pop('probability')
+    differ = (served > threshold) != (candidate > threshold)
+    delta = np.abs(candidate - served)
+    report = {
+        'rows': len(X),
+        'threshold': threshold,
+        'agreement_rate': 1 - float(differ.mean()),
+        'disagreements': int(differ.sum()),
+        'mean_abs_delta': float(delta.mean()),
+        'max_abs_delta': float(delta.max()),
+        'models': models,
+    }
+    if y is not None:
+        y = np.asarray(y).astype(bool)
+        for name, probability in (('serving', served), ('candidate', candidate)):
+            predicted = probability > threshold
+            models[name]['sensitivity'] = float(predicted[y].mean()) if y.any() else None
+            models[name]['specificity'] = float((~predicted[~y]).mean()) if (~y).any() else None
+        for metric in ('sensitivity', 'specificity'):
+            if models['serving'][metric] is not None:
+                report[f'{metric}_delta'] = models['candidate'][metric] - models['serving'][metric]
+    return report
+
+
+# Process-wide shadow scorer fed by predict_er and predict_er_batch (None = no shadow)
+SHADOW: Optional[ShadowScorer] = None
+
+
+def start(candidate: Union[str, Any], **kwargs: Any) -> ShadowScorer:
+    """Score every served patient in this process with candidate as well (see ShadowScorer)."""
+    global SHADOW
+    stop()
+    SHADOW = ShadowScorer(candidate, **kwargs)
+    return SHADOW
+
+
+def stop() -> None:
+    """Finish the queued shadow scoring and stop the process-wide scorer, if any."""
+    global SHADOW
+    if SHADOW is not None:
+        SHADOW.close()
+        SHADOW = None
+
+
+def submit(features: Any, probability: float, seconds: float) -> None:
+    """Shadow-score one served patient when a candidate is set (see ShadowScorer.submit)."""
+    if SHADOW is not None:
+        SHADOW.submit(features, probability, seconds)
+
+
+def submit_batch(X: np.ndarray, probability: np.ndarray, seconds: float) -> None:
+    """Shadow-score a served batch when a candidate is set (see ShadowScorer.submit_batch)."""
+    if SHADOW is not None:
+        SHADOW.submit_batch(X, probability, seconds)
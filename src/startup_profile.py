@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules the app imports to score a patient
+DEFAULT_MODULES = ['features', 'predict', 'prediction_cache', 'rules']
+
+# Runs in a fresh interpreter so every import and the model load are cold
+_CHILD = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+{imports}
+imported = time.perf_counter()
+from predict import warm_up
+timings = warm_up()
+print(json.dumps(dict(timings, import_seconds=imported - start)))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Parse the report written by python -X importtime.
+
+    Args:
+        stderr: Standard error of the profiled interpreter.
+
+    Returns:
+        One dict per imported module with module, depth, self_seconds and
+        cumulative_seconds, in import order.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_seconds': int(self_us) / 1e6,
+            'cumulative_seconds': int(cumulative_us) / 1e6,
+        })
+    return rows
+
+
+def profile_startup(modules: Optional[List[str]] = None, python: str = sys.executable) -> Dict[str, Any]:
+    """
+    Measure a cold start of the scoring path in a fresh interpreter.
+
+    Args:
+        modules: Modules to import before warming up (default: DEFAULT_MODULES).
+        python: Interpreter to run.
+
+    Returns:
+        Dict with import_seconds, model_load_seconds, first_predict_seconds and
+        total_seconds, the self import time per top-level package (packages)
+        and per module (modules, slowest first).
+    """
+    modules = modules or DEFAULT_MODULES
+    code = _CHILD.format(src=SRC_DIR, imports='\n'.join(f"import {m}" for m in modules))
+    proc = subprocess.run([python, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError(f"Startup profile failed: {' '.join(errors[-3:])}")
+
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(proc.stderr)
+    packages = defaultdict(float)
+    for row in imports:
+        packages[row['module'].split('.')[0]] += row['self_seconds']
+
+    timings['total_seconds'] = (timings['import_seconds'] + timings['model_load_seconds']
+                                + timings['first_predict_seconds'])
+    timings['packages'] = dict(sorted(packages.items(), key=lambda kv: kv[1], reverse=True))
+    timings['modules'] = sorted(imports, key=lambda row: row['self_seconds'], reverse=True)
+    return timings
@@ -0,0 +1,182 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Mapping, Optional
+
+import numpy as np
+
+from features import FEATURES
+
+# Binary features: probability of 1
+BINARY_P = {
+    'chest_pain': 0.3,
+    'shortness_of_breath': 0.25,
+    'heart_disease': 0.2,
+    'unilateral_weakness': 0.15,
+    'trouble_speaking': 0.1,
+    'trouble_walking': 0.12,
+    'syncope': 0.1,
+    'diabetes': 0.15,
+    'altered_mental_status': 0.05,
+}
+# mode_of_arrival: Walk-in, Ambulance, Other
+ARRIVAL_CUM_P = np.array([0.4, 0.8])
+
+COLUMNS = FEATURES + ['needs_er']
+
+
+def label_needs_er(df: Mapping) -> np.ndarray:
+    """
+    Generate needs_er based on finalized thresholds.
+
+    Args:
+        df: DataFrame or dict of column arrays with the 17 features.
+
+    Returns:
+        0/1 integer array.
+    """
+    return np.asarray((
+        (df['SpO2'] < 90) |
+        (df['blood_pressure'] < 90) |
+        (df['temperature'] > 38) |
+        (df['chest_pain'] == 1) |
+        (df['shortness_of_breath'] == 1) |
+        (df['heart_disease'] == 1) |
+        (df['unilateral_weakness'] == 1) |
+        (df['trouble_speaking'] == 1) |
+        (df['trouble_walking'] == 1) |
+        (df['syncope'] == 1) |
+        (df['pulse'] < 60) | (df['pulse'] > 100) |
+        ((df['blood_sugar'] <= 70) | (df['blood_sugar'] >= 272)) |
+        ((df['diabetes'] == 1) & ((df['blood_sugar'] <= 70) | (df['blood_sugar'] >= 200))) |
+        (df['respiratory_rate'] < 8) | (df['respiratory_rate'] >= 25) |
+        (df['altered_mental_status'] == 1) |
+        # qSOFA: 2 or more of (altered mental status, respiratory rate ≥ 22, BP ≤ 100)
+        (
+            (
+                (df['altered_mental_status'] == 1).astype(int) +
+                (df['respiratory_rate'] >= 22).astype(int) +
+                (df['blood_pressure'] <= 100).astype(int)
+            ) >= 2
+        )
+    )).astype(np.int8)
+
+
+def generate_chunk(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """
+    Generate n synthetic patients with their needs_er label.
+
+    Args:
+        rng: Random generator for this chunk.
+        n: Number of rows.
+
+    Returns:
+        Dict of column arrays in COLUMNS order.
+    """
+    data = {
+        'SpO2': np.clip(rng.normal(98, 2, n), 80, 100),
+        'blood_pressure': np.clip(rng.normal(120, 20, n), 70, 200),
+        'temperature': np.clip(rng.normal(37, 0.5, n), 35, 40),
+        'age': np.clip(np.ceil(rng.normal(50, 15, n)), 18, 100),
+        'pulse': np.clip(rng.normal(75, 15, n), 40, 180),
+        'blood_sugar': np.clip(rng.normal(100, 30, n), 50, 400),
+        'mode_of_arrival': np.searchsorted(ARRIVAL_CUM_P, rng.random(n), side='right').astype(np.int8),
+        'respiratory_rate': np.clip(rng.normal(16, 4, n), 8, 40),
+    }
+    for name, p in BINARY_P.items():
+        data[name] = (rng.random(n) < p).astype(np.int8)
+    data['needs_er'] = label_needs_er(data)
+    return {name: data[name] for name in COLUMNS}
+
+
+def _generate_seeded(args) -> Dict[str, np.ndarray]:
+    seed_seq, n = args
+    return generate_chunk(np.random.default_rng(seed_seq), n)
+
+
+def generate(rows: int, chunk_size: int = 1_000_000, seed: int = 42,
+             workers: int = 1) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Generate rows synthetic patients as a stream of chunks.
+
+    Every chunk gets an independent stream spawned from one SeedSequence, so
+    the output depends only on (rows, chunk_size, seed), not on workers.
+
+    Args:
+        rows: Total number of rows.
+        chunk_size: Rows per chunk.
+        seed: Root seed.
+        workers: Processes generating chunks in parallel.
+
+    Yields:
+        Column dicts (see generate_chunk), in order.
+    """
+    sizes = [min(chunk_size, rows - start) for start in range(0, rows, chunk_size)]
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    if workers <= 1:
+        for task in tasks:
+            yield _generate_seeded(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Submit in windows so only a few chunks are held in memory at once
+        for start in range(0, len(tasks), 2 * workers):
+            yield from pool.map(_generate_seeded, tasks[start:start + 2 * workers])
+
+
+def write_dataset(path: str, rows: int, chunk_size: int = 1_000_000, seed: int = 42,
+                  workers: int = 1, fmt: Optional[str] = None) -> str:
+    """
+    Generate a dataset straight to disk, chunk by chunk.
+
+    Args:
+        path: Output file.
+        rows: Total number of rows.
+        chunk_size: Rows per chunk (and per Parquet row group).
+        seed: Root seed.
+        workers: Processes generating chunks in parallel.
+        fmt: 'csv', 'parquet' or 'npy'; inferred from the extension by default.
+            'npy' writes a float64 (rows, 18) matrix in COLUMNS order that can be
+            opened with np.load(path, mmap_mode='r').
+
+    Returns:
+        The format written.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in ('csv', 'parquet', 'npy'):
+        raise ValueError(f"Unsupported output format: {fmt}")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    chunks = generate(rows, chunk_size, seed, workers)
+
+    if fmt == 'npy':
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(rows, len(COLUMNS)))
+        start = 0
+        for chunk in chunks:
+            n = len(chunk['needs_er'])
+            for j, name in enumerate(COLUMNS):
+                out[start:start + n, j] = chunk[name]
+            start += n
+        out.flush()
+        del out
+    elif fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.table(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        import pandas as pd
+        header = True
+        with open(path, 'w', newline='') as f:
+            for chunk in chunks:
+                pd.DataFrame(chunk).to_csv(f, header=header, index=False)
+                header = False
+    return fmt
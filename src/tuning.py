@@ -0,0 +1,158 @@
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from evaluation import recall_at_specificity, roc_auc, threshold_sweep
+from flat_forest import FlatForest
+
+# Default search space; serving cost grows with n_estimators x depth
+PARAM_GRID = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [None, 8, 12, 16],
+    'min_samples_leaf': [1, 5, 20],
+    'class_weight': [None, 'balanced'],
+}
+
+# Shared with pool workers once, through the initializer
+_DATA: Dict[str, np.ndarray] = {}
+
+
+def candidates(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Expand a parameter grid into candidate dicts, in a fixed order."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def stratified_folds(y: np.ndarray, n_folds: int, seed: int) -> np.ndarray:
+    """
+    Assign every row to a fold, keeping the class balance in each fold.
+
+    Args:
+        y: Binary labels.
+        n_folds: Number of folds.
+        seed: Shuffle seed.
+
+    Returns:
+        Fold number per row.
+    """
+    rng = np.random.default_rng(seed)
+    fold = np.empty(len(y), dtype=np.int64)
+    for label in np.unique(y):
+        rows = rng.permutation(np.flatnonzero(y == label))
+        fold[rows] = np.arange(len(rows)) % n_folds
+    return fold
+
+
+def _init_worker(X: np.ndarray, y: np.ndarray, fold: np.ndarray) -> None:
+    _DATA.update(X=X, y=y, fold=fold)
+
+
+def single_row_latency(model: Any, X: np.ndarray, calls: int = 200) -> float:
+    """Median seconds to score one row through the flattened (serving) forest."""
+    flat = FlatForest.from_sklearn(model)
+    rows = X[:calls]
+    times = []
+    for i in range(calls):
+        start = time.perf_counter()
+        flat.predict_proba(rows[i % len(rows)][np.newaxis, :])
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def _fit_fold(task: Tuple[int, Dict[str, Any], int, int, bool]) -> Dict[str, Any]:
+    """Fit one candidate on all folds but one and score the held-out fold."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    index, params, fold_id, seed, measure_latency = task
+    X, y, fold = _DATA['X'], _DATA['y'], _DATA['fold']
+    train, test = fold != fold_id, fold == fold_id
+
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_prob = model.predict_proba(X[test])[:, list(model.classes_).index(1)]
+    batch_seconds = (time.perf_counter() - start) / max(int(test.sum()), 1)
+
+    result = {
+        'index': index,
+        'fold': fold_id,
+        'rows': np.flatnonzero(test),
+        'y_prob': y_prob,
+        'fit_seconds': fit_seconds,
+        'batch_seconds_per_row': batch_seconds,
+        'n_nodes': sum(e.tree_.node_count for e in model.estimators_),
+        'mean_depth': float(np.mean([e.tree_.max_depth for e in model.estimators_])),
+    }
+    if measure_latency:
+        result['single_row_seconds'] = single_row_latency(model, X[test])
+    return result
+
+
+def search(X: np.ndarray, y: np.ndarray, grid: Optional[Dict[str, List[Any]]] = None, n_folds: int = 5,
+           seed: int = 42, workers: Optional[int] = None, min_specificity: float = 0.8,
+           min_sensitivity: float = 0.95) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Cross-validated grid search over RandomForestClassifier settings.
+
+    Every (candidate, fold) fit is an independent task on a process pool.
+    Folds and forest seeds are fixed by seed, so scores do not depend on the
+    number of workers. Candidates are scored on their pooled out-of-fold
+    probabilities by recall at a fixed specificity.
+
+    Args:
+        X: Feature matrix.
+        y: Binary labels (1 = needs ER).
+        grid: Parameter grid (default: PARAM_GRID).
+        n_folds: Cross-validation folds.
+        seed: Seed for the fold assignment and every forest.
+        workers: Worker processes (default: CPU count; 1 runs in this process).
+        min_specificity: Specificity at which recall is measured.
+        min_sensitivity: Recall a candidate must reach to be selectable.
+
+    Returns:
+        Tuple of (results, best). results has one dict per candidate with its
+        params, recall_at_specificity, roc_auc, mean fit time, serving latency
+        and forest size. best is the smallest forest (fewest nodes) reaching
+        min_sensitivity, or None if no candidate does.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.asarray(y).astype(np.int64)
+    fold = stratified_folds(y, n_folds, seed)
+    grid_candidates = candidates(grid or PARAM_GRID)
+    # Serving latency is measured once per candidate, on its first fold's forest
+    tasks = [(i, params, f, seed, f == 0) for i, params in enumerate(grid_candidates) for f in range(n_folds)]
+
+    if workers == 1:
+        _init_worker(X, y, fold)
+        fits = [_fit_fold(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y, fold)) as pool:
+            fits = list(pool.map(_fit_fold, tasks))
+
+    results = []
+    for i, params in enumerate(grid_candidates):
+        own = [fit for fit in fits if fit['index'] == i]
+        y_prob = np.empty(len(y))
+        for fit in own:
+            y_prob[fit['rows']] = fit['y_prob']
+        sweep = threshold_sweep(y, y_prob)
+        results.append({
+            **params,
+            'recall_at_specificity': recall_at_specificity(sweep, min_specificity),
+            'roc_auc': roc_auc(sweep),
+            'fit_seconds': float(np.mean([fit['fit_seconds'] for fit in own])),
+            'single_row_ms': own[0]['single_row_seconds'] * 1e3,
+            'batch_us_per_row': float(np.mean([fit['batch_seconds_per_row'] for fit in own])) * 1e6,
+            'n_nodes': int(np.mean([fit['n_nodes'] for fit in own])),
+            'mean_depth': float(np.mean([fit['mean_depth'] for fit in own])),
+        })
+
+    eligible = [r for r in results if r['recall_at_specificity'] >= min_sensitivity]
+    best = min(eligible, key=lambda r: (r['n_nodes'], -r['recall_at_specificity'])) if eligible else None
+    return results, best